@@ -0,0 +1,92 @@
+"""
+Example conftest.py file for pytest-easy-server project, that implements the
+hooks for the es_session and es_server_async fixtures.
+"""
+
+try:
+    import asyncio
+except ImportError:  # py2
+    asyncio = None
+
+
+class MySession(object):
+    """Fictitious session class with dummy methods"""
+
+    def __init__(self, host, username, password):
+        """Open session with the server"""
+        print("\nMySession: host={}, username={}, password={}".
+              format(host, username, password))
+        self.is_open = True
+
+    @staticmethod
+    def perform_function():
+        """Perform some function on the server"""
+        return 42
+
+    def close(self):
+        """Close session with the server"""
+        self.is_open = False
+
+
+def pytest_es_create_session(server):
+    """
+    Create a session with the server, for the es_session fixture.
+    """
+    return MySession(
+        server.secrets['host'],
+        server.secrets['username'],
+        server.secrets['password'])
+
+
+def pytest_es_check_session(server, session):
+    # pylint: disable=unused-argument
+    """
+    Check whether a session with the server is still usable.
+    """
+    return session.is_open
+
+
+def pytest_es_close_session(server, session):
+    # pylint: disable=unused-argument
+    """
+    Close a session with the server.
+    """
+    session.close()
+    return True
+
+
+class MyAsyncSession(object):
+    """Fictitious asyncio session class with dummy methods"""
+
+    def __init__(self, host):
+        self.host = host
+        self.is_open = True
+
+    @staticmethod
+    def perform_function():
+        """Perform some function on the server (returns a coroutine)"""
+        return asyncio.sleep(0.01, result=42)
+
+    def close(self):
+        """Close session with the server (returns a coroutine)"""
+        self.is_open = False
+        return asyncio.sleep(0.01)
+
+
+def pytest_es_create_async_session(server):
+    """
+    Create an asyncio session with the server, for the es_server_async
+    fixture. The returned coroutine simulates the time for opening the session.
+    """
+    if asyncio is None:
+        return None
+    session = MyAsyncSession(server.secrets['host'])
+    return asyncio.sleep(0.1, result=session)
+
+
+def pytest_es_close_async_session(server, session):
+    # pylint: disable=unused-argument
+    """
+    Close an asyncio session with the server.
+    """
+    return session.close()
@@ -0,0 +1,23 @@
+"""
+Example pytest test function using the es_server_async fixture for
+pytest-easy-server project.
+"""
+
+# pylint: disable=unused-import
+from pytest_easy_server import es_server, es_server_async  # noqa: F401
+
+
+def test_async_sample(es_server_async):  # pylint: disable=redefined-outer-name
+    """
+    Example Pytest test function that tests something using an asyncio
+    session.
+
+    Parameters:
+      es_server_async (AsyncServerSession): Pytest fixture; the server and
+        the asyncio session with the server to be used for the test
+    """
+    assert es_server_async.session.host == \
+        es_server_async.server.secrets['host']
+
+    result = es_server_async.run(es_server_async.session.perform_function())
+    assert result == 42
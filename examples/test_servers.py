@@ -0,0 +1,35 @@
+"""
+Example pytest test functions using the es_servers and es_sessions fixtures
+for pytest-easy-server project.
+"""
+
+# pylint: disable=unused-import
+from pytest_easy_server import es_servers, es_sessions  # noqa: F401
+
+
+def test_servers(es_servers):  # pylint: disable=redefined-outer-name
+    """
+    Example Pytest test function that is invoked once with all servers.
+
+    Parameters:
+      es_servers (list of easy_server.Server): Pytest fixture; the servers to
+        test against
+    """
+    hosts = [server.secrets['host'] for server in es_servers]
+    assert len(set(hosts)) == len(es_servers)
+
+
+def test_sessions(es_servers, es_sessions):
+    # pylint: disable=redefined-outer-name
+    """
+    Example Pytest test function that uses sessions with all servers.
+
+    Parameters:
+      es_servers (list of easy_server.Server): Pytest fixture; the servers to
+        test against
+      es_sessions (list of MySession): Pytest fixture; the sessions with the
+        servers, in the same order
+    """
+    assert len(es_sessions) == len(es_servers)
+    results = [session.perform_function() for session in es_sessions]
+    assert results == [42] * len(es_servers)
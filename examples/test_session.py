@@ -0,0 +1,30 @@
+"""
+Example pytest test functions using the es_session fixture for
+pytest-easy-server project.
+"""
+
+# pylint: disable=unused-import
+from pytest_easy_server import es_server, es_session  # noqa: F401
+
+
+def test_session_1(es_session):  # pylint: disable=redefined-outer-name
+    """
+    Example Pytest test function that tests something using a session.
+
+    Parameters:
+      es_session (MySession): Pytest fixture; the session with the server
+        to be used for the test
+    """
+    assert es_session.perform_function() == 42
+
+
+def test_session_2(es_session):  # pylint: disable=redefined-outer-name
+    """
+    Example Pytest test function that tests something else using a session
+    (which is the same session as in the previous test function).
+
+    Parameters:
+      es_session (MySession): Pytest fixture; the session with the server
+        to be used for the test
+    """
+    assert es_session.is_open
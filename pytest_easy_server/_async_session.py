@@ -0,0 +1,182 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Asyncio sessions with servers, for the es_server_async fixture.
+
+This module does not use the async/await syntax, so that it can be imported on
+Python versions that do not support it. Using it requires the asyncio module
+(Python 3.4 and higher).
+"""
+
+from __future__ import absolute_import, print_function
+
+__all__ = ['AsyncSessionManager', 'AsyncServerSession']
+
+
+class AsyncServerSession(object):
+    """
+    A server with its asyncio session, as provided by the
+    :func:`~pytest_easy_server.es_server_async` fixture.
+    """
+
+    def __init__(self, server, session, loop):
+        self._server = server
+        self._session = session
+        self._loop = loop
+
+    @property
+    def server(self):
+        """
+        :class:`easy_server:easy_server.Server`: The server.
+        """
+        return self._server
+
+    @property
+    def session(self):
+        """
+        object: The asyncio session with the server, as returned by the
+        :func:`~pytest_easy_server.hookspecs.pytest_es_create_async_session`
+        hook.
+        """
+        return self._session
+
+    @property
+    def loop(self):
+        """
+        :class:`py:asyncio.AbstractEventLoop`: The event loop the session
+        was created in.
+        """
+        return self._loop
+
+    def run(self, awaitable):
+        """
+        Run an awaitable (e.g. a coroutine using the session) in the event loop
+        of the session until it is complete, and return its result.
+
+        Parameters:
+
+          awaitable: The awaitable.
+
+        Returns:
+          object: The result of the awaitable.
+        """
+        return self._loop.run_until_complete(awaitable)
+
+
+class AsyncSessionManager(object):
+    """
+    Manager for the asyncio sessions with servers, using an event loop that is
+    owned by the manager.
+
+    The sessions with all servers to test against are opened concurrently
+    when the first session is requested, and are closed concurrently at the
+    end of the pytest session.
+    """
+
+    def __init__(self, hook):
+        """
+        Parameters:
+
+          hook: The pytest hook relay (i.e. `config.hook`).
+        """
+        self._hook = hook
+        self._loop = None
+        # Sessions by server nickname; tuple(server, session, exception)
+        self._sessions = {}
+
+    def _open(self, servers):
+        """
+        Open the sessions with the servers concurrently.
+        """
+        # pylint: disable=import-outside-toplevel
+        import asyncio
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        pending = []  # tuple(server, future)
+        for server in servers:
+            try:
+                awaitable = self._hook.pytest_es_create_async_session(
+                    server=server)
+            except Exception as exc:  # pylint: disable=broad-except
+                self._sessions[server.nickname] = (server, None, exc)
+                continue
+            if awaitable is None:
+                # No hook implementation handles the server
+                awaitable = asyncio.Future(loop=self._loop)
+                awaitable.set_result(None)
+            pending.append(
+                (server, asyncio.ensure_future(awaitable, loop=self._loop)))
+        if not pending:
+            return
+        results = self._loop.run_until_complete(asyncio.gather(
+            *[future for _, future in pending], return_exceptions=True))
+        for (server, _), result in zip(pending, results):
+            if isinstance(result, BaseException):
+                self._sessions[server.nickname] = (server, None, result)
+            else:
+                self._sessions[server.nickname] = (server, result, None)
+
+    def get(self, server, servers):
+        """
+        Get the asyncio session with a server.
+
+        Parameters:
+
+          server (:class:`~easy_server.Server`): The server.
+
+          servers (list of :class:`~easy_server.Server`): All servers to test
+            against. When the first session is requested, the sessions with
+            all of these servers are opened concurrently.
+
+        Returns:
+          :class:`AsyncServerSession`: The server with its session. The
+          session is `None` if no hook implementation created a session for
+          the server.
+
+        Raises:
+          Exception: Any exception raised when creating the session.
+        """
+        if not self._sessions:
+            self._open(servers)
+        if server.nickname not in self._sessions:
+            self._open([server])
+        _, session, exc = self._sessions[server.nickname]
+        if exc is not None:
+            raise exc
+        return AsyncServerSession(server, session, self._loop)
+
+    def close_all(self):
+        """
+        Close all asyncio sessions concurrently and close the event loop.
+        """
+        if self._loop is None:
+            return
+        # pylint: disable=import-outside-toplevel
+        import asyncio
+        awaitables = []
+        for server, session, _ in self._sessions.values():
+            if session is None:
+                continue
+            awaitable = self._hook.pytest_es_close_async_session(
+                server=server, session=session)
+            if awaitable is not None:
+                awaitables.append(
+                    asyncio.ensure_future(awaitable, loop=self._loop))
+        try:
+            if awaitables:
+                self._loop.run_until_complete(asyncio.gather(
+                    *awaitables, return_exceptions=True))
+        finally:
+            self._loop.close()
+            self._sessions = {}
+            self._loop = None
@@ -0,0 +1,109 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+History of the test durations from previous pytest runs, for scheduling the
+longest tests first.
+"""
+
+from __future__ import absolute_import, print_function
+
+__all__ = ['DurationHistory', 'longest_first']
+
+# Key of the duration history in the pytest cache
+HISTORY_CACHE_KEY = 'pytest_easy_server/durations'
+
+# Weight of the duration of the current run when updating the expected
+# duration of a test (exponential moving average).
+HISTORY_WEIGHT = 0.5
+
+
+class DurationHistory(object):
+    """
+    The expected durations of the tests that use the `es_server` fixture,
+    based on their durations in previous pytest runs.
+
+    The history is stored in the pytest cache (i.e. in the .pytest_cache
+    directory), keyed by test node ID. Since the node ID of such a test
+    includes the server nickname, the history is kept per server.
+    """
+
+    def __init__(self, cache):
+        """
+        Parameters:
+
+          cache (:class:`pytest.Cache`): The pytest cache (i.e.
+            `config.cache`), or `None` if the cache is not available. In that
+            case, the history is empty and is not saved.
+        """
+        self._cache = cache
+        durations = cache.get(HISTORY_CACHE_KEY, None) if cache else None
+        # Expected durations by test node ID, in seconds
+        self._durations = durations if isinstance(durations, dict) else {}
+        known = list(self._durations.values())
+        # Expected duration of tests without history
+        self._default = sum(known) / len(known) if known else 0.0
+
+    def __len__(self):
+        return len(self._durations)
+
+    def expected(self, nodeid):
+        """
+        Return the expected duration of a test.
+
+        Parameters:
+
+          nodeid (:term:`string`): Node ID of the test.
+
+        Returns:
+          float: The expected duration in seconds. For tests without history,
+          the average expected duration of the tests with history is returned.
+        """
+        return self._durations.get(nodeid, self._default)
+
+    def update(self, durations):
+        """
+        Update the history with the test durations of the current run, and
+        save it in the pytest cache.
+
+        Parameters:
+
+          durations (dict): Durations of the tests in seconds, by test node ID.
+        """
+        for nodeid, duration in durations.items():
+            previous = self._durations.get(nodeid, None)
+            if previous is not None:
+                duration = HISTORY_WEIGHT * duration + \
+                    (1 - HISTORY_WEIGHT) * previous
+            self._durations[nodeid] = duration
+        if self._cache is not None:
+            self._cache.set(HISTORY_CACHE_KEY, self._durations)
+
+
+def longest_first(groups, expected):
+    """
+    Sort groups of tests such that the groups with the longest expected total
+    duration come first.
+
+    Parameters:
+
+      groups (iterable): The groups; each group is an iterable of tests. The
+        sort is stable.
+
+      expected (callable): Function that returns the expected duration of a
+        test in seconds.
+
+    Returns:
+      list: The groups, sorted.
+    """
+    return sorted(
+        groups, key=lambda group: -sum(expected(test) for test in group))
@@ -11,18 +11,35 @@
 # limitations under the License.
 
 """
-Pytest fixture es_server.
+Pytest fixtures es_server and es_servers.
 """
 
 from __future__ import absolute_import, print_function
 import pytest
 
-import easy_server
+__all__ = ['es_server', 'es_servers']
 
-__all__ = ['es_server']
+# Default scope of the es_server fixture
+DEFAULT_ES_SCOPE = 'module'
 
+# Indicates whether pytest supports dynamic fixture scopes (pytest>=5.2)
+DYNAMIC_SCOPE_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (5, 2)
 
-@pytest.fixture(scope="module")
+
+def es_server_scope(fixture_name, config):
+    # pylint: disable=unused-argument
+    """
+    Return the scope of the es_server fixture, as specified with the
+    --es-scope pytest option.
+
+    This function is used as a dynamic fixture scope.
+    """
+    return config.getvalue('es_scope') or DEFAULT_ES_SCOPE
+
+
+@pytest.fixture(
+    scope=es_server_scope if DYNAMIC_SCOPE_SUPPORTED else DEFAULT_ES_SCOPE)
 def es_server(request):
     """
     Pytest fixture representing a server item from an 'easy-server' file as a
@@ -34,10 +51,44 @@ def es_server(request):
     The servers to test against are controlled with pytest command line options
     as described in :ref:`Controlling which servers to test against`.
 
+    The scope of the fixture is 'module' by default and can be changed with
+    the ``--es-scope`` pytest option, see :ref:`Controlling the fixture scope`.
+
     Returns:
       :class:`easy_server:easy_server.Server`:
       Server item for each server to test against.
     """
+    # pylint: disable=import-outside-toplevel
+    import easy_server
+    from .plugin import load_es_secrets
     es_obj = request.param
     assert isinstance(es_obj, easy_server.Server)
+    load_es_secrets(request.config, es_obj)
     return es_obj
+
+
+@pytest.fixture(scope='session')
+def es_servers(request):
+    """
+    Pytest fixture representing all servers to test against, as a list of
+    :class:`easy_server:easy_server.Server` objects.
+
+    In contrast to the :func:`~pytest_easy_server.es_server` fixture, testcases
+    using this fixture are invoked only once, with all servers. This is useful
+    for testcases that check the behavior across servers (e.g. replication
+    between them).
+
+    The servers to test against are controlled with pytest command line
+    options as described in :ref:`Controlling which servers to test against`.
+    See :ref:`Using the es_servers fixture` for details.
+
+    Returns:
+      list of :class:`easy_server:easy_server.Server`:
+      The servers to test against, in the order defined in the server file.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .plugin import get_es_obj_list, load_es_secrets
+    es_obj_list = list(get_es_obj_list(request.config))
+    for es_obj in es_obj_list:
+        load_es_secrets(request.config, es_obj)
+    return es_obj_list
@@ -0,0 +1,145 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pytest fixtures es_session, es_sessions and es_server_async.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+
+__all__ = ['es_session', 'es_sessions', 'es_server_async']
+
+
+@pytest.fixture(scope="function")
+def es_session(request, es_server):
+    """
+    Pytest fixture representing a session with the server from the
+    :func:`~pytest_easy_server.es_server` fixture.
+
+    The session is taken from a pool of live sessions that is maintained for
+    the entire pytest session, and is returned to the pool after the test.
+    Sessions are created using the
+    :func:`~pytest_easy_server.hookspecs.pytest_es_create_session` hook, which
+    must be implemented by the user (e.g. in a conftest.py file).
+    See :ref:`Using the es_session fixture` for details.
+
+    Returns:
+      object: Session with the server to test against, as returned by the
+      :func:`~pytest_easy_server.hookspecs.pytest_es_create_session` hook.
+    """
+    # pylint: disable=protected-access
+    pool = request.config._es_session_pool
+    check_pool_size(request, pool)
+    session = pool.checkout(es_server)
+    if session is None:
+        pytest.fail("No implementation of the pytest_es_create_session hook "
+                    "returned a session for server {n}".
+                    format(n=es_server.nickname))
+    try:
+        yield session
+    finally:
+        pool.checkin(es_server, session)
+
+
+@pytest.fixture(scope="function")
+def es_sessions(request, es_servers):
+    """
+    Pytest fixture representing sessions with all servers from the
+    :func:`~pytest_easy_server.es_servers` fixture.
+
+    The sessions are taken from the same pool of live sessions as for the
+    :func:`~pytest_easy_server.es_session` fixture, concurrently for all
+    servers, and are returned to the pool after the test.
+    See :ref:`Using the es_servers fixture` for details.
+
+    Returns:
+      list of object: Sessions with the servers to test against, in the order
+      of the servers in the :func:`~pytest_easy_server.es_servers` fixture, as
+      returned by the
+      :func:`~pytest_easy_server.hookspecs.pytest_es_create_session` hook.
+    """
+    # pylint: disable=protected-access
+    pool = request.config._es_session_pool
+    check_pool_size(request, pool)
+    sessions = pool.checkout_many(es_servers)
+    try:
+        for server, session in zip(es_servers, sessions):
+            if session is None:
+                pytest.fail("No implementation of the "
+                            "pytest_es_create_session hook returned a "
+                            "session for server {n}".
+                            format(n=server.nickname))
+        yield sessions
+    finally:
+        for server, session in zip(es_servers, sessions):
+            if session is not None:
+                pool.checkin(server, session)
+
+
+def check_pool_size(request, pool):
+    """
+    Fail the test if it uses both the es_session and es_sessions fixtures
+    and the pool of sessions cannot provide two sessions with a server at the
+    same time. Otherwise, the test would wait forever for the session it
+    holds itself.
+
+    Parameters:
+
+      request (:class:`pytest.FixtureRequest`): The request of the fixture.
+
+      pool (:class:`~pytest_easy_server._session_pool.SessionPool`): The pool
+        of sessions.
+    """
+    if pool.max_size < 2 and 'es_session' in request.fixturenames and \
+            'es_sessions' in request.fixturenames:
+        pytest.fail("Test {t} uses both the es_session and es_sessions "
+                    "fixtures, which requires --es-session-pool-size=2 or "
+                    "higher (is {s})".
+                    format(t=request.node.nodeid, s=pool.max_size),
+                    pytrace=False)
+
+
+@pytest.fixture(scope="function")
+def es_server_async(request, es_server):
+    """
+    Pytest fixture representing the server from the
+    :func:`~pytest_easy_server.es_server` fixture together with an asyncio
+    session with that server.
+
+    When this fixture is set up for the first time in a pytest session, the
+    asyncio sessions with all servers to test against are opened concurrently
+    in an event loop that is owned by the plugin, using the
+    :func:`~pytest_easy_server.hookspecs.pytest_es_create_async_session` hook,
+    which must be implemented by the user (e.g. in a conftest.py file).
+    The sessions are closed at the end of the pytest session.
+    See :ref:`Using the es_server_async fixture` for details.
+
+    Returns:
+      AsyncServerSession: Object with attributes ``server`` (the server),
+      ``session`` (the asyncio session) and ``loop`` (the event loop), and a
+      method ``run(awaitable)`` that runs an awaitable in that event loop and
+      returns its result.
+    """
+    # pylint: disable=protected-access,import-outside-toplevel
+    from .plugin import get_es_obj_list
+    try:
+        import asyncio  # noqa: F401 pylint: disable=unused-import
+    except ImportError:
+        pytest.skip("The es_server_async fixture requires asyncio")
+    manager = request.config._es_async_session_manager
+    server_session = manager.get(es_server, get_es_obj_list(request.config))
+    if server_session.session is None:
+        pytest.fail("No implementation of the pytest_es_create_async_session "
+                    "hook returned a session for server {n}".
+                    format(n=es_server.nickname))
+    return server_session
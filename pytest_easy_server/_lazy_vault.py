@@ -0,0 +1,335 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Lazy loading of the vault file.
+
+The vault file is loaded (and decrypted) only when the secrets of a server are
+accessed for the first time, so that pytest runs that do not use any servers
+(e.g. with --collect-only) do not decrypt the vault file, and do not access
+the keyring service or prompt for the vault password.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import threading
+
+import easy_vault
+import easy_server
+# easy-server does not provide a public way to defer loading the vault file,
+# so LazyServerFile uses its internals. The version of easy-server is limited
+# in requirements.txt accordingly.
+from easy_server._server_file import _load_server_file
+
+from ._schema_validation import validate_user_defined, validate_vault_secrets
+
+__all__ = ['LazyVault', 'LazyServerFile', 'LazySecretsServer']
+
+
+class LazyVault(object):
+    """
+    A vault file that is loaded when the secrets are accessed for the first
+    time.
+
+    Loading the vault file is thread-safe. If loading fails, the exception is
+    raised again on subsequent accesses, without loading the vault file again.
+    """
+
+    def __init__(self, filepath, password=None, use_keyring=True,
+                 use_prompting=True, server_schema=None, password_broker=None):
+        """
+        Parameters:
+
+          filepath (:term:`string`): Path name of the vault file.
+
+          password (:term:`string`): Password for the vault file, or `None`.
+
+          use_keyring (bool): Enable the use of the keyring service for the
+            password.
+
+          use_prompting (bool): Enable prompting for the password.
+
+          server_schema (:term:`JSON schema`): JSON schema for validating the
+            server items in the vault file, or `None`.
+
+          password_broker (PasswordBroker): Broker for retrieving the password
+            of an encrypted vault file, or `None`. If specified, it is used
+            instead of the `password`, `use_keyring` and `use_prompting`
+            parameters.
+        """
+        self._filepath = os.path.abspath(filepath)
+        self._kwargs = dict(
+            password=password, use_keyring=use_keyring,
+            use_prompting=use_prompting)
+        self._server_schema = server_schema
+        self._password_broker = password_broker
+        self._lock = threading.Lock()
+        self._vault = None
+        self._exc = None
+
+    @property
+    def filepath(self):
+        """
+        :term:`string`: Absolute path name of the vault file.
+        """
+        return self._filepath
+
+    @property
+    def loaded(self):
+        """
+        bool: Whether the vault file has been loaded.
+        """
+        return self._vault is not None
+
+    @property
+    def server_schema(self):
+        """
+        :term:`JSON schema`: JSON schema for validating the server items in
+        the vault file, or `None`.
+        """
+        return self._server_schema
+
+    def is_encrypted(self):
+        """
+        Return whether the vault file is encrypted, without decrypting it.
+
+        Returns:
+          bool: Boolean indicating whether the vault file is encrypted.
+
+        Raises:
+          :exc:`easy_server.VaultFileOpenError`: Error with opening the vault
+            file.
+        """
+        try:
+            return easy_vault.EasyVault(self._filepath).is_encrypted()
+        except easy_vault.EasyVaultFileError as exc:
+            new_exc = easy_server.VaultFileOpenError(str(exc))
+            new_exc.__cause__ = None
+            raise new_exc  # VaultFileOpenError
+
+    def load(self):
+        """
+        Load the vault file, if not yet loaded.
+
+        Returns:
+          :class:`easy_server.VaultFile`: The loaded vault file.
+
+        Raises:
+          :exc:`easy_server.VaultFileException`: Error with loading the vault
+            file.
+        """
+        with self._lock:
+            if self._vault is None and self._exc is None:
+                try:
+                    # The server items are validated with a compiled
+                    # validator instead of by VaultFile.
+                    vault = self._load_vault()
+                    if self._server_schema:
+                        validate_vault_secrets(vault, self._server_schema)
+                    self._vault = vault
+                except easy_server.VaultFileException as exc:
+                    self._exc = exc
+            if self._exc is not None:
+                raise self._exc
+            return self._vault
+
+    def _load_vault(self):
+        """
+        Load the vault file, getting the password from the password broker
+        if there is one.
+        """
+        broker = self._password_broker
+        if broker is None:
+            return easy_server.VaultFile(self._filepath, **self._kwargs)
+        password = broker.get_password(self._filepath) \
+            if self.is_encrypted() else None
+        vault = easy_server.VaultFile(
+            self._filepath, password=password, use_keyring=False,
+            use_prompting=False)
+        if password is not None:
+            broker.confirm_password(self._filepath)
+        return vault
+
+    def get_secrets(self, nickname):
+        """
+        Get the secrets of a server, loading the vault file if needed.
+
+        Parameters:
+
+          nickname (:term:`string`): Nickname of the server.
+
+        Returns:
+          dict: The secrets of the server, or `None` if the vault file does
+          not have secrets for the server.
+
+        Raises:
+          :exc:`easy_server.VaultFileException`: Error with loading the vault
+            file.
+        """
+        vault = self.load()
+        if nickname not in vault.nicknames:
+            return None
+        return vault.get_secrets(nickname)
+
+
+class LazySecretsServer(easy_server.Server):
+    """
+    A server whose secrets are retrieved from a :class:`LazyVault` when they
+    are accessed for the first time.
+    """
+
+    def __init__(self, nickname, server_dict, lazy_vault):
+        """
+        Parameters:
+
+          nickname (:term:`string`): Nickname of the server.
+
+          server_dict (dict): Server item from the server file.
+
+          lazy_vault (:class:`LazyVault`): The vault file, or `None` if the
+            server file does not specify a vault file.
+        """
+        super(LazySecretsServer, self).__init__(nickname, server_dict, None)
+        self._lazy_vault = lazy_vault
+        self._secrets_loaded = lazy_vault is None
+
+    @property
+    def secrets(self):
+        """
+        dict: The secrets of the server from the vault file, or `None`.
+
+        The vault file is loaded when the secrets of any server are accessed
+        for the first time.
+
+        Raises:
+          :exc:`easy_server.VaultFileException`: Error with loading the vault
+            file.
+        """
+        self.load_secrets()
+        return self._secrets
+
+    @property
+    def lazy_vault(self):
+        """
+        :class:`LazyVault`: The vault file the secrets are retrieved from, or
+        `None` if the server file does not specify a vault file.
+        """
+        return self._lazy_vault
+
+    @property
+    def secrets_loaded(self):
+        """
+        bool: Whether the secrets of the server have been retrieved from the
+        vault file.
+        """
+        return self._secrets_loaded
+
+    def load_secrets(self):
+        """
+        Retrieve the secrets of the server from the vault file, if not yet
+        done.
+
+        Raises:
+          :exc:`easy_server.VaultFileException`: Error with loading the vault
+            file.
+        """
+        if not self._secrets_loaded:
+            self._secrets = self._lazy_vault.get_secrets(self.nickname)
+            self._secrets_loaded = True
+
+
+class LazyServerFile(easy_server.ServerFile):
+    """
+    A server file whose vault file is loaded only when the secrets of one of
+    its servers are accessed for the first time.
+
+    The servers returned by this class are :class:`LazySecretsServer`
+    objects.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, filepath, password=None, use_keyring=True,
+                 use_prompting=True, user_defined_schema=None,
+                 group_user_defined_schema=None, vault_server_schema=None,
+                 password_broker=None):
+        """
+        The parameters are the same as for
+        :class:`easy_server:easy_server.ServerFile`, except that the vault file
+        is not loaded, and the additional `password_broker` parameter (see
+        :class:`LazyVault`).
+
+        Raises:
+          :exc:`easy_server.ServerFileException`: Error with loading the server
+            file.
+        """
+        self._filepath = os.path.abspath(filepath)
+        self._user_defined_schema = user_defined_schema
+        self._group_user_defined_schema = group_user_defined_schema
+        self._vault_server_schema = vault_server_schema
+
+        # The user-defined portion of the server items is validated with a
+        # compiled validator instead of by _load_server_file().
+        self._data = _load_server_file(
+            filepath, None, group_user_defined_schema)
+        if user_defined_schema:
+            validate_user_defined(
+                self._data['servers'], user_defined_schema, filepath)
+
+        self._vault_file = self._data['vault_file']
+        if self._vault_file:
+            if not os.path.isabs(self._vault_file):
+                self._vault_file = os.path.join(
+                    os.path.dirname(self._filepath), self._vault_file)
+            self._vault = LazyVault(
+                self._vault_file, password=password, use_keyring=use_keyring,
+                use_prompting=use_prompting,
+                server_schema=vault_server_schema,
+                password_broker=password_broker)
+        else:
+            self._vault = None
+
+        self._servers = self._data['servers']
+        self._server_groups = self._data['server_groups']
+        self._default = self._data['default']
+
+    @property
+    def lazy_vault(self):
+        """
+        :class:`LazyVault`: The vault file, or `None` if the server file does
+        not specify a vault file.
+        """
+        return self._vault
+
+    def get_server(self, nickname):
+        """
+        Get the server for a server nickname, without loading the vault file.
+
+        Parameters:
+
+          nickname (:term:`string`): Server nickname.
+
+        Returns:
+          :class:`LazySecretsServer`: The server.
+
+        Raises:
+          :exc:`py:KeyError`: Nickname not found.
+        """
+        try:
+            server_dict = self._servers[nickname]
+        except KeyError:
+            new_exc = KeyError(
+                "Server with nickname {!r} not found in server "
+                "file {!r}".
+                format(nickname, self._filepath))
+            new_exc.__cause__ = None
+            raise new_exc  # KeyError
+        return LazySecretsServer(nickname, server_dict, self._vault)
@@ -0,0 +1,353 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Load-test mode: repeated execution of test functions with concurrency, and
+statistics of the throughput, error rate and latencies by server, for the
+--es-load option.
+"""
+
+from __future__ import absolute_import, print_function
+import math
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from ._profiler import TIMER, percentile, format_table
+
+__all__ = ['run_load', 'summarize_run', 'LoadStats']
+
+# Upper bounds of the buckets of the latency histogram, in milliseconds. The
+# last bucket has no upper bound.
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Maximum width of the bars of the latency histogram, in characters
+HISTOGRAM_WIDTH = 40
+
+# Relative accuracy of the latency percentiles that are estimated across
+# multiple load-test runs. The latencies are counted in buckets whose bounds
+# grow by the factor SKETCH_GAMMA, so that any latency in a bucket is within
+# that relative distance of the estimate for the bucket.
+SKETCH_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+# Smallest latency in seconds that is distinguished in the percentile buckets
+SKETCH_MIN_LATENCY = 1e-6
+
+
+def run_load(func, kwargs, iterations, duration, concurrency):
+    """
+    Call a test function repeatedly from concurrent threads.
+
+    Failures of the test function (exceptions, including those raised by
+    :func:`pytest.fail`) are counted as errors. If the test function is
+    skipped, or if pytest is exited or interrupted, no further iterations are
+    started and the exception is raised after all threads have finished.
+
+    Parameters:
+
+      func (callable): The test function.
+
+      kwargs (dict): Keyword arguments for the test function.
+
+      iterations (int): Number of times the test function is called, if
+        `duration` is `None`.
+
+      duration (float): Duration in seconds for calling the test function
+        repeatedly, or `None` for using the number of iterations.
+
+      concurrency (int): Number of threads that call the test function
+        concurrently.
+
+    Returns:
+      tuple(list, list): Tuple of:
+      * list of float: Latencies of the iterations in seconds.
+      * list of Exception: Exceptions of the failed iterations.
+
+    Raises:
+      BaseException: The test function was skipped, or pytest was exited or
+        interrupted.
+    """
+    lock = threading.Lock()
+    deadline = TIMER() + duration if duration is not None else None
+    state = dict(started=0, abort=None)
+    latencies = []
+    errors = []
+
+    def next_iteration():
+        """Return whether another iteration should be started."""
+        with lock:
+            if state['abort'] is not None:
+                return False
+            if deadline is not None:
+                return TIMER() < deadline
+            if state['started'] >= iterations:
+                return False
+            state['started'] += 1
+            return True
+
+    def worker():
+        """Call the test function until the iterations are done."""
+        while next_iteration():
+            error = None
+            start = TIMER()
+            try:
+                func(**kwargs)
+            except (Exception, pytest.fail.Exception) as exc:
+                # pylint: disable=broad-except
+                error = exc
+            except BaseException as exc:
+                # pylint: disable=broad-except
+                with lock:
+                    if state['abort'] is None:
+                        state['abort'] = exc
+                return
+            latency = TIMER() - start
+            with lock:
+                latencies.append(latency)
+                if error is not None:
+                    errors.append(error)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if state['abort'] is not None:
+        raise state['abort']
+    return latencies, errors
+
+
+def summarize_run(latencies, errors, duration):
+    """
+    Return the aggregated results of a load-test run of a test function.
+
+    The aggregated results have a size that does not depend on the number of
+    iterations, so that they can be passed to the pytest process cheaply, and
+    they can be merged across load-test runs by :meth:`LoadStats.add`.
+
+    Parameters:
+
+      latencies (list of float): Latencies of the iterations in seconds.
+
+      errors (int): Number of failed iterations.
+
+      duration (float): Duration of the load-test run in seconds.
+
+    Returns:
+      dict: The aggregated results, with items 'iterations', 'errors',
+      'duration', 'min', 'max', 'p50', 'p95' (latencies in seconds),
+      'histogram' (list of iteration counts for the buckets in
+      HISTOGRAM_BOUNDS) and 'sketch' (list of [index, count] pairs of the
+      iteration counts for the percentile buckets, see SKETCH_GAMMA).
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+    histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+    sketch = {}
+    for latency in latencies:
+        histogram[_bucket(latency)] += 1
+        index = _sketch_index(latency)
+        sketch[index] = sketch.get(index, 0) + 1
+    return dict(
+        iterations=count,
+        errors=errors,
+        duration=duration,
+        min=latencies[0] if count else 0.0,
+        max=latencies[-1] if count else 0.0,
+        p50=percentile(latencies, 50) if count else 0.0,
+        p95=percentile(latencies, 95) if count else 0.0,
+        histogram=histogram,
+        sketch=[[index, sketch[index]] for index in sorted(sketch)],
+    )
+
+
+class LoadStats(object):
+    """
+    Statistics of the load-test runs, by server.
+
+    The latency percentiles of a server are exact if the server had a single
+    load-test run. Across multiple load-test runs, they are estimated from the
+    merged percentile buckets of the runs, within a relative accuracy of
+    SKETCH_ACCURACY.
+    """
+
+    def __init__(self):
+        # Statistics by server nickname, as dicts with items 'runs' (number
+        # of load-test runs with iterations), 'iterations', 'errors',
+        # 'duration', 'min', 'max', 'p50', 'p95', 'histogram' and 'sketch'
+        # (dict of iteration counts by percentile bucket index). Times are in
+        # seconds.
+        self._servers = OrderedDict()
+
+    def add(self, nickname, summary):
+        """
+        Add the aggregated results of a load-test run of a test function.
+
+        Parameters:
+
+          nickname (:term:`string`): Nickname of the server.
+
+          summary (dict): The aggregated results of the load-test run, as
+            returned by :func:`summarize_run`.
+        """
+        stats = self._servers.get(nickname, None)
+        if stats is None:
+            stats = dict(
+                runs=0, iterations=0, errors=0, duration=0.0, min=None,
+                max=0.0, p50=0.0, p95=0.0,
+                histogram=[0] * (len(HISTOGRAM_BOUNDS) + 1), sketch={})
+            self._servers[nickname] = stats
+        stats['errors'] += summary['errors']
+        stats['duration'] += summary['duration']
+        if summary['iterations']:
+            stats['runs'] += 1
+            if stats['runs'] == 1:
+                stats['p50'] = summary['p50']
+                stats['p95'] = summary['p95']
+            stats['iterations'] += summary['iterations']
+            if stats['min'] is None or summary['min'] < stats['min']:
+                stats['min'] = summary['min']
+            stats['max'] = max(stats['max'], summary['max'])
+        for i, count in enumerate(summary['histogram']):
+            stats['histogram'][i] += count
+        for index, count in summary['sketch']:
+            stats['sketch'][index] = stats['sketch'].get(index, 0) + count
+
+    def as_dict(self):
+        """
+        Return the statistics by server, in the order in which the servers
+        were first tested.
+
+        Returns:
+          dict: Statistics by server nickname, as dicts with items
+          'iterations', 'errors', 'error_rate' (fraction of failed
+          iterations), 'throughput' (iterations per second of load-test run
+          time), 'p50', 'p95', 'max' (latencies in seconds) and 'histogram'
+          (list of iteration counts for the buckets in HISTOGRAM_BOUNDS).
+        """
+        result = OrderedDict()
+        for nickname, stats in self._servers.items():
+            count = stats['iterations']
+            p50, p95 = stats['p50'], stats['p95']
+            if count and stats['runs'] > 1:
+                p50, p95 = [
+                    min(max(_sketch_percentile(stats['sketch'], count, pct),
+                            stats['min']), stats['max'])
+                    for pct in (50, 95)]
+            result[nickname] = dict(
+                iterations=count,
+                errors=stats['errors'],
+                error_rate=float(stats['errors']) / count if count else 0.0,
+                throughput=count / stats['duration']
+                if stats['duration'] else 0.0,
+                p50=p50,
+                p95=p95,
+                max=stats['max'],
+                histogram=list(stats['histogram']),
+            )
+        return result
+
+    def format_table(self):
+        """
+        Return the statistics by server as a table for display.
+
+        Returns:
+          list of :term:`string`: The lines of the table.
+        """
+        header = ('Server', 'Iterations', 'Errors [%]', 'Throughput [/s]',
+                  'P50 [ms]', 'P95 [ms]', 'Max [ms]')
+        rows = []
+        for nickname, stats in self.as_dict().items():
+            rows.append((
+                nickname,
+                str(stats['iterations']),
+                '{:.1f}'.format(stats['error_rate'] * 100),
+                '{:.1f}'.format(stats['throughput']),
+                '{:.3f}'.format(stats['p50'] * 1000),
+                '{:.3f}'.format(stats['p95'] * 1000),
+                '{:.3f}'.format(stats['max'] * 1000),
+            ))
+        return format_table(header, rows)
+
+    def format_histograms(self):
+        """
+        Return the latency histograms by server for display.
+
+        Returns:
+          list of :term:`string`: The lines of the histograms.
+        """
+        labels = ['<= {} ms'.format(b) for b in HISTOGRAM_BOUNDS] + \
+            ['> {} ms'.format(HISTOGRAM_BOUNDS[-1])]
+        label_width = max(len(label) for label in labels)
+        lines = []
+        for nickname, stats in self.as_dict().items():
+            histogram = stats['histogram']
+            used = [i for i, count in enumerate(histogram) if count]
+            if not used:
+                continue
+            lines.append("Latencies for server {n}:".format(n=nickname))
+            max_count = max(histogram)
+            count_width = len(str(max_count))
+            for i in range(used[0], used[-1] + 1):
+                bar = '#' * int(round(
+                    float(histogram[i]) / max_count * HISTOGRAM_WIDTH))
+                lines.append("  {l}  {c}  {b}".format(
+                    l=labels[i].rjust(label_width),
+                    c=str(histogram[i]).rjust(count_width), b=bar).rstrip())
+        return lines
+
+
+def _sketch_index(latency):
+    """
+    Return the index of the percentile bucket for a latency in seconds.
+    """
+    latency = max(latency, SKETCH_MIN_LATENCY)
+    return int(math.ceil(math.log(latency) / math.log(SKETCH_GAMMA)))
+
+
+def _sketch_percentile(sketch, count, percent):
+    """
+    Return the estimated percentile of the latencies in percentile buckets,
+    using the nearest-rank method.
+
+    Parameters:
+
+      sketch (dict): Iteration counts by percentile bucket index.
+
+      count (int): Total number of iterations. Must not be 0.
+
+      percent (int): The percentile, in the range 0 to 100.
+
+    Returns:
+      float: The estimated latency in seconds.
+    """
+    rank = max(int(math.ceil(percent / 100.0 * count)), 1)
+    seen = 0
+    for index in sorted(sketch):
+        seen += sketch[index]
+        if seen >= rank:
+            break
+    # pylint: disable=undefined-loop-variable
+    return 2 * SKETCH_GAMMA ** index / (SKETCH_GAMMA + 1)
+
+
+def _bucket(latency):
+    """
+    Return the index of the histogram bucket for a latency in seconds.
+    """
+    latency_ms = latency * 1000
+    for i, bound in enumerate(HISTOGRAM_BOUNDS):
+        if latency_ms <= bound:
+            return i
+    return len(HISTOGRAM_BOUNDS)
@@ -0,0 +1,254 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parallel execution of the tests for different servers within a single pytest
+invocation.
+
+The collected test items are partitioned by server, and each partition is run
+in a child process that is forked from the pytest process. The test reports
+are sent back to the pytest process and are reported there in the normal way.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import signal
+import threading
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:  # py2
+    import Queue as queue
+
+from _pytest.reports import TestReport
+
+__all__ = ['parallel_supported', 'partition_items', 'run_parallel']
+
+
+def parallel_supported():
+    """
+    Return whether parallel execution is supported on this platform.
+
+    Parallel execution requires :func:`py:os.fork`, which is not available on
+    Windows.
+    """
+    return hasattr(os, 'fork')
+
+
+def partition_items(items, item_nickname):
+    """
+    Partition test items by server.
+
+    Parameters:
+
+      items (list of :class:`pytest.Item`): The test items.
+
+      item_nickname (callable): Function that returns the server nickname
+        for a test item, or `None` if the test item does not use the
+        `es_server` fixture.
+
+    Returns:
+      list of list of :class:`pytest.Item`: The partitions, in the order of
+      the first occurrence of each server. The test items that do not use the
+      `es_server` fixture are in a partition of their own. The order of the
+      test items within each partition is preserved.
+    """
+    partitions = OrderedDict()
+    for item in items:
+        partitions.setdefault(item_nickname(item), []).append(item)
+    return list(partitions.values())
+
+
+class _ReportRelay(object):
+    """
+    Pytest plugin that is registered in the child processes and sends the
+    test reports to the pytest process.
+    """
+
+    def __init__(self, config, wfile):
+        self._config = config
+        self._wfile = wfile
+
+    def send(self, kind, **kwargs):
+        """Send a message to the pytest process."""
+        kwargs['kind'] = kind
+        self._wfile.write(json.dumps(kwargs) + '\n')
+        self._wfile.flush()
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        """Relay the start of a test."""
+        self.send('logstart', nodeid=nodeid, location=location)
+
+    def pytest_runtest_logreport(self, report):
+        """Relay a test report."""
+        data = self._config.hook.pytest_report_to_serializable(
+            config=self._config, report=report)
+        self.send('logreport', nodeid=report.nodeid, data=data)
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        """Relay the end of a test."""
+        self.send('logfinish', nodeid=nodeid, location=location)
+
+
+def _run_child(session, items, wfd, finish_child):
+    """
+    Run the test items of a partition in the (forked) child process, and
+    exit the child process.
+    """
+    exit_code = 1
+    try:
+        config = session.config
+        wfile = os.fdopen(wfd, 'w')
+        # The test results are reported by the pytest process.
+        terminal_reporter = config.pluginmanager.get_plugin(
+            'terminalreporter')
+        if terminal_reporter is not None:
+            config.pluginmanager.unregister(terminal_reporter)
+        config.pluginmanager.register(_ReportRelay(config, wfile))
+        for i, item in enumerate(items):
+            nextitem = items[i + 1] if i + 1 < len(items) else None
+            item.config.hook.pytest_runtest_protocol(
+                item=item, nextitem=nextitem)
+            if session.shouldfail or session.shouldstop:
+                break
+        if finish_child is not None:
+            finish_child(config)
+        wfile.close()
+        exit_code = 0
+    finally:
+        os._exit(exit_code)  # pylint: disable=protected-access
+
+
+def _read_child(index, rfd, msg_queue):
+    """
+    Read the messages from a child process and put them into the queue.
+    A message `None` indicates the end of the child process output.
+    """
+    with os.fdopen(rfd, 'r') as rfile:
+        for line in rfile:
+            msg_queue.put((index, json.loads(line)))
+    msg_queue.put((index, None))
+
+
+def _report_crashed_item(item, started, status):
+    """
+    Report a test item that was not completed because its child process
+    terminated unexpectedly.
+    """
+    if os.WIFSIGNALED(status):
+        reason = "by signal {}".format(os.WTERMSIG(status))
+    else:
+        reason = "with exit code {}".format(os.WEXITSTATUS(status))
+    ihook = item.ihook
+    if not started:
+        ihook.pytest_runtest_logstart(
+            nodeid=item.nodeid, location=item.location)
+    report = TestReport(
+        item.nodeid, item.location, dict((k, 1) for k in item.keywords),
+        'failed',
+        "Child process for parallel execution terminated unexpectedly "
+        "{r}".format(r=reason),
+        'call')
+    ihook.pytest_runtest_logreport(report=report)
+    ihook.pytest_runtest_logfinish(nodeid=item.nodeid, location=item.location)
+
+
+def run_parallel(session, partitions, num_workers, finish_child=None):
+    """
+    Run the partitions of test items in parallel child processes, and report
+    their results in this process.
+
+    Parameters:
+
+      session (:class:`pytest.Session`): The pytest session.
+
+      partitions (list of list of :class:`pytest.Item`): The partitions of
+        test items, see :func:`partition_items`.
+
+      num_workers (int): Maximum number of child processes running at the
+        same time.
+
+      finish_child (callable): Function that is called with the pytest config
+        object in each child process after its test items have run, or `None`.
+        The child processes do not run the pytest session finish processing,
+        so this function can be used to release resources.
+    """
+    config = session.config
+    msg_queue = queue.Queue()
+    pending = list(enumerate(partitions))
+    # Running child processes, by partition index.
+    # Value: tuple(pid, items by nodeid, started nodeids, finished nodeids)
+    running = {}
+    stopping = False
+
+    # When stopping, no further child processes are started, so the pending
+    # partitions are not waited for.
+    while running or (pending and not stopping):
+
+        while pending and len(running) < num_workers and not stopping:
+            index, items = pending.pop(0)
+            rfd, wfd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(rfd)
+                _run_child(session, items, wfd, finish_child)  # no return
+            os.close(wfd)
+            thread = threading.Thread(
+                target=_read_child, args=(index, rfd, msg_queue))
+            thread.daemon = True
+            thread.start()
+            running[index] = (
+                pid, OrderedDict((item.nodeid, item) for item in items),
+                set(), set())
+
+        index, msg = msg_queue.get()
+        pid, items_by_id, started, finished = running[index]
+
+        if msg is None:
+            # The child process has ended
+            _, status = os.waitpid(pid, 0)
+            del running[index]
+            if not stopping:
+                for nodeid, item in items_by_id.items():
+                    if nodeid not in finished:
+                        _report_crashed_item(item, nodeid in started, status)
+            continue
+
+        nodeid = msg['nodeid']
+        item = items_by_id[nodeid]
+        if msg['kind'] == 'logstart':
+            started.add(nodeid)
+            item.ihook.pytest_runtest_logstart(
+                nodeid=nodeid, location=tuple(msg['location']))
+        elif msg['kind'] == 'logreport':
+            data = msg['data']
+            # JSON has turned the tuples in the serialized report into lists
+            for key in ('location', 'longrepr'):
+                if isinstance(data.get(key, None), list):
+                    data[key] = tuple(data[key])
+            report = config.hook.pytest_report_from_serializable(
+                config=config, data=data)
+            item.ihook.pytest_runtest_logreport(report=report)
+        else:  # 'logfinish'
+            finished.add(nodeid)
+            item.ihook.pytest_runtest_logfinish(
+                nodeid=nodeid, location=tuple(msg['location']))
+
+        if (session.shouldfail or session.shouldstop) and not stopping:
+            # Stop all child processes, as pytest would stop the test run.
+            stopping = True
+            for child_pid, _, _, _ in running.values():
+                try:
+                    os.kill(child_pid, signal.SIGTERM)
+                except OSError:
+                    pass
@@ -0,0 +1,134 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Broker for the vault file passwords in interactive mode.
+
+The password of a vault file is retrieved from the keyring service (or by
+prompting for it) once per pytest session, and is then handed out to every
+later load of the vault file in the same process.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import threading
+
+import easy_vault
+
+__all__ = ['PasswordBroker']
+
+
+class PasswordBroker(object):
+    """
+    Broker for the vault file passwords of a pytest session.
+
+    The password of a vault file is retrieved from the keyring service, or if
+    not found there, by prompting for it, when it is needed for the first
+    time. Subsequent requests for the password of the same vault file return
+    the password without accessing the keyring service or prompting again.
+
+    Retrieving the passwords is thread-safe. Concurrent requests for the
+    password of a vault file wait for the first request to complete, so that
+    the user is prompted at most once per vault file.
+    """
+
+    def __init__(self, use_keyring=True, use_prompting=True, passwords=None):
+        """
+        Parameters:
+
+          use_keyring (bool): Enable the use of the keyring service for
+            retrieving and storing the passwords.
+
+          use_prompting (bool): Enable prompting for the passwords.
+
+          passwords (dict): Known passwords by absolute vault file path name,
+            e.g. from the pytest-xdist controller, or `None`.
+        """
+        self._use_keyring = use_keyring
+        self._use_prompting = use_prompting
+        self._lock = threading.Lock()
+        # Passwords by absolute vault file path name
+        self._passwords = dict(passwords or {})
+        # Absolute vault file path names whose password was prompted for and
+        # still needs to be stored in the keyring service
+        self._prompted = set()
+
+    def get_password(self, filepath):
+        """
+        Return the password for a vault file.
+
+        Parameters:
+
+          filepath (:term:`string`): Path name of the vault file.
+
+        Returns:
+          :term:`string`: The password, or `None` if the password was not
+          found in the keyring service and prompting is disabled.
+
+        Raises:
+          :exc:`easy_vault.KeyringNotAvailable`: No keyring service available.
+          :exc:`easy_vault.KeyringError`: An error happened in the keyring
+            service.
+        """
+        filepath = os.path.abspath(filepath)
+        with self._lock:
+            try:
+                return self._passwords[filepath]
+            except KeyError:
+                pass
+            password = None
+            if self._use_keyring:
+                password = easy_vault.Keyring().get_password(filepath)
+            if password is None and self._use_prompting:
+                password = easy_vault.get_password(
+                    filepath, use_keyring=False, use_prompting=True)
+                self._prompted.add(filepath)
+            if password is not None:
+                self._passwords[filepath] = password
+            return password
+
+    def confirm_password(self, filepath):
+        """
+        Confirm that the password for a vault file is valid, i.e. that the
+        vault file was successfully decrypted with it.
+
+        If the password was prompted for, it is stored in the keyring service
+        (if enabled), so that subsequent pytest sessions do not prompt again.
+
+        Parameters:
+
+          filepath (:term:`string`): Path name of the vault file.
+
+        Raises:
+          :exc:`easy_vault.KeyringNotAvailable`: No keyring service available.
+          :exc:`easy_vault.KeyringError`: An error happened in the keyring
+            service.
+        """
+        filepath = os.path.abspath(filepath)
+        with self._lock:
+            if filepath not in self._prompted:
+                return
+            self._prompted.discard(filepath)
+            if self._use_keyring:
+                easy_vault.Keyring().set_password(
+                    filepath, self._passwords[filepath])
+
+    def passwords(self):
+        """
+        Return the known passwords, e.g. for passing them to pytest-xdist
+        workers.
+
+        Returns:
+          dict: Passwords by absolute vault file path name.
+        """
+        with self._lock:
+            return dict(self._passwords)
@@ -0,0 +1,127 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pre-flight reachability probing of servers.
+"""
+
+from __future__ import absolute_import, print_function
+import time
+import socket
+import threading
+
+__all__ = ['server_address', 'tcp_probe', 'probe_servers']
+
+
+def server_address(server):
+    """
+    Return the network address of a server, for the default TCP probe.
+
+    The address is taken from the 'host' and 'port' properties of the
+    user-defined properties of the server in the server file, or if not found
+    there, of the secrets of the server in the vault file. The 'host' property
+    may also specify the port in the format 'HOST:PORT'.
+
+    Parameters:
+
+      server (:class:`~easy_server.Server`): The server.
+
+    Returns:
+      tuple(host, port): The address, or `None` if the server does not specify
+      both host and port.
+    """
+    for props in (server.user_defined, server.secrets):
+        if not isinstance(props, dict) or not props.get('host', None):
+            continue
+        host = str(props['host'])
+        port = props.get('port', None)
+        if port is None and host.count(':') == 1:
+            host, port = host.split(':')
+        if port is None:
+            return None
+        try:
+            return host, int(port)
+        except ValueError:
+            return None
+    return None
+
+
+def tcp_probe(host, port, timeout):
+    """
+    Probe whether a TCP connection can be established to an address.
+
+    Parameters:
+
+      host (:term:`string`): Host name or IP address.
+
+      port (int): Port number.
+
+      timeout (float): Timeout in seconds.
+
+    Raises:
+      :exc:`py:socket.error`: The connection cannot be established.
+    """
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.close()
+
+
+def probe_servers(servers, probe, timeout):
+    """
+    Probe the reachability of servers concurrently.
+
+    Parameters:
+
+      servers (list of :class:`~easy_server.Server`): The servers.
+
+      probe (callable): Probe function, with arguments `server` and `timeout`.
+        It returns `False` or raises an exception if the server is not
+        reachable, and `True` or `None` otherwise.
+
+      timeout (float): Timeout in seconds for each probe. A probe that does
+        not complete within twice the timeout is considered to have failed.
+
+    Returns:
+      dict: Reason why a server is unreachable, by server nickname. Only
+      unreachable servers are included.
+    """
+    reasons = {}
+    lock = threading.Lock()
+
+    def probe_server(server):
+        """Probe a server and record its reason for being unreachable."""
+        try:
+            reachable = probe(server=server, timeout=timeout)
+            reason = None if reachable is None or reachable else \
+                "probe failed"
+        except Exception as exc:  # pylint: disable=broad-except
+            reason = "{t}: {e}".format(t=exc.__class__.__name__, e=exc)
+        with lock:
+            reasons[server.nickname] = reason
+
+    threads = []
+    for server in servers:
+        thread = threading.Thread(target=probe_server, args=(server,))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    deadline = time.time() + timeout * 2
+    for thread in threads:
+        thread.join(max(deadline - time.time(), 0))
+
+    unreachable = {}
+    with lock:
+        for server in servers:
+            if server.nickname not in reasons:
+                unreachable[server.nickname] = "probe timed out"
+            elif reasons[server.nickname] is not None:
+                unreachable[server.nickname] = reasons[server.nickname]
+    return unreachable
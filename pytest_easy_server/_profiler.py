@@ -0,0 +1,291 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Profiling of the processing phases of the plugin, and duration statistics of
+the tests by server.
+"""
+
+from __future__ import absolute_import, print_function
+import math
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+__all__ = ['PhaseProfiler', 'profile_phase', 'ServerDurationStats',
+           'percentile', 'format_table']
+
+# High-resolution timer (time.perf_counter() is not available on Python 2)
+TIMER = getattr(time, 'perf_counter', time.time)
+
+
+class PhaseProfiler(object):
+    """
+    Profiler that measures the time spent in named phases and counts how
+    many times each phase is run.
+
+    Recording is thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Statistics by phase name; dict with items 'count', 'total', 'min',
+        # 'max' (times in seconds).
+        self._phases = OrderedDict()
+
+    def record(self, name, duration):
+        """
+        Record a run of a phase.
+
+        Parameters:
+
+          name (:term:`string`): Name of the phase.
+
+          duration (float): Duration of the run in seconds.
+        """
+        with self._lock:
+            stats = self._phases.get(name, None)
+            if stats is None:
+                self._phases[name] = dict(
+                    count=1, total=duration, min=duration, max=duration)
+            else:
+                stats['count'] += 1
+                stats['total'] += duration
+                stats['min'] = min(stats['min'], duration)
+                stats['max'] = max(stats['max'], duration)
+
+    def merge(self, phases):
+        """
+        Merge the statistics of the phases from another profiler into this
+        profiler, e.g. from a pytest-xdist worker.
+
+        Parameters:
+
+          phases (dict): Statistics by phase name, as returned by
+            :meth:`as_dict`.
+        """
+        with self._lock:
+            for name, other in phases.items():
+                stats = self._phases.get(name, None)
+                if stats is None:
+                    self._phases[name] = dict(other)
+                else:
+                    stats['count'] += other['count']
+                    stats['total'] += other['total']
+                    stats['min'] = min(stats['min'], other['min'])
+                    stats['max'] = max(stats['max'], other['max'])
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that records a run of a phase for the duration of the
+        'with' block.
+
+        Parameters:
+
+          name (:term:`string`): Name of the phase.
+        """
+        start = TIMER()
+        try:
+            yield
+        finally:
+            self.record(name, TIMER() - start)
+
+    def as_dict(self):
+        """
+        Return the statistics of all phases, in the order in which the phases
+        were first run.
+
+        Returns:
+          dict: Statistics by phase name, as dicts with items 'count',
+          'total', 'min' and 'max' (times in seconds).
+        """
+        with self._lock:
+            return OrderedDict(
+                (name, dict(stats)) for name, stats in self._phases.items())
+
+    def format_table(self):
+        """
+        Return the statistics of all phases as a table for display.
+
+        Returns:
+          list of :term:`string`: The lines of the table.
+        """
+        header = ('Phase', 'Count', 'Total [ms]', 'Avg [ms]', 'Max [ms]')
+        rows = []
+        for name, stats in self.as_dict().items():
+            rows.append((
+                name,
+                str(stats['count']),
+                '{:.3f}'.format(stats['total'] * 1000),
+                '{:.3f}'.format(stats['total'] * 1000 / stats['count']),
+                '{:.3f}'.format(stats['max'] * 1000),
+            ))
+        return format_table(header, rows)
+
+
+@contextmanager
+def profile_phase(profiler, name):
+    """
+    Context manager that records a run of a phase in a profiler, if profiling
+    is enabled.
+
+    Parameters:
+
+      profiler (:class:`PhaseProfiler`): The profiler, or `None` if profiling
+        is disabled.
+
+      name (:term:`string`): Name of the phase.
+    """
+    if profiler is None:
+        yield
+    else:
+        with profiler.phase(name):
+            yield
+
+
+class ServerDurationStats(object):
+    """
+    Statistics of the durations of the tests, by server.
+
+    The duration of a test is the sum of the durations of its setup, call and
+    teardown phases.
+    """
+
+    def __init__(self):
+        # Durations of the tests by server nickname; dict of test node ID and
+        # duration in seconds.
+        self._durations = OrderedDict()
+        # Total durations of the test phases by server nickname; dict of
+        # phase ('setup', 'call', 'teardown') and duration in seconds.
+        self._phases = OrderedDict()
+
+    def add(self, nickname, nodeid, when, duration):
+        """
+        Add the duration of a test phase.
+
+        Parameters:
+
+          nickname (:term:`string`): Nickname of the server.
+
+          nodeid (:term:`string`): Node ID of the test.
+
+          when (:term:`string`): The test phase ('setup', 'call' or
+            'teardown').
+
+          duration (float): Duration of the test phase in seconds.
+        """
+        durations = self._durations.setdefault(nickname, OrderedDict())
+        durations[nodeid] = durations.get(nodeid, 0.0) + duration
+        phases = self._phases.setdefault(nickname, OrderedDict())
+        phases[when] = phases.get(when, 0.0) + duration
+
+    def test_durations(self):
+        """
+        Return the durations of the tests.
+
+        Returns:
+          dict: Durations of the tests in seconds, by test node ID.
+        """
+        result = {}
+        for durations in self._durations.values():
+            result.update(durations)
+        return result
+
+    def as_dict(self):
+        """
+        Return the statistics by server, in the order in which the servers
+        were first tested.
+
+        Returns:
+          dict: Statistics by server nickname, as dicts with items 'count'
+          (number of tests), 'total', 'p50', 'p95', 'max' and 'phases' (total
+          by test phase). Times are in seconds.
+        """
+        result = OrderedDict()
+        for nickname, durations in self._durations.items():
+            values = sorted(durations.values())
+            result[nickname] = dict(
+                count=len(values),
+                total=sum(values),
+                p50=percentile(values, 50),
+                p95=percentile(values, 95),
+                max=values[-1],
+                phases=dict(self._phases[nickname]),
+            )
+        return result
+
+    def format_table(self):
+        """
+        Return the statistics by server as a table for display.
+
+        Returns:
+          list of :term:`string`: The lines of the table.
+        """
+        header = ('Server', 'Tests', 'Total [s]', 'P50 [s]', 'P95 [s]',
+                  'Max [s]')
+        rows = []
+        for nickname, stats in self.as_dict().items():
+            rows.append((
+                nickname,
+                str(stats['count']),
+                '{:.3f}'.format(stats['total']),
+                '{:.3f}'.format(stats['p50']),
+                '{:.3f}'.format(stats['p95']),
+                '{:.3f}'.format(stats['max']),
+            ))
+        return format_table(header, rows)
+
+
+def percentile(sorted_values, percent):
+    """
+    Return a percentile of values, using the nearest-rank method.
+
+    Parameters:
+
+      sorted_values (list of float): The values, in ascending order. Must
+        not be empty.
+
+      percent (int): The percentile, in the range 0 to 100.
+
+    Returns:
+      float: The smallest value such that at least the specified percentage
+      of the values is less than or equal to it.
+    """
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def format_table(header, rows):
+    """
+    Return a table for display, with the first column left-aligned and the
+    other columns right-aligned.
+
+    Parameters:
+
+      header (tuple of :term:`string`): The column headings.
+
+      rows (list of tuple of :term:`string`): The rows.
+
+    Returns:
+      list of :term:`string`: The lines of the table.
+    """
+    widths = [max(len(row[i]) for row in [header] + rows)
+              for i in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        cells = [row[0].ljust(widths[0])] + \
+            [cell.rjust(width) for cell, width in zip(row[1:], widths[1:])]
+        lines.append('  '.join(cells))
+    lines.insert(1, '  '.join('-' * width for width in widths))
+    return lines
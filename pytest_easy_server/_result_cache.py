@@ -0,0 +1,180 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cache of the test results from previous pytest runs, for reusing the results
+of tests against unchanged servers.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import hashlib
+
+__all__ = ['ResultCache', 'result_key', 'file_hash']
+
+# Key of the test results in the pytest cache
+RESULTS_CACHE_KEY = 'pytest_easy_server/results'
+
+# Test outcomes in the cache
+OUTCOME_PASSED = 'passed'
+OUTCOME_FAILED = 'failed'
+
+
+class ResultCache(object):
+    """
+    The outcomes of the tests that use the `es_server` fixture in previous
+    pytest runs.
+
+    The outcomes are stored in the pytest cache (i.e. in the .pytest_cache
+    directory), keyed by test node ID. Each outcome is stored together with
+    the result key (see :func:`result_key`) of the run that produced it, and
+    is reused only if the result key has not changed since then.
+
+    The outcomes of tests that no longer exist are removed when the cache is
+    updated, so that the cache does not grow without bounds.
+    """
+
+    def __init__(self, cache):
+        """
+        Parameters:
+
+          cache (:class:`pytest.Cache`): The pytest cache (i.e.
+            `config.cache`), or `None` if the cache is not available. In that
+            case, the result cache is empty and is not saved.
+        """
+        self._cache = cache
+        results = cache.get(RESULTS_CACHE_KEY, None) if cache else None
+        # Results by test node ID, as dicts with items 'key' and 'outcome'
+        self._results = results if isinstance(results, dict) else {}
+
+    def __len__(self):
+        return len(self._results)
+
+    def passed(self, nodeid, key):
+        """
+        Return whether a test passed in a previous run with the same result
+        key.
+
+        Parameters:
+
+          nodeid (:term:`string`): Node ID of the test.
+
+          key (:term:`string`): Result key of the test in the current run.
+
+        Returns:
+          bool: Boolean indicating whether the result of the test can be
+          reused.
+        """
+        result = self._results.get(nodeid, None)
+        return isinstance(result, dict) and result.get('key') == key and \
+            result.get('outcome') == OUTCOME_PASSED
+
+    def update(self, results, collected=None, rootdir=None):
+        """
+        Update the cache with the test outcomes of the current run, remove
+        the outcomes of tests that no longer exist, and save it in the pytest
+        cache.
+
+        An outcome is removed if its test file does not exist anymore, or if
+        its test file was collected in the current run but its test was not
+        (e.g. because the test was renamed, or its server was removed). The
+        outcomes of tests in test files that were not collected in the
+        current run (e.g. when running only some test files) are kept.
+
+        Parameters:
+
+          results (dict): Tuple of result key and outcome ('passed' or
+            'failed') of the tests, by test node ID.
+
+          collected (set): Node IDs of all tests collected in the current
+            run, or `None` for not removing any outcomes.
+
+          rootdir (:term:`string`): Path name of the pytest root directory,
+            which the test file paths in the node IDs are relative to.
+            Required if `collected` is specified.
+        """
+        for nodeid, (key, outcome) in results.items():
+            self._results[nodeid] = dict(key=key, outcome=outcome)
+        if collected is not None:
+            collected_files = set(nodeid_file(n) for n in collected)
+            for nodeid in list(self._results):
+                filepath = nodeid_file(nodeid)
+                if filepath in collected_files:
+                    removed = nodeid not in collected
+                else:
+                    removed = not os.path.exists(
+                        os.path.join(rootdir, filepath))
+                if removed:
+                    del self._results[nodeid]
+        if self._cache is not None:
+            self._cache.set(RESULTS_CACHE_KEY, self._results)
+
+
+def nodeid_file(nodeid):
+    """
+    Return the path name of the test file of a test node ID, relative to the
+    pytest root directory.
+    """
+    return nodeid.split('::', 1)[0]
+
+
+def result_key(nickname, server_item, fingerprint, test_file_hash):
+    """
+    Return the result key of a test against a server.
+
+    The result key changes when the definition of the server in the server
+    file, the fingerprint of the server, or the test file changes.
+
+    The secrets of the server from the vault file are not part of the result
+    key, so that no information about them is stored in the pytest cache.
+
+    Parameters:
+
+      nickname (:term:`string`): Nickname of the server.
+
+      server_item (dict): Server item from the server file.
+
+      fingerprint (:term:`string`): Fingerprint of the server returned by the
+        `pytest_es_server_fingerprint` hook, or `None`.
+
+      test_file_hash (:term:`string`): Hash of the file defining the test,
+        or `None`.
+
+    Returns:
+      :term:`string`: The result key, as a hex digest.
+    """
+    data = json.dumps(
+        [nickname, server_item, fingerprint, test_file_hash],
+        sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def file_hash(filepath):
+    """
+    Return the hash of the content of a file.
+
+    Parameters:
+
+      filepath (:term:`string`): Path name of the file.
+
+    Returns:
+      :term:`string`: The hash, as a hex digest, or `None` if the file cannot
+      be read.
+    """
+    hasher = hashlib.sha256()
+    try:
+        with open(filepath, 'rb') as fp:
+            hasher.update(fp.read())
+    except (OSError, IOError):
+        return None
+    return hasher.hexdigest()
@@ -0,0 +1,166 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Schema validation of the user-defined portion of the server items in the
+server file and of the server items in the vault file, with compiled
+validators.
+
+jsonschema.validate() checks the schema and creates a validator on each call,
+which is done by easy-server for each server item. Here, the schema is checked
+and the validator is created only once per schema, and is reused for all
+server items. The exceptions and messages are the same as with easy-server.
+"""
+
+from __future__ import absolute_import, print_function
+import json
+import threading
+
+import jsonschema
+import easy_server
+
+__all__ = ['compiled_validator', 'validate_user_defined',
+           'validate_vault_secrets']
+
+# Compiled validators by schema (as JSON string)
+_VALIDATORS = {}
+_VALIDATORS_LOCK = threading.Lock()
+
+
+def compiled_validator(schema):
+    """
+    Return a validator for a JSON schema, after checking the schema.
+
+    The validator is created only once per schema and is then reused.
+
+    Parameters:
+
+      schema (:term:`JSON schema`): The JSON schema.
+
+    Returns:
+      jsonschema validator object: The validator.
+
+    Raises:
+      jsonschema.exceptions.SchemaError: The JSON schema is invalid.
+    """
+    key = json.dumps(schema, sort_keys=True)
+    with _VALIDATORS_LOCK:
+        try:
+            return _VALIDATORS[key]
+        except KeyError:
+            pass
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        validator = cls(schema)
+        _VALIDATORS[key] = validator
+        return validator
+
+
+def _validation_error(validator, instance):
+    """
+    Return the most relevant validation error of an instance, or `None` if
+    the instance is valid. This is the error that jsonschema.validate()
+    would raise.
+    """
+    return jsonschema.exceptions.best_match(validator.iter_errors(instance))
+
+
+def _elem_str(exc, top_level):
+    """
+    Return the string describing the element on which validation failed.
+    """
+    if exc.absolute_path:
+        return "element '{}'".format(
+            '.'.join(str(e) for e in exc.absolute_path))
+    return top_level
+
+
+def validate_user_defined(servers, schema, filepath):
+    """
+    Validate the user-defined portion of the server items of a server file.
+
+    Parameters:
+
+      servers (dict): The server items of the server file, by nickname.
+
+      schema (:term:`JSON schema`): JSON schema for the user-defined portion.
+
+      filepath (:term:`string`): Path name of the server file, for messages.
+
+    Raises:
+      easy_server.ServerFileUserDefinedSchemaError: Invalid JSON schema.
+      easy_server.ServerFileUserDefinedFormatError: Invalid user-defined
+        portion of a server item.
+    """
+    try:
+        validator = compiled_validator(schema)
+    except jsonschema.exceptions.SchemaError as exc:
+        new_exc = easy_server.ServerFileUserDefinedSchemaError(
+            "Invalid JSON schema for validating user-defined portion "
+            "of server items in server file: {exc}".format(exc=exc))
+        new_exc.__cause__ = None
+        raise new_exc  # ServerFileUserDefinedSchemaError
+    for server_nick, server_item in servers.items():
+        user_defined = server_item.get('user_defined', None)
+        if user_defined is None:
+            new_exc = easy_server.ServerFileUserDefinedFormatError(
+                "Missing user_defined element for server {srv} "
+                "in server file {fn}".format(srv=server_nick, fn=filepath))
+            new_exc.__cause__ = None
+            raise new_exc  # ServerFileUserDefinedFormatError
+        exc = _validation_error(validator, user_defined)
+        if exc is not None:
+            new_exc = easy_server.ServerFileUserDefinedFormatError(
+                "Invalid format in user-defined portion of item for "
+                "server {srv} in server file {fn}: "
+                "Validation failed on {elem}: {exc}".
+                format(srv=server_nick, fn=filepath,
+                       elem=_elem_str(exc, "top-level of user-defined item"),
+                       exc=exc))
+            new_exc.__cause__ = None
+            raise new_exc  # ServerFileUserDefinedFormatError
+
+
+def validate_vault_secrets(vault, schema):
+    """
+    Validate the server items of a vault file.
+
+    Parameters:
+
+      vault (:class:`easy_server.VaultFile`): The loaded vault file.
+
+      schema (:term:`JSON schema`): JSON schema for the server items.
+
+    Raises:
+      easy_server.VaultFileServerSchemaError: Invalid JSON schema.
+      easy_server.VaultFileServerFormatError: Invalid server item.
+    """
+    try:
+        validator = compiled_validator(schema)
+    except jsonschema.exceptions.SchemaError as exc:
+        new_exc = easy_server.VaultFileServerSchemaError(
+            "Invalid JSON schema for validating the server items in "
+            "vault file {fn}: {exc}".format(fn=vault.filepath, exc=exc))
+        new_exc.__cause__ = None
+        raise new_exc  # VaultFileServerSchemaError
+    for server_nick in vault.nicknames:
+        exc = _validation_error(validator, vault.get_secrets(server_nick))
+        if exc is not None:
+            new_exc = easy_server.VaultFileServerFormatError(
+                "Invalid format in server item for server {srv} "
+                "in vault file {fn}: "
+                "Validation failed on {elem}: {exc}".
+                format(srv=server_nick, fn=vault.filepath,
+                       elem=_elem_str(exc, "top-level of server item"),
+                       exc=exc))
+            new_exc.__cause__ = None
+            raise new_exc  # VaultFileServerFormatError
@@ -0,0 +1,225 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Persistent cache for the resolved list of servers.
+
+The cache stores only the non-secret portion of the servers (i.e. the server
+items from the server file). The secrets from the vault file are never stored
+in the cache.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import hashlib
+import tempfile
+
+from ._version import __version__
+
+__all__ = ['ServerListCache', 'file_fingerprint']
+
+# Version of the format of the cache files. Increase this when the format
+# changes incompatibly.
+CACHE_FORMAT_VERSION = 2
+
+
+def file_fingerprint(filepath):
+    """
+    Return the fingerprint of a file, for detecting changes of the file.
+
+    Parameters:
+
+      filepath (:term:`string`): Path name of the file.
+
+    Returns:
+      dict: Fingerprint of the file, with items 'mtime', 'size' and 'sha256',
+      or `None` if the file cannot be accessed.
+    """
+    try:
+        stat = os.stat(filepath)
+        with open(filepath, 'rb') as fp:
+            sha256 = hashlib.sha256(fp.read()).hexdigest()
+    except (OSError, IOError):
+        return None
+    return dict(mtime=stat.st_mtime, size=stat.st_size, sha256=sha256)
+
+
+def file_unchanged(filepath, fingerprint):
+    """
+    Return whether a file is unchanged compared to a fingerprint.
+
+    If the modification time and size of the file are unchanged, the file is
+    considered unchanged without reading it. Otherwise, the content hash of the
+    file decides.
+
+    Parameters:
+
+      filepath (:term:`string`): Path name of the file.
+
+      fingerprint (dict): Fingerprint of the file, as returned by
+        :func:`file_fingerprint`, or `None`.
+
+    Returns:
+      bool: Boolean indicating whether the file is unchanged.
+    """
+    if fingerprint is None:
+        return False
+    try:
+        stat = os.stat(filepath)
+    except (OSError, IOError):
+        return False
+    if stat.st_mtime == fingerprint['mtime'] and \
+            stat.st_size == fingerprint['size']:
+        return True
+    current = file_fingerprint(filepath)
+    return current is not None and current['sha256'] == fingerprint['sha256']
+
+
+class ServerListCache(object):
+    """
+    A persistent cache for the resolved list of servers, stored in a cache
+    directory.
+
+    Each cache entry is a JSON file for one combination of server file,
+    nickname and schema file. A cache entry is valid as long as the server
+    file, the vault file and the schema file are unchanged.
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Parameters:
+
+          cache_dir (:term:`string`): Path name of the cache directory. It is
+            created when the first cache entry is stored.
+        """
+        self._cache_dir = os.path.abspath(cache_dir)
+
+    @property
+    def cache_dir(self):
+        """
+        :term:`string`: Absolute path name of the cache directory.
+        """
+        return self._cache_dir
+
+    def entry_file(self, key):
+        """
+        Return the path name of the cache file for a key.
+
+        Parameters:
+
+          key (tuple): Key of the cache entry. Must be serializable to JSON.
+
+        Returns:
+          :term:`string`: Path name of the cache file.
+        """
+        key_str = json.dumps(list(key))
+        key_hash = hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+        return os.path.join(self._cache_dir, 'es_{}.json'.format(key_hash))
+
+    def get(self, key):
+        """
+        Get the cache entry for a key, if it exists and is still valid.
+
+        Parameters:
+
+          key (tuple): Key of the cache entry.
+
+        Returns:
+          dict: The cache entry with items 'vault_file', 'vault_encrypted',
+          'vault_server_schema' and 'servers', or `None` if there is no valid
+          cache entry.
+        """
+        try:
+            with open(self.entry_file(key), 'r') as fp:
+                entry = json.load(fp)
+        except (OSError, IOError, ValueError):
+            return None
+        if entry.get('format') != CACHE_FORMAT_VERSION or \
+                entry.get('plugin_version') != __version__ or \
+                entry.get('key') != list(key):
+            return None
+        for filepath, fingerprint in entry['files'].items():
+            if not file_unchanged(filepath, fingerprint):
+                return None
+        return entry
+
+    def set(self, key, files, vault_file, vault_encrypted, servers,
+            vault_server_schema=None):
+        """
+        Store the cache entry for a key.
+
+        Errors writing the cache file are ignored, because the cache is only
+        an optimization. If the servers cannot be serialized to JSON (e.g.
+        because their user-defined properties contain dates), no cache entry
+        is stored.
+
+        Parameters:
+
+          key (tuple): Key of the cache entry.
+
+          files (list of :term:`string`): Path names of the files the cache
+            entry depends on.
+
+          vault_file (:term:`string`): Path name of the vault file, or `None`.
+
+          vault_encrypted (bool): Whether the vault file is encrypted, or
+            `None`.
+
+          servers (list of dict): The non-secret portion of the servers, as
+            dicts with items 'nickname' and 'server_dict'.
+
+          vault_server_schema (:term:`JSON schema`): JSON schema for
+            validating the server items in the vault file when it is loaded,
+            or `None`. It is stored because the vault file may not have been
+            loaded (and validated) when the cache entry is stored.
+        """
+        fingerprints = {}
+        for filepath in files:
+            fingerprint = file_fingerprint(filepath)
+            if fingerprint is None:
+                return
+            fingerprints[filepath] = fingerprint
+        entry = dict(
+            format=CACHE_FORMAT_VERSION,
+            plugin_version=__version__,
+            key=list(key),
+            files=fingerprints,
+            vault_file=vault_file,
+            vault_encrypted=vault_encrypted,
+            vault_server_schema=vault_server_schema,
+            servers=servers,
+        )
+        try:
+            data = json.dumps(entry)
+        except (TypeError, ValueError):
+            return
+        tmp_file = None
+        try:
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir)
+            fd, tmp_file = tempfile.mkstemp(dir=self._cache_dir)
+            with os.fdopen(fd, 'w') as fp:
+                fp.write(data)
+            entry_file = self.entry_file(key)
+            if os.path.exists(entry_file):
+                os.remove(entry_file)
+            os.rename(tmp_file, entry_file)
+            tmp_file = None
+        except (OSError, IOError):
+            pass
+        finally:
+            if tmp_file is not None:
+                try:
+                    os.remove(tmp_file)
+                except (OSError, IOError):
+                    pass
@@ -0,0 +1,326 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Limits for the number of concurrently running tests and the rate of test
+starts per server.
+
+The limits are enforced across threads and processes (e.g. pytest-xdist
+workers, --es-parallel child processes, and separate pytest runs on the same
+system) by means of locks on files in a lock directory.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import re
+import json
+import time
+import getpass
+import hashlib
+import tempfile
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt  # pylint: disable=import-error
+
+__all__ = ['server_limits', 'defines_limits', 'server_lock_key',
+           'default_lock_dir', 'ServerLimiter']
+
+# Names of the user-defined properties of a server that specify its limits
+MAX_CONCURRENCY_PROPERTY = 'max_concurrency'
+MAX_RATE_PROPERTY = 'max_rate'
+
+# Interval in seconds for polling for a free concurrency slot
+POLL_INTERVAL = 0.05
+
+
+def server_limits(server, default_max_concurrency, default_max_rate):
+    """
+    Return the limits of a server.
+
+    The limits are taken from the 'max_concurrency' and 'max_rate' properties
+    in the user-defined portion of the server item in the server file, and
+    default to the specified values if the properties are not specified or
+    are `None`.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      default_max_concurrency (int): Default for the maximum number of
+        concurrently running tests, or 0 for no limit.
+
+      default_max_rate (float): Default for the maximum number of test starts
+        per second, or 0 for no limit.
+
+    Returns:
+      tuple(int, float): Maximum number of concurrently running tests and
+      maximum number of test starts per second, with 0 meaning no limit.
+
+    Raises:
+      ValueError: Invalid limit in the server item.
+    """
+    user_defined = server.user_defined or {}
+    max_concurrency = user_defined.get(MAX_CONCURRENCY_PROPERTY, None)
+    if max_concurrency is None:
+        max_concurrency = default_max_concurrency
+    max_rate = user_defined.get(MAX_RATE_PROPERTY, None)
+    if max_rate is None:
+        max_rate = default_max_rate
+    if isinstance(max_concurrency, bool) or \
+            not isinstance(max_concurrency, int) or max_concurrency < 0:
+        raise ValueError(
+            "Invalid value for {p} of server {n}: {v!r} (must be an integer "
+            ">= 0)".format(p=MAX_CONCURRENCY_PROPERTY, n=server.nickname,
+                           v=max_concurrency))
+    if isinstance(max_rate, bool) or \
+            not isinstance(max_rate, (int, float)) or max_rate < 0:
+        raise ValueError(
+            "Invalid value for {p} of server {n}: {v!r} (must be a number "
+            ">= 0)".format(p=MAX_RATE_PROPERTY, n=server.nickname,
+                           v=max_rate))
+    return max_concurrency, float(max_rate)
+
+
+def defines_limits(server):
+    """
+    Return whether a server defines limits in the server file.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      bool: Boolean indicating whether the 'max_concurrency' or 'max_rate'
+      property is specified with a value other than `None` in the
+      user-defined portion of the server item.
+    """
+    user_defined = server.user_defined or {}
+    return user_defined.get(MAX_CONCURRENCY_PROPERTY, None) is not None or \
+        user_defined.get(MAX_RATE_PROPERTY, None) is not None
+
+
+def server_lock_key(server, fallback):
+    """
+    Return the key of a server for its lock files, which identifies the
+    server independently of the server file that defines it.
+
+    The key is based on the nickname and the host of the server, so that
+    the limits apply to all pytest processes on the system that test against
+    the same server, e.g. also from different checkouts of a repository. The
+    host is taken from the 'host' property of the user-defined portion of the
+    server item in the server file, or if not found there, of the secrets of
+    the server in the vault file.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      fallback (:term:`string`): Value that is used instead of the host if
+        the server does not specify a host (e.g. the path name of the server
+        file).
+
+    Returns:
+      :term:`string`: The key, which can be used in file names.
+    """
+    host = None
+    for props in (server.user_defined, server.secrets):
+        if isinstance(props, dict) and props.get('host', None):
+            host = str(props['host'])
+            break
+    identity = json.dumps([server.nickname, host or fallback])
+    digest = hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+    return '{n}-{d}'.format(n=server.nickname, d=digest)
+
+
+def default_lock_dir():
+    """
+    Return the default lock directory, which is below the temporary directory
+    of the system and is specific to the current user.
+
+    The lock directory is specific to the user, because the lock files
+    created by one user cannot be opened for writing by other users. Thus,
+    the limits apply to all pytest processes of the same user on the system.
+
+    Returns:
+      :term:`string`: Path name of the lock directory.
+    """
+    try:
+        user = getpass.getuser()
+    except (KeyError, OSError, ImportError):
+        # No user name in the environment and no password database entry
+        user = str(os.getuid()) if hasattr(os, 'getuid') else 'unknown'
+    user = re.sub(r'[^\w.-]', '_', user)
+    return os.path.join(
+        tempfile.gettempdir(),
+        'pytest-easy-server-locks-{u}'.format(u=user))
+
+
+def _lock_file(fd, blocking):
+    """
+    Lock an open file exclusively. Return whether the file was locked.
+    """
+    if fcntl is not None:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except (IOError, OSError):
+            return False
+        return True
+    while True:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except (IOError, OSError):
+            if not blocking:
+                return False
+            time.sleep(POLL_INTERVAL)
+        else:
+            return True
+
+
+def _unlock_file(fd):
+    """
+    Unlock a file locked with :func:`_lock_file`.
+    """
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class ServerLimiter(object):
+    """
+    Limiter for the number of concurrently running tests and the rate of test
+    starts per server, based on locks on files in a lock directory.
+
+    The concurrency limit of a server is enforced with one lock file per
+    concurrency slot; a test holds the lock on one of them while it runs. The
+    rate limit of a server is enforced with a file that stores the earliest
+    time for the next test start.
+    """
+
+    def __init__(self, lock_dir):
+        """
+        Parameters:
+
+          lock_dir (:term:`string`): Path name of the lock directory. It is
+            created if it does not exist. All processes that share the
+            servers must use the same lock directory.
+        """
+        self._lock_dir = lock_dir
+
+    @property
+    def lock_dir(self):
+        """
+        :term:`string`: Path name of the lock directory.
+        """
+        return self._lock_dir
+
+    def _open(self, filename):
+        """
+        Open (and possibly create) a file in the lock directory and return its
+        file descriptor.
+        """
+        if not os.path.isdir(self._lock_dir):
+            try:
+                os.makedirs(self._lock_dir, 0o700)
+            except OSError:
+                if not os.path.isdir(self._lock_dir):
+                    raise
+        return os.open(os.path.join(self._lock_dir, filename),
+                       os.O_RDWR | os.O_CREAT)
+
+    def acquire(self, key, max_concurrency, max_rate):
+        """
+        Wait until a test can be started against a server, within its limits.
+
+        Parameters:
+
+          key (:term:`string`): Key of the server for its lock files, see
+            :func:`server_lock_key`.
+
+          max_concurrency (int): Maximum number of concurrently running
+            tests, or 0 for no limit.
+
+          max_rate (float): Maximum number of test starts per second, or 0
+            for no limit.
+
+        Returns:
+          object: Token to be passed to :meth:`release` when the test has
+          finished, or `None` if there is no concurrency limit.
+        """
+        token = None
+        if max_concurrency:
+            token = self._acquire_slot(key, max_concurrency)
+        if max_rate:
+            self._wait_for_rate(key, max_rate)
+        return token
+
+    def release(self, token):
+        """
+        Release a concurrency slot acquired with :meth:`acquire`.
+
+        Parameters:
+
+          token (object): The token returned by :meth:`acquire`.
+        """
+        if token is not None:
+            _unlock_file(token)
+            os.close(token)
+
+    def _acquire_slot(self, key, max_concurrency):
+        """
+        Wait for a free concurrency slot of a server, lock it and return the
+        file descriptor of its lock file.
+        """
+        fds = [self._open('{k}.slot{i}.lock'.format(k=key, i=i))
+               for i in range(max_concurrency)]
+        try:
+            while True:
+                for fd in fds:
+                    if _lock_file(fd, blocking=False):
+                        fds.remove(fd)
+                        return fd
+                time.sleep(POLL_INTERVAL)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _wait_for_rate(self, key, max_rate):
+        """
+        Reserve the next start time of a test against a server that is within
+        its rate limit, and wait until then.
+        """
+        fd = self._open('{k}.rate.lock'.format(k=key))
+        try:
+            _lock_file(fd, blocking=True)
+            try:
+                data = os.read(fd, 64)
+                try:
+                    next_start = float(data.decode('ascii'))
+                except ValueError:
+                    next_start = 0.0
+                # time.time() is used because it is comparable across
+                # processes.
+                now = time.time()
+                start = max(now, next_start)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, repr(start + 1.0 / max_rate).encode('ascii'))
+            finally:
+                _unlock_file(fd)
+        finally:
+            os.close(fd)
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Selection of one server per test function from the servers to test against,
+according to weights of the servers, for the --es-select option.
+"""
+
+from __future__ import absolute_import, print_function
+from collections import OrderedDict
+
+__all__ = ['server_weight', 'load_weight', 'WeightedSelector']
+
+# Name of the user-defined property of a server that specifies its weight
+WEIGHT_PROPERTY = 'weight'
+
+# Default weight of a server
+DEFAULT_WEIGHT = 1.0
+
+
+def server_weight(server):
+    """
+    Return the weight of a server, from the 'weight' property in the
+    user-defined portion of the server item in the server file.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      float: The weight of the server. Defaults to 1.0.
+
+    Raises:
+      ValueError: Invalid weight in the server item.
+    """
+    user_defined = server.user_defined or {}
+    weight = user_defined.get(WEIGHT_PROPERTY, DEFAULT_WEIGHT)
+    if isinstance(weight, bool) or \
+            not isinstance(weight, (int, float)) or weight < 0:
+        raise ValueError(
+            "Invalid value for {p} of server {n}: {v!r} (must be a number "
+            ">= 0)".format(p=WEIGHT_PROPERTY, n=server.nickname, v=weight))
+    return float(weight)
+
+
+def load_weight(weight, load):
+    """
+    Return the weight of a server, adjusted by its current load.
+
+    Parameters:
+
+      weight (float): The weight of the server, see :func:`server_weight`.
+
+      load (float): The current utilization of the server, as a value between
+        0.0 (idle) and 1.0 (fully utilized), or `None` if unknown. Values
+        outside of that range are clamped to it.
+
+    Returns:
+      float: The weight of the server, reduced in proportion to its load.
+    """
+    if load is None:
+        return weight
+    return weight * (1.0 - min(max(float(load), 0.0), 1.0))
+
+
+class WeightedSelector(object):
+    """
+    Selector of servers in proportion to their weights, using the smooth
+    weighted round-robin algorithm.
+
+    The sequence of selected servers is deterministic, so that all
+    pytest-xdist workers (which collect the tests independently) select the
+    same server for a test. Within any prefix of the sequence, the number of
+    selections of each server deviates from its share of the weights by less
+    than one.
+    """
+
+    def __init__(self, weights):
+        """
+        Parameters:
+
+          weights (dict): Weights of the servers, by server nickname, in the
+            order of the servers. Servers with weight 0 are never selected.
+
+        Raises:
+          ValueError: No server has a weight greater than 0.
+        """
+        self._weights = OrderedDict(
+            (nickname, float(weight)) for nickname, weight in weights.items()
+            if weight > 0)
+        if not self._weights:
+            raise ValueError("No server to test against has a weight greater "
+                             "than 0")
+        self._total = sum(self._weights.values())
+        self._current = OrderedDict(
+            (nickname, 0.0) for nickname in self._weights)
+
+    def select(self):
+        """
+        Select the next server.
+
+        Returns:
+          :term:`string`: Nickname of the selected server.
+        """
+        selected = None
+        for nickname, weight in self._weights.items():
+            self._current[nickname] += weight
+            if selected is None or \
+                    self._current[nickname] > self._current[selected]:
+                selected = nickname
+        self._current[selected] -= self._total
+        return selected
@@ -0,0 +1,219 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pool of sessions with servers, for the es_session fixture.
+"""
+
+from __future__ import absolute_import, print_function
+import threading
+
+__all__ = ['SessionPool']
+
+
+class SessionPool(object):
+    """
+    A bounded pool of live sessions with servers, keyed by server nickname.
+
+    The sessions are created, checked and closed using the
+    `pytest_es_create_session`, `pytest_es_check_session` and
+    `pytest_es_close_session` hooks. Access to the pool is thread-safe.
+    """
+
+    def __init__(self, hook, max_size=1):
+        """
+        Parameters:
+
+          hook: The pytest hook relay (i.e. `config.hook`).
+
+          max_size (int): Maximum number of live sessions per server.
+        """
+        self._hook = hook
+        self._max_size = max_size
+        self._cond = threading.Condition()
+        # Idle sessions by server nickname; list of tuple(server, session)
+        self._idle = {}
+        # Number of live (idle or checked out) sessions by server nickname
+        self._live = {}
+
+    @property
+    def max_size(self):
+        """
+        int: Maximum number of live sessions per server.
+        """
+        return self._max_size
+
+    def live_count(self, nickname):
+        """
+        Return the number of live sessions for a server.
+
+        Parameters:
+
+          nickname (:term:`string`): Nickname of the server.
+
+        Returns:
+          int: Number of idle or checked out sessions for the server.
+        """
+        with self._cond:
+            return self._live.get(nickname, 0)
+
+    def checkout(self, server):
+        """
+        Get a session with a server from the pool.
+
+        An idle session is reused if the `pytest_es_check_session` hook does
+        not report it as unusable. If the hook raises an exception, the
+        session is closed and the exception is raised. Otherwise, a new
+        session is created using
+        the `pytest_es_create_session` hook, if the maximum number of live
+        sessions for the server has not been reached. Otherwise, the method
+        waits until a session is returned to the pool.
+
+        Parameters:
+
+          server (:class:`~easy_server.Server`): The server.
+
+        Returns:
+          object: The session, or `None` if no hook implementation created a
+          session for the server.
+        """
+        nickname = server.nickname
+        while True:
+            with self._cond:
+                idle = self._idle.setdefault(nickname, [])
+                while not idle and \
+                        self._live.get(nickname, 0) >= self._max_size:
+                    self._cond.wait()
+                if idle:
+                    _, session = idle.pop()
+                else:
+                    session = None
+                    self._live[nickname] = self._live.get(nickname, 0) + 1
+
+            if session is None:
+                try:
+                    session = self._hook.pytest_es_create_session(
+                        server=server)
+                except Exception:
+                    self._discard(nickname)
+                    raise
+                if session is None:
+                    self._discard(nickname)
+                return session
+
+            try:
+                usable = self._hook.pytest_es_check_session(
+                    server=server, session=session)
+            except Exception:
+                self._close_after_error(server, session)
+                raise
+            if usable is None or usable:
+                return session
+            self._close(server, session)
+
+    def checkout_many(self, servers):
+        """
+        Get sessions with multiple servers from the pool, concurrently.
+
+        Each session is checked out as with :meth:`checkout`, in a separate
+        thread per server. If checking out any of the sessions fails, the
+        sessions that were checked out are returned to the pool and the
+        exception of the first failing server is raised.
+
+        Parameters:
+
+          servers (list of :class:`~easy_server.Server`): The servers.
+
+        Returns:
+          list of object: The sessions, in the order of the servers. A session
+          is `None` if no hook implementation created a session for the
+          server.
+        """
+        results = [None] * len(servers)
+        errors = [None] * len(servers)
+
+        def checkout_one(index, server):
+            """Check out the session with one server."""
+            try:
+                results[index] = self.checkout(server)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors[index] = exc
+
+        threads = [threading.Thread(target=checkout_one, args=(i, server))
+                   for i, server in enumerate(servers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for exc in errors:
+            if exc is not None:
+                for server, session in zip(servers, results):
+                    if session is not None:
+                        self.checkin(server, session)
+                raise exc
+        return results
+
+    def checkin(self, server, session):
+        """
+        Return a session with a server to the pool.
+
+        Parameters:
+
+          server (:class:`~easy_server.Server`): The server.
+
+          session (object): The session, as returned by :meth:`checkout`.
+        """
+        with self._cond:
+            self._idle.setdefault(server.nickname, []).append(
+                (server, session))
+            self._cond.notify_all()
+
+    def close_all(self):
+        """
+        Close all idle sessions in the pool.
+        """
+        with self._cond:
+            idle_sessions = []
+            for idle in self._idle.values():
+                idle_sessions.extend(idle)
+                del idle[:]
+        for server, session in idle_sessions:
+            self._close(server, session)
+
+    def _close(self, server, session):
+        """
+        Close a session and remove it from the live sessions.
+        """
+        try:
+            self._hook.pytest_es_close_session(server=server, session=session)
+        finally:
+            self._discard(server.nickname)
+
+    def _close_after_error(self, server, session):
+        """
+        Close a session after an error, and remove it from the live sessions.
+        Errors when closing the session are ignored, so that the caller can
+        raise the original error.
+        """
+        try:
+            self._close(server, session)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    def _discard(self, nickname):
+        """
+        Remove a session from the live sessions.
+        """
+        with self._cond:
+            self._live[nickname] -= 1
+            self._cond.notify_all()
@@ -0,0 +1,148 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Scheduling of tests to pytest-xdist workers by server.
+
+This module requires the pytest-xdist package and is imported only when
+pytest-xdist is used.
+"""
+
+from __future__ import absolute_import, print_function
+
+import xdist
+from xdist.scheduler import LoadScopeScheduling
+
+from .plugin import nodeid_es_nickname
+
+__all__ = ['ServerScopeScheduling', 'es_server_scope',
+           'xdist_unsupported_reason']
+
+# Range of pytest-xdist versions that ServerScopeScheduling supports, as
+# tuples of (major, minor). The minimum version is the first version with
+# LoadScopeScheduling. The maximum version is exclusive, because
+# ServerScopeScheduling depends on internals of LoadScopeScheduling (see
+# XDIST_INTERNALS) that may change in a new major version.
+XDIST_MIN_VERSION = (1, 19)
+XDIST_MAX_VERSION = (4, 0)
+
+# Internal methods of LoadScopeScheduling that ServerScopeScheduling
+# overrides. In addition, it uses the 'workqueue' attribute.
+XDIST_INTERNALS = ('_assign_work_unit', '_split_scope')
+
+
+def xdist_unsupported_reason():
+    """
+    Return why scheduling by server is not supported with the installed
+    pytest-xdist version, if so.
+
+    Returns:
+      :term:`string`: The reason, or `None` if scheduling by server is
+      supported.
+    """
+    try:
+        version = tuple(
+            int(v) for v in xdist.__version__.split('.')[0:2])
+    except (AttributeError, ValueError):
+        version = None
+    if version is None or \
+            not XDIST_MIN_VERSION <= version < XDIST_MAX_VERSION:
+        return "pytest-xdist version {v} is not supported (supported: " \
+            ">={mn},<{mx})".format(
+                v=getattr(xdist, '__version__', 'unknown'),
+                mn='.'.join(str(v) for v in XDIST_MIN_VERSION),
+                mx='.'.join(str(v) for v in XDIST_MAX_VERSION))
+    missing = [name for name in XDIST_INTERNALS
+               if not hasattr(LoadScopeScheduling, name)]
+    if missing:
+        return "pytest-xdist version {v} does not have the methods {m} " \
+            "of its LoadScopeScheduling class".format(
+                v=xdist.__version__, m=', '.join(missing))
+    return None
+
+
+def es_server_scope(nodeid):
+    """
+    Return the scope of a test node ID for scheduling by server.
+
+    Parameters:
+
+      nodeid (:term:`string`): The test node ID.
+
+    Returns:
+      :term:`string`: The scope 'es_server=NICKNAME' if the test uses the
+      `es_server` fixture, or `None` otherwise.
+    """
+    nickname = nodeid_es_nickname(nodeid)
+    if nickname is None:
+        return None
+    return 'es_server={}'.format(nickname)
+
+
+class ServerScopeScheduling(LoadScopeScheduling):
+    """
+    pytest-xdist scheduler that runs all tests for a particular server on the
+    same worker.
+
+    Tests that use the `es_server` fixture are grouped by server, regardless of
+    the test module they are in. Each such group is sent as one unit of work
+    to a worker, so that the worker can reuse any resources (e.g. sessions)
+    for the server, and so that each server is accessed by only one worker at
+    a time.
+
+    Tests that do not use the `es_server` fixture are grouped as with the
+    'loadscope' distribution mode of pytest-xdist (i.e. by module or class).
+
+    If the expected durations of the tests are known, the groups with the
+    longest expected total duration are sent first, so that the load is
+    balanced across the workers by expected duration instead of by number of
+    tests.
+    """
+
+    def __init__(self, config, log=None, expected=None):
+        """
+        Parameters:
+
+          config (:class:`pytest.Config`): The pytest config object.
+
+          log: The pytest-xdist logger, or `None`.
+
+          expected (callable): Function that returns the expected duration of
+            a test in seconds, by test node ID, or `None`.
+        """
+        super(ServerScopeScheduling, self).__init__(config, log)
+        self._expected = expected
+        self._workqueue_sorted = False
+
+    def _assign_work_unit(self, node):
+        """
+        Assign a work unit to a node, sorting the work units by expected
+        duration before the first assignment.
+        """
+        if self._expected is not None and not self._workqueue_sorted:
+            self._workqueue_sorted = True
+            work_units = sorted(
+                self.workqueue.items(),
+                key=lambda work_unit: -sum(
+                    self._expected(nodeid) for nodeid in work_unit[1]))
+            self.workqueue.clear()
+            self.workqueue.update(work_units)
+        super(ServerScopeScheduling, self)._assign_work_unit(node)
+
+    def _split_scope(self, nodeid):
+        """
+        Determine the scope (grouping) of a test node ID.
+        """
+        scope = es_server_scope(nodeid)
+        if scope is None:
+            scope = super(ServerScopeScheduling, self)._split_scope(nodeid)
+        return scope
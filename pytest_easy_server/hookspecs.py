@@ -0,0 +1,200 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Hook specifications of the pytest-easy-server plugin.
+
+The hooks can be implemented in a conftest.py file or in another pytest
+plugin.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_create_session(server):
+    """
+    Create a session with a server, for use by the
+    :func:`~pytest_easy_server.es_session` fixture.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      object: The session with the server. The type of the session object is
+      up to the hook implementation. `None` indicates that the hook
+      implementation does not handle the server.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_check_session(server, session):
+    """
+    Check whether a session with a server is still usable.
+
+    This hook is invoked when an existing session is taken from the session
+    pool. If no hook implementation exists, sessions are always considered
+    usable.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      session (object): The session, as returned by
+        :func:`pytest_es_create_session`.
+
+    Returns:
+      bool: Boolean indicating whether the session is still usable. `None`
+      indicates that the hook implementation does not handle the session.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_close_session(server, session):
+    """
+    Close a session with a server.
+
+    This hook is invoked for sessions that are found not to be usable anymore,
+    and for all sessions in the session pool at the end of the pytest session.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      session (object): The session, as returned by
+        :func:`pytest_es_create_session`.
+
+    Returns:
+      bool: `True` to indicate that the session has been closed. `None`
+      indicates that the hook implementation does not handle the session.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_create_async_session(server):
+    """
+    Create an asyncio session with a server, for use by the
+    :func:`~pytest_easy_server.es_server_async` fixture.
+
+    This hook is invoked for all servers to test against when the first
+    :func:`~pytest_easy_server.es_server_async` fixture is set up, and the
+    returned awaitables are run concurrently.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      awaitable: An awaitable (e.g. a coroutine) whose result is the session
+      with the server. The type of the session object is up to the hook
+      implementation. `None` indicates that the hook implementation does not
+      handle the server.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_close_async_session(server, session):
+    """
+    Close an asyncio session with a server.
+
+    This hook is invoked for all asyncio sessions at the end of the pytest
+    session, and the returned awaitables are run concurrently.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      session (object): The session, as the result of the awaitable returned
+        by :func:`pytest_es_create_async_session`.
+
+    Returns:
+      awaitable: An awaitable (e.g. a coroutine) that closes the session.
+      `None` indicates that the hook implementation does not handle the
+      session.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_probe_server(server, timeout):
+    """
+    Probe whether a server is reachable, for the pre-flight check enabled
+    with the ``--es-preflight`` option.
+
+    The hook is invoked concurrently for all servers to test against, in
+    separate threads.
+
+    The plugin provides a default implementation that attempts a TCP
+    connection to the address specified by the 'host' and 'port' properties
+    of the server (see :ref:`Pre-flight check of the servers`).
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+      timeout (float): Timeout in seconds for the probe.
+
+    Returns:
+      bool: `True` if the server is reachable, or `False` if it is not
+      reachable. `None` indicates that the hook implementation does not handle
+      the server.
+
+    Raises:
+      Exception: The server is not reachable. The exception message is shown
+        as the reason.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_server_fingerprint(server):
+    """
+    Return a fingerprint of the current state of a server, for the
+    ``--es-reuse-results`` option.
+
+    The results of the tests against a server from a previous run are reused
+    only if the fingerprint of the server has not changed since then. A
+    fingerprint could for example be the firmware version of the server.
+
+    The hook is invoked once per server and pytest process, before the first
+    test against the server is run. If no hook implementation exists, the
+    reuse of results depends only on the server definition and test file.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      :term:`string`: The fingerprint of the server. `None` indicates that the
+      hook implementation does not handle the server.
+    """
+
+
+@pytest.hookspec(firstresult=True)
+def pytest_es_server_load(server):
+    """
+    Return the current load of a server, for the ``--es-select=load`` option.
+
+    The hook is invoked once per server at the beginning of the pytest
+    session. When running pytest with pytest-xdist, it is invoked on the
+    controller.
+
+    Parameters:
+
+      server (:class:`easy_server:easy_server.Server`): The server.
+
+    Returns:
+      float: The current utilization of the server, as a value between 0.0
+      (idle) and 1.0 (fully utilized). The weight of the server is reduced in
+      proportion to its utilization. `None` indicates that the hook
+      implementation does not handle the server.
+    """
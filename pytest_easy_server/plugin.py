@@ -16,10 +16,34 @@ Pytest plugin for pytest-easy-server project.
 
 from __future__ import absolute_import, print_function
 import os
-import yaml
+import re
+import json
+import hashlib
+import argparse
+import inspect
+from collections import OrderedDict
 import pytest
 
-import easy_server
+# The yaml and easy_server packages and the modules of this package that use
+# them are imported only when they are needed, because this module is imported
+# by pytest for every pytest run in an environment where this package is
+# installed.
+
+from . import hookspecs
+from ._easy_server_fixture import DEFAULT_ES_SCOPE, DYNAMIC_SCOPE_SUPPORTED
+from ._server_cache import ServerListCache
+from ._session_pool import SessionPool
+from ._async_session import AsyncSessionManager
+from ._profiler import PhaseProfiler, ServerDurationStats, profile_phase, \
+    format_table, TIMER
+from ._duration_history import DurationHistory, longest_first
+from ._preflight import server_address, tcp_probe, probe_servers
+from ._result_cache import ResultCache, result_key, file_hash, \
+    OUTCOME_PASSED, OUTCOME_FAILED
+from ._server_limits import server_limits, defines_limits, \
+    server_lock_key, default_lock_dir, ServerLimiter
+from ._server_selection import server_weight, load_weight, WeightedSelector
+from ._load_test import run_load, summarize_run, LoadStats
 
 DEFAULT_SERVER_FILE = 'es_server.yml'
 
@@ -27,6 +51,35 @@ PLUGIN_NAME = 'pytest-easy-server'
 PLUGIN_DOCS_LINK = 'https://pytest-easy-server.readthedocs.io/'
 VAULT_PASSWORD_VAR = 'ES_VAULT_PASSWORD'
 
+# Key in the pytest-xdist workerinput dict for passing the resolved servers
+# from the controller to the workers
+WORKERINPUT_KEY = 'es_servers'
+
+# Key in the pytest-xdist workeroutput dict for passing the profiling results
+# from the workers to the controller, for --es-profile
+WORKEROUTPUT_PROFILE_KEY = 'es_profile'
+
+# Key in the pytest-xdist workeroutput for the node IDs of the tests collected
+# by the worker, for --es-reuse-results
+WORKEROUTPUT_COLLECTED_KEY = 'es_collected'
+
+# Pattern for finding the server nickname in the parameter IDs of a test node
+# ID, as created by fixtureid_es_server(). Server nicknames are restricted to
+# the characters [a-zA-Z0-9_] by the server file schema.
+ES_SERVER_ID_PATTERN = re.compile(r'[\[-]es_server=([a-zA-Z0-9_]+)[-\]]')
+
+# Name of the user property of a test for passing its result key from the
+# process that runs the test to the pytest process, for --es-reuse-results
+RESULT_KEY_PROPERTY = 'es_result_key'
+
+# Name of the user property of a test for passing the results of its
+# load-test run from the process that runs the test to the pytest process,
+# for --es-load
+LOAD_PROPERTY = 'es_load'
+
+# Default timeout in seconds for the pre-flight probe of each server
+DEFAULT_PREFLIGHT_TIMEOUT = 5.0
+
 
 def pytest_addoption(parser):
     """
@@ -59,6 +112,21 @@ Default: {fn} in current directory.
         help="""\
 Nickname of the server or server group to test against.
 Default: The default from the easy-server file.
+""")
+
+    group.addoption(
+        '--es-shard',
+        dest='es_shard',
+        metavar="INDEX/COUNT",
+        action='store',
+        type=shard_spec,
+        default=None,
+        help="""\
+Test against only a share of the servers: The servers are partitioned into
+COUNT shards based on a stable hash of their nicknames, and only the servers
+in shard INDEX (1-based) are tested against. This allows distributing the
+servers across multiple CI jobs.
+Default: Test against all servers.
 """)
 
     group.addoption(
@@ -71,6 +139,231 @@ Default: The default from the easy-server file.
 Path name of the schema file to be used for validating the structure of
 user-defined properties in the easy-server server and vault files.
 Default: No validation.
+""")
+
+    group.addoption(
+        '--es-scope',
+        dest='es_scope',
+        metavar="SCOPE",
+        action='store',
+        choices=['session', 'package', 'module', 'class'],
+        default=DEFAULT_ES_SCOPE,
+        help="""\
+Scope of the es_server fixture: session, package, module, or class. Fixtures
+depending on es_server can have up to that scope. Requires pytest>=5.2 for
+values other than the default.
+Default: {s}.
+""".format(s=DEFAULT_ES_SCOPE))
+
+    group.addoption(
+        '--es-select',
+        dest='es_select',
+        metavar="MODE",
+        action='store',
+        choices=['all', 'weighted', 'load'],
+        default='all',
+        help="""\
+Mode for selecting the servers each test function runs against:
+'all' runs each test function against all servers to test against;
+'weighted' runs it against one of them, selected in proportion to the
+'weight' property in the user-defined portion of the server items (default 1);
+'load' is like 'weighted', with the weights reduced in proportion to the
+current load of the servers (pytest_es_server_load hook).
+Default: all.
+""")
+
+    group.addoption(
+        '--es-group-tests',
+        dest='es_group_tests',
+        action='store_true',
+        default=False,
+        help="""\
+Reorder the tests such that all tests for a particular server run in one
+contiguous block, to minimize switching between servers. Tests that do not use
+the es_server fixture keep their positions.
+Default: Use the test order determined by pytest.
+""")
+
+    group.addoption(
+        '--es-longest-first',
+        dest='es_longest_first',
+        action='store_true',
+        default=False,
+        help="""\
+Run the longest tests first, based on the test durations from previous pytest
+runs that are stored in the pytest cache: The tests for each server within a
+module or class are run longest first, and with --es-parallel or
+--es-dist-by-server, the servers with the longest total duration are started
+first.
+Default: Use the test order determined by pytest.
+""")
+
+    group.addoption(
+        '--es-parallel',
+        dest='es_parallel',
+        metavar="NUM",
+        action='store',
+        type=int,
+        default=0,
+        help="""\
+Run the tests for different servers in parallel, in up to NUM child processes
+of the pytest process. Not supported on Windows and not in combination with
+pytest-xdist.
+Default: Run the tests sequentially.
+""")
+
+    group.addoption(
+        '--es-preflight',
+        dest='es_preflight',
+        action='store_true',
+        default=False,
+        help="""\
+Probe all servers to test against concurrently before the tests are run, and
+skip the tests for servers that are not reachable.
+Default: No probing.
+""")
+
+    group.addoption(
+        '--es-preflight-timeout',
+        dest='es_preflight_timeout',
+        metavar="SECONDS",
+        action='store',
+        type=float,
+        default=DEFAULT_PREFLIGHT_TIMEOUT,
+        help="""\
+Timeout in seconds for probing each server with --es-preflight.
+Default: {t}.
+""".format(t=DEFAULT_PREFLIGHT_TIMEOUT))
+
+    group.addoption(
+        '--es-cache-dir',
+        dest='es_cache_dir',
+        metavar="DIR",
+        action='store',
+        default=None,
+        help="""\
+Path name of a directory for persistently caching the resolved servers
+between pytest runs. The cache is invalidated when the server file, vault
+file or schema file changes. Secrets from the vault file are not cached.
+Default: No persistent caching.
+""")
+
+    group.addoption(
+        '--es-reuse-results',
+        dest='es_reuse_results',
+        action='store_true',
+        default=False,
+        help="""\
+Skip tests against servers that passed in a previous run, if neither the
+test file, the server definition in the server file, nor the server
+fingerprint (pytest_es_server_fingerprint hook) has changed since then. The
+results are stored in the pytest cache.
+Default: Run all tests.
+""")
+
+    group.addoption(
+        '--es-dist-by-server',
+        dest='es_dist_by_server',
+        action='store_true',
+        default=False,
+        help="""\
+When running with pytest-xdist, distribute the tests such that all tests for a
+particular server run on the same worker.
+Default: Use the distribution mode of pytest-xdist (see its --dist option).
+""")
+
+    group.addoption(
+        '--es-max-concurrency',
+        dest='es_max_concurrency',
+        metavar="NUM",
+        action='store',
+        type=int,
+        default=0,
+        help="""\
+Maximum number of tests that run concurrently against a particular server,
+across all threads and processes on this system (e.g. pytest-xdist workers).
+Can be overridden for a server with the 'max_concurrency' property in the
+user-defined portion of the server item in the server file.
+Default: 0 (no limit).
+""")
+
+    group.addoption(
+        '--es-max-rate',
+        dest='es_max_rate',
+        metavar="RATE",
+        action='store',
+        type=float,
+        default=0,
+        help="""\
+Maximum number of tests started per second against a particular server,
+across all threads and processes on this system (e.g. pytest-xdist workers).
+Can be overridden for a server with the 'max_rate' property in the
+user-defined portion of the server item in the server file.
+Default: 0 (no limit).
+""")
+
+    group.addoption(
+        '--es-load',
+        dest='es_load',
+        action='store_true',
+        default=False,
+        help="""\
+Load-test mode: Call each test function that uses the es_server fixture
+repeatedly (see --es-load-iterations, --es-load-duration and
+--es-load-concurrency), with its fixtures set up once, and display the
+throughput, error rate and latency histogram by server. A test fails if any
+of its iterations failed.
+Default: Call each test function once.
+""")
+
+    group.addoption(
+        '--es-load-iterations',
+        dest='es_load_iterations',
+        metavar="NUM",
+        action='store',
+        type=int,
+        default=10,
+        help="""\
+Number of times each test function is called with --es-load.
+Default: 10.
+""")
+
+    group.addoption(
+        '--es-load-duration',
+        dest='es_load_duration',
+        metavar="SECONDS",
+        action='store',
+        type=float,
+        default=None,
+        help="""\
+Duration in seconds for calling each test function repeatedly with --es-load,
+instead of a number of iterations.
+Default: Use --es-load-iterations.
+""")
+
+    group.addoption(
+        '--es-load-concurrency',
+        dest='es_load_concurrency',
+        metavar="NUM",
+        action='store',
+        type=int,
+        default=1,
+        help="""\
+Number of threads that call each test function concurrently with --es-load.
+Default: 1.
+""")
+
+    group.addoption(
+        '--es-session-pool-size',
+        dest='es_session_pool_size',
+        metavar="NUM",
+        action='store',
+        type=int,
+        default=1,
+        help="""\
+Maximum number of live sessions per server in the pool of sessions used by the
+es_session fixture.
+Default: 1.
 """)
 
     group.addoption(
@@ -83,6 +376,98 @@ Require that the vault file (if specified) is encrypted and error out otherwise.
 Default: Tolerate unencrypted vault file.
 """)
 
+    group.addoption(
+        '--es-profile',
+        dest='es_profile',
+        action='store_true',
+        default=False,
+        help="""\
+Measure the time spent in the processing phases of the plugin (e.g. loading
+the server file and decrypting the vault file) and display a summary at the
+end of the test run.
+Default: No profiling.
+""")
+
+    group.addoption(
+        '--es-profile-json',
+        dest='es_profile_json',
+        metavar="FILE",
+        action='store',
+        default=None,
+        help="""\
+Write the results of --es-profile to a JSON file. Implies --es-profile.
+Default: No JSON file.
+""")
+
+    group.addoption(
+        '--es-durations',
+        dest='es_durations',
+        action='store_true',
+        default=False,
+        help="""\
+Display statistics of the test durations by server at the end of the test run.
+Default: No statistics.
+""")
+
+    group.addoption(
+        '--es-durations-json',
+        dest='es_durations_json',
+        metavar="FILE",
+        action='store',
+        default=None,
+        help="""\
+Write the statistics of --es-durations to a JSON file. Implies --es-durations.
+Default: No JSON file.
+""")
+
+
+def shard_spec(value):
+    """
+    Parse the value of the --es-shard option.
+
+    Parameters:
+
+      value (:term:`string`): The option value, in the format 'INDEX/COUNT'.
+
+    Returns:
+      tuple(int, int): The shard index (1-based) and the number of shards.
+
+    Raises:
+      argparse.ArgumentTypeError: Invalid option value.
+    """
+    try:
+        index, count = [int(v) for v in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "invalid shard specification {v!r}, must be 'INDEX/COUNT'".
+            format(v=value))
+    if count < 1 or index < 1 or index > count:
+        raise argparse.ArgumentTypeError(
+            "invalid shard specification {v!r}, INDEX must be in the range "
+            "1 to COUNT".format(v=value))
+    return index, count
+
+
+def server_shard(nickname, count):
+    """
+    Return the shard of a server, based on a stable hash of its nickname.
+
+    The hash does not depend on the Python version or the hash
+    randomization of the Python process, so that all CI jobs (possibly using
+    different Python versions) determine the same shards.
+
+    Parameters:
+
+      nickname (:term:`string`): Nickname of the server.
+
+      count (int): Number of shards.
+
+    Returns:
+      int: The shard index of the server (1-based).
+    """
+    digest = hashlib.sha256(nickname.encode('utf-8')).hexdigest()
+    return int(digest[:16], 16) % count + 1
+
 
 def fixtureid_es_server(fixture_value):
     """
@@ -93,106 +478,1661 @@ def fixtureid_es_server(fixture_value):
       fixture_value (:class:`~easy_server.Server`):
         The server the test runs against.
     """
+    # pylint: disable=import-outside-toplevel
+    import easy_server
     es_obj = fixture_value
     assert isinstance(es_obj, easy_server.Server)
     return "es_server={0}".format(es_obj.nickname)
 
 
-def pytest_generate_tests(metafunc):
+def nodeid_es_nickname(nodeid):
     """
-    Pytest plugin function to generate the tests for multiple servers in the
-    server file.
+    Return the server nickname of a test node ID, as created with the fixture
+    IDs from :func:`fixtureid_es_server`.
+
+    Parameters:
+
+      nodeid (:term:`string`): The test node ID.
+
+    Returns:
+      :term:`string`: The server nickname, or `None` if the test does not use
+      the `es_server` fixture.
     """
+    m = ES_SERVER_ID_PATTERN.search(nodeid)
+    if m is None:
+        return None
+    return m.group(1)
 
-    if 'es_server' in metafunc.fixturenames:
 
-        config = metafunc.config
-        es_file = os.path.abspath(config.getvalue('es_file'))
-        es_nickname = config.getvalue('es_nickname')
-        es_schema_file = config.getvalue('es_schema_file')
+def pytest_addhooks(pluginmanager):
+    """
+    Pytest plugin function to add the hooks of this plugin.
+    """
+    pluginmanager.add_hookspecs(hookspecs)
 
-        if config.getvalue('verbose'):
-            print("\n{p}: Using server file {fn}".
-                  format(p=PLUGIN_NAME, fn=es_file))
-
-        es_vault_password = os.getenv(VAULT_PASSWORD_VAR)
-        if es_vault_password:
-            # Assuming headless CI/CD mode
-            sf_kwargs = dict(
-                password=es_vault_password,
-                use_keyring=False,
-                use_prompting=False)
-            if config.getvalue('verbose'):
-                print("{p}: Using vault password from {v} environment "
-                      "variable.".format(p=PLUGIN_NAME, v=VAULT_PASSWORD_VAR))
-        else:
-            # Assuming interactive mode
-            sf_kwargs = dict(
-                password=None,
-                use_keyring=True,
-                use_prompting=True)
-            if config.getvalue('verbose'):
-                print("{p}: Using vault password from prompt or keyring "
-                      "service.".format(p=PLUGIN_NAME))
 
-        # If there is a schema file specified, load its schemata for passing
-        # on to validation by ServerFile().
-        if es_schema_file:
-            if config.getvalue('verbose'):
-                print("\n{p}: Using schema file {fn}".
-                      format(p=PLUGIN_NAME, fn=es_schema_file))
+def pytest_configure(config):
+    """
+    Pytest plugin function to configure this plugin.
+    """
+    # pylint: disable=protected-access
+
+    # Session-level cache of the resolved server lists.
+    # Key: tuple(es_file, es_nickname, es_schema_file, es_encrypted)
+    # Value: list of easy_server.Server
+    config._es_obj_lists = {}
+
+    es_scope = config.getvalue('es_scope')
+    if es_scope != DEFAULT_ES_SCOPE and not DYNAMIC_SCOPE_SUPPORTED:
+        raise pytest.UsageError(
+            "The --es-scope option requires pytest>=5.2 for scope {s}".
+            format(s=es_scope))
+
+    # The scheduler for --es-dist-by-server depends on internals of
+    # pytest-xdist, so its version is checked when pytest-xdist is used.
+    if config.getvalue('es_dist_by_server') and \
+            getattr(config.option, 'dist', 'no') != 'no':
+        # pylint: disable=import-outside-toplevel
+        from ._xdist_scheduling import xdist_unsupported_reason
+        reason = xdist_unsupported_reason()
+        if reason:
+            raise pytest.UsageError(
+                "The --es-dist-by-server option cannot be used: {r}".
+                format(r=reason))
+
+    # Pool of sessions with servers, for the es_session fixture.
+    es_session_pool_size = config.getvalue('es_session_pool_size')
+    if es_session_pool_size < 1:
+        raise pytest.UsageError(
+            "Invalid value for --es-session-pool-size: {v}".
+            format(v=es_session_pool_size))
+    config._es_session_pool = SessionPool(config.hook, es_session_pool_size)
+
+    # Limits for the concurrency and rate of the tests against each server.
+    # Without these options, the limits are enforced only if a server defines
+    # limits, see register_server_limits().
+    for name in ('es_max_concurrency', 'es_max_rate'):
+        if config.getvalue(name) < 0:
+            raise pytest.UsageError(
+                "Invalid value for --{o}: {v}".
+                format(o=name.replace('_', '-'), v=config.getvalue(name)))
+    if config.getvalue('es_max_concurrency') or config.getvalue('es_max_rate'):
+        register_server_limits(config)
+
+    # Statistics of the load-test runs by server, or None.
+    if config.getvalue('es_load'):
+        for name in ('es_load_iterations', 'es_load_concurrency'):
+            if config.getvalue(name) < 1:
+                raise pytest.UsageError(
+                    "Invalid value for --{o}: {v}".
+                    format(o=name.replace('_', '-'), v=config.getvalue(name)))
+        es_load_duration = config.getvalue('es_load_duration')
+        if es_load_duration is not None and es_load_duration <= 0:
+            raise pytest.UsageError(
+                "Invalid value for --es-load-duration: {v}".
+                format(v=es_load_duration))
+        config._es_load_stats = LoadStats()
+        config.pluginmanager.register(
+            LoadTestRunner(config, config._es_load_stats), 'es_load_runner')
+    else:
+        config._es_load_stats = None
+
+    # Asyncio sessions with servers, for the es_server_async fixture.
+    config._es_async_session_manager = AsyncSessionManager(config.hook)
+
+    # Profiler for the processing phases of this plugin, or None.
+    if config.getvalue('es_profile') or config.getvalue('es_profile_json'):
+        config._es_profiler = PhaseProfiler()
+    else:
+        config._es_profiler = None
+
+    # History of the test durations from previous runs, or None.
+    if config.getvalue('es_longest_first'):
+        config._es_duration_history = DurationHistory(
+            getattr(config, 'cache', None))
+    else:
+        config._es_duration_history = None
+
+    # Statistics of the test durations by server, or None. They are also
+    # needed for updating the history of the test durations.
+    if config.getvalue('es_durations') or \
+            config.getvalue('es_durations_json') or \
+            config.getvalue('es_longest_first'):
+        config._es_duration_stats = ServerDurationStats()
+        config.pluginmanager.register(
+            ServerDurationsRecorder(config._es_duration_stats),
+            'es_durations_recorder')
+    else:
+        config._es_duration_stats = None
+
+    # Test results from previous runs, or None.
+    if config.getvalue('es_reuse_results'):
+        config._es_result_cache = ResultCache(getattr(config, 'cache', None))
+        config.pluginmanager.register(
+            ServerResultsRecorder(config, config._es_result_cache),
+            'es_results_recorder')
+    else:
+        config._es_result_cache = None
+
+
+def pytest_sessionfinish(session):
+    """
+    Pytest plugin function that is called after the whole test run finished.
+
+    Closes all sessions with servers, and writes the results of
+    --es-profile-json and --es-durations-json to their JSON files. On
+    pytest-xdist workers, passes the profiling results to the controller
+    instead.
+    """
+    config = session.config
+    close_es_sessions(config)
+    # pylint: disable=protected-access
+    # On pytest-xdist workers, the controller writes the files.
+    if hasattr(config, 'workerinput'):
+        if config._es_profiler is not None:
+            config.workeroutput[WORKEROUTPUT_PROFILE_KEY] = \
+                dict(config._es_profiler.as_dict())
+        if config._es_result_cache is not None:
+            recorder = config.pluginmanager.get_plugin('es_results_recorder')
+            config.workeroutput[WORKEROUTPUT_COLLECTED_KEY] = \
+                sorted(recorder.collected) \
+                if recorder.collected is not None else None
+        return
+    es_profile_json = config.getvalue('es_profile_json')
+    if es_profile_json:
+        profile = dict(
+            plugin=PLUGIN_NAME,
+            phases=config._es_profiler.as_dict())
+        with open(es_profile_json, 'w') as fp:
+            json.dump(profile, fp, indent=2)
+    history = config._es_duration_history
+    if history is not None:
+        history.update(config._es_duration_stats.test_durations())
+    if config._es_result_cache is not None:
+        recorder = config.pluginmanager.get_plugin('es_results_recorder')
+        config._es_result_cache.update(
+            recorder.results, recorder.collected, str(config.rootdir))
+    es_durations_json = config.getvalue('es_durations_json')
+    if es_durations_json:
+        durations = dict(
+            plugin=PLUGIN_NAME,
+            servers=config._es_duration_stats.as_dict())
+        with open(es_durations_json, 'w') as fp:
+            json.dump(durations, fp, indent=2)
+
+
+class ServerDurationsRecorder(object):
+    """
+    Pytest plugin that records the durations of the tests by server, for the
+    --es-durations option.
+
+    The test reports are also processed in the pytest process when running
+    with pytest-xdist or --es-parallel, so the recorder in the pytest process
+    covers all tests.
+    """
+
+    def __init__(self, stats):
+        """
+        Parameters:
+
+          stats (:class:`~pytest_easy_server._profiler.ServerDurationStats`):
+            The statistics to record the durations in.
+        """
+        self.stats = stats
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest plugin function that is called for each test phase report.
+        """
+        nickname = nodeid_es_nickname(report.nodeid)
+        if nickname is not None:
+            self.stats.add(
+                nickname, report.nodeid, report.when, report.duration)
+
+
+class ServerResultsRecorder(object):
+    """
+    Pytest plugin that skips tests whose results from a previous run can be
+    reused, and records the outcomes of the tests, for the --es-reuse-results
+    option.
+
+    The result key of a test is determined in the process that runs the test
+    and is passed to the pytest process as a user property of the test, so
+    that the recorder in the pytest process covers all tests also when
+    running with pytest-xdist or --es-parallel.
+    """
+
+    def __init__(self, config, result_cache):
+        """
+        Parameters:
+
+          config (:class:`pytest.Config`): The pytest config object.
+
+          result_cache (:class:`~pytest_easy_server._result_cache.ResultCache`):
+            The test results from previous runs.
+        """
+        self.config = config
+        self.result_cache = result_cache
+        # Tuple of result key and outcome of the tests of the current run, by
+        # test node ID.
+        self.results = {}
+        # Node IDs of all tests collected in the current run (including
+        # deselected tests), or None if the collection had errors.
+        self.collected = set()
+        # Caches of the parts of the result keys, by server nickname and by
+        # test file path name, respectively.
+        self._server_keys = {}
+        self._file_hashes = {}
+
+    def pytest_collectreport(self, report):
+        """
+        Pytest plugin function that is called for each collector report.
+        """
+        if self.collected is None:
+            return
+        if report.failed:
+            # Not removing any results, because tests may be missing.
+            self.collected = None
+            return
+        for node in report.result:
+            if isinstance(node, pytest.Item):
+                self.collected.add(node.nodeid)
+
+    def merge_collected(self, collected):
+        """
+        Merge the node IDs of the tests collected by a pytest-xdist worker.
+        """
+        if collected is None:
+            self.collected = None
+        elif self.collected is not None:
+            self.collected.update(collected)
+
+    def item_result_key(self, item, es_obj):
+        """
+        Return the result key of a test item against a server.
+        """
+        server_key = self._server_keys.get(es_obj.nickname, None)
+        if server_key is None:
+            # The fingerprint hook may use the secrets of the server.
+            load_es_secrets(self.config, es_obj)
+            fingerprint = self.config.hook.pytest_es_server_fingerprint(
+                server=es_obj)
+            server_key = (server_dict(es_obj), fingerprint)
+            self._server_keys[es_obj.nickname] = server_key
+        module = getattr(item, 'module', None)
+        filepath = getattr(module, '__file__', None)
+        if filepath not in self._file_hashes:
+            self._file_hashes[filepath] = \
+                file_hash(filepath) if filepath else None
+        return result_key(es_obj.nickname, server_key[0], server_key[1],
+                          self._file_hashes[filepath])
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        """
+        Pytest plugin function that is called before setting up a test.
+        """
+        callspec = getattr(item, 'callspec', None)
+        es_obj = callspec.params.get('es_server', None) if callspec else None
+        if es_obj is None:
+            return
+        key = self.item_result_key(item, es_obj)
+        item.user_properties.append((RESULT_KEY_PROPERTY, key))
+        if self.result_cache.passed(item.nodeid, key):
+            pytest.skip("Passed in a previous run against unchanged server "
+                        "{n} (--es-reuse-results)".format(n=es_obj.nickname))
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest plugin function that is called for each test phase report.
+        """
+        key = None
+        for name, value in report.user_properties:
+            if name == RESULT_KEY_PROPERTY:
+                key = value
+        if key is None:
+            return
+        if report.failed:
+            self.results[report.nodeid] = (key, OUTCOME_FAILED)
+        elif report.passed and report.when == 'call':
+            self.results.setdefault(report.nodeid, (key, OUTCOME_PASSED))
+
+
+class ServerLimitsEnforcer(object):
+    """
+    Pytest plugin that enforces the limits for the number of concurrently
+    running tests and the rate of test starts per server, for the
+    --es-max-concurrency and --es-max-rate options and the corresponding
+    user-defined properties of the servers.
+
+    A test acquires a concurrency slot of its server before it is set up, and
+    releases it after it has been torn down.
+    """
+
+    def __init__(self, config):
+        """
+        Parameters:
+
+          config (:class:`pytest.Config`): The pytest config object.
+        """
+        self.config = config
+        self._limiter = None
+        # Limits by server nickname, see server_limits()
+        self._limits = {}
+        # Tokens for the acquired concurrency slots, by test node ID
+        self._tokens = {}
+
+    @property
+    def limiter(self):
+        """
+        :class:`~pytest_easy_server._server_limits.ServerLimiter`: The
+        limiter, with a lock directory that is shared by all pytest processes
+        of the current user on the system.
+        """
+        if self._limiter is None:
+            self._limiter = ServerLimiter(default_lock_dir())
+        return self._limiter
+
+    def lock_key(self, es_obj):
+        """
+        Return the key of a server for its lock files. Servers without a host
+        are identified by their nickname and the server file.
+
+        The secrets of the server are loaded first, because the host may be
+        specified in the vault file. Errors loading the vault file are handled
+        by exiting pytest with a message.
+        """
+        load_es_secrets(self.config, es_obj)
+        es_file = es_obj_list_key(self.config)[0]
+        return server_lock_key(es_obj, es_file)
+
+    def server_limits(self, es_obj):
+        """
+        Return the limits of a server. Invalid limits are handled by exiting
+        pytest with a message.
+        """
+        limits = self._limits.get(es_obj.nickname, None)
+        if limits is None:
+            exit_message = None
             try:
-                with open(es_schema_file, 'r') as fp:
-                    schema_data = yaml.safe_load(fp)
-            except (OSError, IOError) as exc:
-                pytest.exit("Cannot open schema file: {fn}: {exc}".
-                            format(fn=es_schema_file, exc=exc))
-            except yaml.YAMLError as exc:
-                pytest.exit("Invalid YAML syntax in schema file {fn}: {exc}".
-                            format(fn=es_schema_file, exc=exc))
-            if not isinstance(schema_data, dict):
-                pytest.exit("Schema file {fn} does not specify an object "
-                            "as its top-level element".
-                            format(fn=es_schema_file))
-            if set(schema_data.keys()) != \
-                    {'user_defined_schema', 'vault_server_schema'}:
-                pytest.exit("Schema file {fn} has invalid top-level "
-                            "properties: {p}".
-                            format(fn=es_schema_file, p=schema_data.keys()))
-            sf_kwargs['user_defined_schema'] = \
-                schema_data.get('user_defined_schema', None)
-            sf_kwargs['vault_server_schema'] = \
-                schema_data.get('vault_server_schema', None)
-            # pytest-easy-server does not do anything with the 'user_defined'
-            # property of server group items. They are tolerated, though.
-            sf_kwargs['group_user_defined_schema'] = None
-
-        # The following constructs place the pytest.exit() call outside of the
-        # exception handling which avoids the well-known exception traceback
-        # "During handling of the above exception, ...".
-        exit_message = None
-        try:
-            esf_obj = easy_server.ServerFile(es_file, **sf_kwargs)
-        except easy_server.ServerFileException as exc:
-            exit_message = str(exc)
-        if exit_message:
-            pytest.exit(exit_message)
-
-        if config.getvalue('es_encrypted'):
-            if esf_obj.is_vault_file_encrypted() is False:
-                pytest.exit("Vault file is required to be encrypted but is "
-                            "not encrypted: {vfn}".
-                            format(vfn=esf_obj.vault_file))
-
-        exit_message = None
-        try:
-            es_obj_list = esf_obj.list_default_servers() \
-                if es_nickname is None else esf_obj.list_servers(es_nickname)
-        except KeyError as exc:
-            exit_message = str(exc)
-        if exit_message:
-            pytest.exit(exit_message)
-
-        metafunc.parametrize(
-            'es_server', es_obj_list, indirect=True,
-            ids=fixtureid_es_server)
+                limits = server_limits(
+                    es_obj, self.config.getvalue('es_max_concurrency'),
+                    self.config.getvalue('es_max_rate'))
+            except ValueError as exc:
+                exit_message = str(exc)
+            if exit_message:
+                pytest.exit(exit_message)
+            self._limits[es_obj.nickname] = limits
+        return limits
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_setup(self, item):
+        """
+        Pytest plugin function that is called before setting up a test.
+        """
+        callspec = getattr(item, 'callspec', None)
+        es_obj = callspec.params.get('es_server', None) if callspec else None
+        if es_obj is None:
+            return
+        max_concurrency, max_rate = self.server_limits(es_obj)
+        if max_concurrency or max_rate:
+            self._tokens[item.nodeid] = self.limiter.acquire(
+                self.lock_key(es_obj), max_concurrency, max_rate)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        """
+        Pytest plugin function that is called for tearing down a test.
+        """
+        yield
+        token = self._tokens.pop(item.nodeid, None)
+        if token is not None:
+            self.limiter.release(token)
+
+
+class LoadTestRunner(object):
+    """
+    Pytest plugin that calls the test functions that use the `es_server`
+    fixture repeatedly and records the results of these load-test runs, for
+    the --es-load option.
+
+    The results of a load-test run are aggregated in the process that runs
+    the test and passed to the pytest process as a user property of the test,
+    so that the statistics in the pytest process cover all tests also when
+    running with pytest-xdist or --es-parallel.
+    """
+
+    def __init__(self, config, stats):
+        """
+        Parameters:
+
+          config (:class:`pytest.Config`): The pytest config object.
+
+          stats (:class:`~pytest_easy_server._load_test.LoadStats`): The
+            statistics to record the results of the load-test runs in.
+        """
+        self.config = config
+        self.stats = stats
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_pyfunc_call(self, pyfuncitem):
+        """
+        Pytest plugin function that calls a test function.
+
+        Coroutine test functions are left to the plugin that handles them,
+        and are called once.
+        """
+        callspec = getattr(pyfuncitem, 'callspec', None)
+        es_obj = callspec.params.get('es_server', None) if callspec else None
+        func = pyfuncitem.obj
+        if es_obj is None or inspect.iscoroutinefunction(func):
+            return None
+        # pylint: disable=protected-access
+        testargs = dict((arg, pyfuncitem.funcargs[arg])
+                        for arg in pyfuncitem._fixtureinfo.argnames)
+        start = TIMER()
+        latencies, errors = run_load(
+            func, testargs, self.config.getvalue('es_load_iterations'),
+            self.config.getvalue('es_load_duration'),
+            self.config.getvalue('es_load_concurrency'))
+        summary = summarize_run(latencies, len(errors), TIMER() - start)
+        summary['nickname'] = es_obj.nickname
+        pyfuncitem.user_properties.append((LOAD_PROPERTY, summary))
+        if errors:
+            raise errors[0]
+        return True
+
+    def pytest_runtest_logreport(self, report):
+        """
+        Pytest plugin function that is called for each test phase report.
+        """
+        if report.when != 'call':
+            return
+        for name, value in report.user_properties:
+            if name == LOAD_PROPERTY:
+                self.stats.add(value['nickname'], value)
+
+
+def pytest_terminal_summary(terminalreporter):
+    """
+    Pytest plugin function that adds a section to the terminal summary.
+
+    Displays the distribution of the tests across the servers if
+    --es-select selects servers, the load-test statistics by server if
+    --es-load is specified, the test duration statistics by server if
+    --es-durations is specified, and the profiling results if --es-profile is
+    specified.
+    """
+    # pylint: disable=protected-access
+    config = terminalreporter.config
+
+    if config.getvalue('es_select') != 'all':
+        terminalreporter.write_sep(
+            '-', "{p} server selection".format(p=PLUGIN_NAME))
+        lines = format_selection_table(
+            getattr(config, '_es_weights', None), terminalreporter.stats)
+        if not lines:
+            terminalreporter.write_line("No tests for servers have run")
+        for line in lines:
+            terminalreporter.write_line(line)
+
+    load_stats = getattr(config, '_es_load_stats', None)
+    if load_stats is not None:
+        terminalreporter.write_sep(
+            '-', "{p} load test".format(p=PLUGIN_NAME))
+        if not load_stats.as_dict():
+            terminalreporter.write_line("No load tests for servers have run")
+        else:
+            for line in load_stats.format_table():
+                terminalreporter.write_line(line)
+            terminalreporter.write_line("")
+            for line in load_stats.format_histograms():
+                terminalreporter.write_line(line)
+
+    stats = getattr(config, '_es_duration_stats', None)
+    if config.getvalue('es_durations') or \
+            config.getvalue('es_durations_json'):
+        terminalreporter.write_sep(
+            '-', "{p} durations by server".format(p=PLUGIN_NAME))
+        if not stats.as_dict():
+            terminalreporter.write_line("No tests for servers have run")
+        else:
+            for line in stats.format_table():
+                terminalreporter.write_line(line)
+
+    profiler = getattr(config, '_es_profiler', None)
+    if profiler is not None:
+        terminalreporter.write_sep(
+            '-', "{p} profile".format(p=PLUGIN_NAME))
+        if not profiler.as_dict():
+            terminalreporter.write_line("No phases of the plugin have run")
+        else:
+            for line in profiler.format_table():
+                terminalreporter.write_line(line)
+
+
+def format_selection_table(weights, stats):
+    """
+    Return the distribution of the tests across the servers as a table for
+    display, for the --es-select option.
+
+    Parameters:
+
+      weights (dict): The weights of the servers, by server nickname, or
+        `None` if they have not been determined.
+
+      stats (dict): The test reports by category, from the pytest terminal
+        reporter.
+
+    Returns:
+      list of :term:`string`: The lines of the table, or an empty list if no
+      tests for servers have run.
+    """
+    nodeids = set()
+    for reports in stats.values():
+        for report in reports:
+            nodeid = getattr(report, 'nodeid', None)
+            if nodeid and nodeid_es_nickname(nodeid):
+                nodeids.add(nodeid)
+    if not weights or not nodeids:
+        return []
+    counts = OrderedDict((nickname, 0) for nickname in weights)
+    for nodeid in nodeids:
+        nickname = nodeid_es_nickname(nodeid)
+        counts[nickname] = counts.get(nickname, 0) + 1
+    total_weight = sum(weights.values()) or 1.0
+    total_count = len(nodeids)
+    header = ('Server', 'Weight', 'Expected [%]', 'Tests', 'Actual [%]')
+    rows = []
+    for nickname, count in counts.items():
+        weight = weights.get(nickname, 0.0)
+        rows.append((
+            nickname,
+            '{:.2f}'.format(weight),
+            '{:.1f}'.format(weight * 100.0 / total_weight),
+            str(count),
+            '{:.1f}'.format(count * 100.0 / total_count),
+        ))
+    return format_table(header, rows)
+
+
+def close_es_sessions(config):
+    """
+    Close all sessions in the pool of sessions used by the es_session fixture,
+    and all asyncio sessions used by the es_server_async fixture.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+    """
+    pool = getattr(config, '_es_session_pool', None)
+    if pool is not None:
+        pool.close_all()
+    manager = getattr(config, '_es_async_session_manager', None)
+    if manager is not None:
+        manager.close_all()
+
+
+def es_obj_list_key(config):
+    """
+    Return the key for the session-level cache of the resolved server lists,
+    from the pytest options that determine the list of servers to test
+    against.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      tuple(es_file, es_nickname, es_schema_file, es_encrypted): The key.
+    """
+    es_file = os.path.abspath(config.getvalue('es_file'))
+    es_nickname = config.getvalue('es_nickname')
+    es_schema_file = config.getvalue('es_schema_file')
+    if es_schema_file:
+        es_schema_file = os.path.abspath(es_schema_file)
+    es_encrypted = bool(config.getvalue('es_encrypted'))
+    return es_file, es_nickname, es_schema_file, es_encrypted
+
+
+def es_profiler(config):
+    """
+    Return the profiler for the processing phases of this plugin.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      :class:`~pytest_easy_server._profiler.PhaseProfiler`: The profiler, or
+      `None` if profiling is disabled.
+    """
+    return getattr(config, '_es_profiler', None)
+
+
+def get_es_obj_list(config):
+    """
+    Return the list of servers to test against.
+
+    The list is determined from the server file (and vault file) when this
+    function is called for the first time in a pytest session, and is
+    returned from a session-level cache on subsequent calls. This avoids
+    loading the server file, validating it and decrypting the vault file again
+    for each test function that uses the `es_server` fixture.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers to test against.
+    """
+    key = es_obj_list_key(config)
+    # pylint: disable=protected-access
+    es_obj_lists = getattr(config, '_es_obj_lists', None)
+    if es_obj_lists is None:
+        es_obj_lists = config._es_obj_lists = {}
+    try:
+        return es_obj_lists[key]
+    except KeyError:
+        es_obj_list = es_obj_list_from_workerinput(config, key)
+        if es_obj_list is None:
+            es_obj_list = load_es_obj_list(config, *key)
+            es_shard = config.getvalue('es_shard')
+            if es_shard:
+                es_obj_list = shard_es_obj_list(config, es_obj_list, *es_shard)
+        es_obj_lists[key] = es_obj_list
+        return es_obj_list
+
+
+def shard_es_obj_list(config, es_obj_list, index, count):
+    """
+    Return the servers of a shard, for the --es-shard option.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      es_obj_list (list of :class:`~easy_server.Server`): All servers to test
+        against.
+
+      index (int): The shard index (1-based).
+
+      count (int): The number of shards.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers in the shard, in
+      their original order.
+    """
+    shard_list = [es_obj for es_obj in es_obj_list
+                  if server_shard(es_obj.nickname, count) == index]
+    if config.getvalue('verbose'):
+        print("{p}: Testing against shard {i}/{c}: {n} of {t} servers".
+              format(p=PLUGIN_NAME, i=index, c=count, n=len(shard_list),
+                     t=len(es_obj_list)))
+    return shard_list
+
+
+def es_obj_list_to_json(es_obj_list, secrets=True):
+    """
+    Serialize a list of servers including their secrets to a JSON string.
+
+    Parameters:
+
+      es_obj_list (list of :class:`~easy_server.Server`): The servers.
+
+      secrets (bool): Include the secrets of the servers. If `False`, the
+        secrets are not accessed and are serialized as `None`.
+
+    Returns:
+      :term:`string`: The JSON string.
+
+    Raises:
+      TypeError: The user-defined properties or secrets of a server are not
+        serializable to JSON.
+    """
+    return json.dumps([
+        dict(nickname=es_obj.nickname, server_dict=server_dict(es_obj),
+             secrets=es_obj.secrets if secrets else None)
+        for es_obj in es_obj_list])
+
+
+def es_obj_list_from_json(json_str):
+    """
+    Deserialize a list of servers including their secrets from a JSON string
+    created by :func:`es_obj_list_to_json`.
+
+    Parameters:
+
+      json_str (:term:`string`): The JSON string.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers.
+    """
+    # pylint: disable=import-outside-toplevel
+    import easy_server
+    return [
+        easy_server.Server(
+            item['nickname'], item['server_dict'], item['secrets'])
+        for item in json.loads(json_str)]
+
+
+def es_obj_list_from_workerinput(config, key):
+    """
+    Return the list of servers that was passed by the pytest-xdist controller
+    to this pytest-xdist worker, if any.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      key (tuple): Key of the server list, see :func:`es_obj_list_key`.
+
+    If the controller passed the servers without their secrets, the secrets
+    are retrieved from the vault file when they are accessed for the first
+    time, using the vault file passwords passed by the controller.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers to test against, or
+      `None` if this is not a pytest-xdist worker or the controller did not
+      pass servers for this key.
+    """
+    workerinput = getattr(config, 'workerinput', None)
+    if not workerinput or WORKERINPUT_KEY not in workerinput:
+        return None
+    es_input = workerinput[WORKERINPUT_KEY]
+    if es_input['key'] != list(key) or es_input['servers'] is None:
+        return None
+    vault_input = es_input.get('vault', None)
+    if vault_input is None:
+        return es_obj_list_from_json(es_input['servers'])
+    # pylint: disable=import-outside-toplevel
+    from ._lazy_vault import LazyVault, LazySecretsServer
+    vault = LazyVault(
+        vault_input['file'], server_schema=vault_input['server_schema'],
+        **vault_password_kwargs(config))
+    return [
+        LazySecretsServer(item['nickname'], item['server_dict'], vault)
+        for item in json.loads(es_input['servers'])]
+
+
+def es_password_broker(config):
+    """
+    Return the broker for the vault file passwords in interactive mode.
+
+    The broker is created when this function is called for the first time in
+    a pytest session. On pytest-xdist workers, it knows the passwords that
+    were passed by the controller.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      :class:`~pytest_easy_server._password_broker.PasswordBroker`: The
+      broker.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ._password_broker import PasswordBroker
+    # pylint: disable=protected-access
+    broker = getattr(config, '_es_password_broker', None)
+    if broker is None:
+        passwords = None
+        workerinput = getattr(config, 'workerinput', None)
+        if workerinput and WORKERINPUT_KEY in workerinput:
+            passwords = workerinput[WORKERINPUT_KEY]['passwords']
+        broker = config._es_password_broker = PasswordBroker(
+            use_keyring=True, use_prompting=True, passwords=passwords)
+    return broker
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    pytest-xdist hook function that is called on the controller when a worker
+    node is configured.
+
+    The controller resolves the servers once and passes them to the workers,
+    so that the workers do not load the server file again. The servers are
+    passed including their secrets if these are already loaded (e.g. by the
+    --es-preflight option). Otherwise, they are passed without their secrets,
+    and the workers retrieve the secrets from the vault file when they are
+    accessed for the first time, so that the vault file is not decrypted if
+    no tests use the servers.
+
+    In interactive mode, the password of an encrypted vault file is retrieved
+    on the controller through the password broker (from the keyring service
+    or by prompting for it) and is passed to the workers, so that the keyring
+    service is accessed (or the password is prompted for) only once per
+    pytest session.
+
+    If the server file does not exist, or if resolving the servers fails,
+    nothing is passed to the workers and they resolve the servers on their
+    own if they have tests using the `es_server` fixture, so that any error
+    is reported in the normal way.
+    """
+    config = node.config
+    key = es_obj_list_key(config)
+    if not os.path.exists(key[0]):
+        return
+    try:
+        es_obj_list = get_es_obj_list(config)
+        unreachable = get_unreachable_servers(config, es_obj_list)
+        weights = dict(get_server_weights(config, es_obj_list)) \
+            if config.getvalue('es_select') != 'all' else None
+    except pytest.exit.Exception:
+        return
+    vaults = set(getattr(es_obj, 'lazy_vault', None) for es_obj in es_obj_list
+                 if not getattr(es_obj, 'secrets_loaded', True))
+    vault = list(vaults)[0] if len(vaults) == 1 else None
+    if vault is not None and not os.getenv(VAULT_PASSWORD_VAR):
+        prefetch_vault_password(config, vault)
+    es_servers_json = None
+    vault_input = None
+    try:
+        if not vaults:
+            es_servers_json = es_obj_list_to_json(es_obj_list)
+        elif vault is not None:
+            es_servers_json = es_obj_list_to_json(es_obj_list, secrets=False)
+            vault_input = dict(
+                file=vault.filepath, server_schema=vault.server_schema)
+    except (TypeError, ValueError):
+        es_servers_json = None
+        vault_input = None
+    # pylint: disable=protected-access
+    broker = getattr(config, '_es_password_broker', None)
+    passwords = broker.passwords() if broker is not None else None
+    node.workerinput[WORKERINPUT_KEY] = dict(
+        key=list(key), servers=es_servers_json, vault=vault_input,
+        passwords=passwords, unreachable=unreachable, weights=weights)
+
+
+def prefetch_vault_password(config, vault):
+    """
+    Retrieve the password of an encrypted vault file through the password
+    broker, without decrypting the vault file.
+
+    Errors are ignored, so that they are reported in the normal way when the
+    vault file is loaded.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      vault (:class:`~pytest_easy_server._lazy_vault.LazyVault`): The vault
+        file.
+    """
+    # pylint: disable=import-outside-toplevel
+    import easy_server
+    import easy_vault
+    if vault.loaded:
+        return
+    try:
+        if vault.is_encrypted():
+            es_password_broker(config).get_password(vault.filepath)
+    except (easy_server.VaultFileException, easy_vault.KeyringNotAvailable,
+            easy_vault.KeyringError):
+        pass
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    # pylint: disable=unused-argument
+    """
+    pytest-xdist hook function that is called on the controller when a worker
+    node has finished.
+
+    Merges the profiling results of the worker into the profiling results of
+    the controller, so that --es-profile covers the phases that run on the
+    workers (e.g. generating the tests and loading the secrets).
+
+    Merges the node IDs of the tests collected by the worker into the results
+    recorder of the controller, so that --es-reuse-results can remove the
+    results of tests that no longer exist.
+    """
+    profiler = es_profiler(node.config)
+    workeroutput = getattr(node, 'workeroutput', None)
+    if profiler is not None and workeroutput and \
+            WORKEROUTPUT_PROFILE_KEY in workeroutput:
+        profiler.merge(workeroutput[WORKEROUTPUT_PROFILE_KEY])
+    if workeroutput and WORKEROUTPUT_COLLECTED_KEY in workeroutput:
+        recorder = node.config.pluginmanager.get_plugin('es_results_recorder')
+        recorder.merge_collected(workeroutput[WORKEROUTPUT_COLLECTED_KEY])
+
+
+def load_es_obj_list(config, es_file, es_nickname, es_schema_file,
+                     es_encrypted):
+    """
+    Load the server file (and vault file) and return the list of servers to
+    test against.
+
+    Errors are handled by exiting pytest with a message.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      es_file (:term:`string`): Absolute path name of the server file.
+
+      es_nickname (:term:`string`): Nickname of the server or server group
+        to test against, or `None` for the default in the server file.
+
+      es_schema_file (:term:`string`): Path name of the schema file, or
+        `None` for no schema validation.
+
+      es_encrypted (bool): Require that the vault file is encrypted.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers to test against.
+    """
+    # pylint: disable=import-outside-toplevel
+    import yaml
+    import easy_server
+    from ._lazy_vault import LazyServerFile
+
+    if config.getvalue('verbose'):
+        print("\n{p}: Using server file {fn}".
+              format(p=PLUGIN_NAME, fn=es_file))
+
+    sf_kwargs = vault_password_kwargs(config)
+
+    profiler = es_profiler(config)
+
+    es_cache_dir = config.getvalue('es_cache_dir')
+    if es_cache_dir:
+        cache = ServerListCache(es_cache_dir)
+        cache_key = (es_file, es_nickname, es_schema_file)
+        with profile_phase(profiler, 'cache_lookup'):
+            entry = cache.get(cache_key)
+        if entry:
+            if config.getvalue('verbose'):
+                print("{p}: Using cached servers from cache directory {d}".
+                      format(p=PLUGIN_NAME, d=cache.cache_dir))
+            return es_obj_list_from_cache_entry(
+                entry, es_encrypted, sf_kwargs)
+
+    # If there is a schema file specified, load its schemata for passing
+    # on to validation by ServerFile().
+    if es_schema_file:
+        if config.getvalue('verbose'):
+            print("\n{p}: Using schema file {fn}".
+                  format(p=PLUGIN_NAME, fn=es_schema_file))
+        try:
+            with profile_phase(profiler, 'load_schema_file'):
+                with open(es_schema_file, 'r') as fp:
+                    schema_data = yaml.safe_load(fp)
+        except (OSError, IOError) as exc:
+            pytest.exit("Cannot open schema file: {fn}: {exc}".
+                        format(fn=es_schema_file, exc=exc))
+        except yaml.YAMLError as exc:
+            pytest.exit("Invalid YAML syntax in schema file {fn}: {exc}".
+                        format(fn=es_schema_file, exc=exc))
+        if not isinstance(schema_data, dict):
+            pytest.exit("Schema file {fn} does not specify an object "
+                        "as its top-level element".
+                        format(fn=es_schema_file))
+        if set(schema_data.keys()) != \
+                {'user_defined_schema', 'vault_server_schema'}:
+            pytest.exit("Schema file {fn} has invalid top-level "
+                        "properties: {p}".
+                        format(fn=es_schema_file, p=schema_data.keys()))
+        sf_kwargs['user_defined_schema'] = \
+            schema_data.get('user_defined_schema', None)
+        sf_kwargs['vault_server_schema'] = \
+            schema_data.get('vault_server_schema', None)
+        # pytest-easy-server does not do anything with the 'user_defined'
+        # property of server group items. They are tolerated, though.
+        sf_kwargs['group_user_defined_schema'] = None
+
+    # The following constructs place the pytest.exit() call outside of the
+    # exception handling which avoids the well-known exception traceback
+    # "During handling of the above exception, ...".
+    # The vault file is not loaded here, but when the secrets of a server
+    # are accessed for the first time (see LazyServerFile).
+    exit_message = None
+    try:
+        with profile_phase(profiler, 'load_server_file'):
+            esf_obj = LazyServerFile(es_file, **sf_kwargs)
+        vault_encrypted = esf_obj.is_vault_file_encrypted() \
+            if es_encrypted or es_cache_dir else None
+    except (easy_server.ServerFileException,
+            easy_server.VaultFileException) as exc:
+        exit_message = str(exc)
+    if exit_message:
+        pytest.exit(exit_message)
+
+    if es_encrypted:
+        if vault_encrypted is False:
+            pytest.exit("Vault file is required to be encrypted but is "
+                        "not encrypted: {vfn}".
+                        format(vfn=esf_obj.vault_file))
+
+    exit_message = None
+    try:
+        with profile_phase(profiler, 'list_servers'):
+            es_obj_list = esf_obj.list_default_servers() \
+                if es_nickname is None else esf_obj.list_servers(es_nickname)
+    except KeyError as exc:
+        exit_message = str(exc)
+    if exit_message:
+        pytest.exit(exit_message)
+
+    if es_cache_dir:
+        files = [es_file]
+        if esf_obj.vault_file:
+            files.append(esf_obj.vault_file)
+        if es_schema_file:
+            files.append(es_schema_file)
+        servers = [dict(nickname=es_obj.nickname,
+                        server_dict=server_dict(es_obj))
+                   for es_obj in es_obj_list]
+        with profile_phase(profiler, 'cache_store'):
+            cache.set(cache_key, files, esf_obj.vault_file, vault_encrypted,
+                      servers, sf_kwargs.get('vault_server_schema', None))
+
+    return es_obj_list
+
+
+def vault_password_kwargs(config):
+    """
+    Return the password related keyword arguments for loading the vault file.
+
+    In headless CI/CD mode, the vault password is taken from the
+    ES_VAULT_PASSWORD environment variable. In interactive mode, it is
+    retrieved from the keyring service or by prompting for it, through the
+    password broker of the pytest session.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      dict: Keyword arguments for :class:`~easy_server.ServerFile` and
+      :class:`~pytest_easy_server._lazy_vault.LazyVault`.
+    """
+    es_vault_password = os.getenv(VAULT_PASSWORD_VAR)
+    if es_vault_password:
+        # Assuming headless CI/CD mode
+        kwargs = dict(
+            password=es_vault_password,
+            use_keyring=False,
+            use_prompting=False)
+        if config.getvalue('verbose'):
+            print("{p}: Using vault password from {v} environment "
+                  "variable.".format(p=PLUGIN_NAME, v=VAULT_PASSWORD_VAR))
+    else:
+        # Assuming interactive mode
+        kwargs = dict(
+            password=None,
+            use_keyring=True,
+            use_prompting=True,
+            password_broker=es_password_broker(config))
+        if config.getvalue('verbose'):
+            print("{p}: Using vault password from prompt or keyring "
+                  "service.".format(p=PLUGIN_NAME))
+    return kwargs
+
+
+def server_dict(es_obj):
+    """
+    Return the server item of a server as it was specified in the server file,
+    with optional properties set to their default values.
+
+    Parameters:
+
+      es_obj (:class:`~easy_server.Server`): The server.
+
+    Returns:
+      dict: The server item, suitable for :class:`~easy_server.Server`.
+    """
+    return dict(
+        description=es_obj.description,
+        contact_name=es_obj.contact_name,
+        access_via=es_obj.access_via,
+        user_defined=es_obj.user_defined,
+    )
+
+
+def es_obj_list_from_cache_entry(entry, es_encrypted, sf_kwargs):
+    """
+    Return the list of servers to test against from a valid entry of the
+    persistent cache.
+
+    The secrets of the servers are read from the vault file when they are
+    accessed for the first time, because they are not stored in the cache.
+    The vault file is then validated against the vault server schema from
+    the cache entry, because the vault file may not have been loaded when the
+    cache entry was stored (e.g. with --collect-only).
+
+    Errors are handled by exiting pytest with a message.
+
+    Parameters:
+
+      entry (dict): The cache entry.
+
+      es_encrypted (bool): Require that the vault file is encrypted.
+
+      sf_kwargs (dict): Password related keyword arguments for
+        :class:`~easy_server.ServerFile`.
+
+    Returns:
+      list of :class:`~easy_server.Server`: The servers to test against.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ._lazy_vault import LazyVault, LazySecretsServer
+    vault_file = entry['vault_file']
+
+    if es_encrypted and entry['vault_encrypted'] is False:
+        pytest.exit("Vault file is required to be encrypted but is "
+                    "not encrypted: {vfn}".format(vfn=vault_file))
+
+    vault = None
+    if vault_file:
+        vault = LazyVault(
+            vault_file, password=sf_kwargs['password'],
+            use_keyring=sf_kwargs['use_keyring'],
+            use_prompting=sf_kwargs['use_prompting'],
+            server_schema=entry.get('vault_server_schema', None),
+            password_broker=sf_kwargs.get('password_broker', None))
+
+    return [
+        LazySecretsServer(server['nickname'], server['server_dict'], vault)
+        for server in entry['servers']]
+
+
+def load_es_secrets(config, es_obj):
+    """
+    Load the secrets of a server from the vault file, if not yet done.
+
+    The vault file is loaded (and decrypted) when the secrets of the first
+    server are loaded. Errors are handled by exiting pytest with a message.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      es_obj (:class:`~easy_server.Server`): The server.
+    """
+    # pylint: disable=import-outside-toplevel
+    import easy_server
+    from ._lazy_vault import LazySecretsServer
+    if not isinstance(es_obj, LazySecretsServer):
+        return
+    exit_message = None
+    try:
+        with profile_phase(es_profiler(config), 'load_secrets'):
+            es_obj.load_secrets()
+    except easy_server.VaultFileException as exc:
+        exit_message = str(exc)
+    if exit_message:
+        pytest.exit(exit_message)
+
+
+def get_unreachable_servers(config, es_obj_list):
+    """
+    Return the servers that are not reachable, if the --es-preflight option
+    is specified.
+
+    The servers are probed concurrently when this function is called for the
+    first time in a pytest session, using the `pytest_es_probe_server` hook.
+    On pytest-xdist workers, the result of the probing on the controller is
+    used.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      es_obj_list (list of :class:`~easy_server.Server`): The servers to test
+        against.
+
+    Returns:
+      dict: Reason why a server is unreachable, by server nickname. Only
+      unreachable servers are included.
+    """
+    if not config.getvalue('es_preflight'):
+        return {}
+    # pylint: disable=protected-access
+    unreachable = getattr(config, '_es_unreachable', None)
+    if unreachable is None:
+        workerinput = getattr(config, 'workerinput', None)
+        if workerinput and WORKERINPUT_KEY in workerinput:
+            unreachable = workerinput[WORKERINPUT_KEY]['unreachable']
+        else:
+            for es_obj in es_obj_list:
+                load_es_secrets(config, es_obj)
+            timeout = config.getvalue('es_preflight_timeout')
+            with profile_phase(es_profiler(config), 'preflight'):
+                unreachable = probe_servers(
+                    es_obj_list, config.hook.pytest_es_probe_server, timeout)
+            if config.getvalue('verbose'):
+                print("\n{p}: Pre-flight check: {r} of {n} servers are "
+                      "reachable".format(p=PLUGIN_NAME,
+                                         r=len(es_obj_list) - len(unreachable),
+                                         n=len(es_obj_list)))
+        config._es_unreachable = unreachable
+    return unreachable
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_es_probe_server(server, timeout):
+    """
+    Default implementation of the `pytest_es_probe_server` hook that attempts
+    a TCP connection to the address of the server.
+
+    If the server does not specify an address, `None` is returned, i.e. the
+    server is considered reachable.
+    """
+    address = server_address(server)
+    if address is None:
+        return None
+    host, port = address
+    tcp_probe(host, port, timeout)
+    return True
+
+
+def pytest_generate_tests(metafunc):
+    """
+    Pytest plugin function to generate the tests for multiple servers in the
+    server file.
+    """
+
+    if 'es_server' in metafunc.fixturenames:
+
+        config = metafunc.config
+        with profile_phase(es_profiler(config), 'generate_tests'):
+
+            if config.getvalue('es_select') == 'all':
+                es_params = get_es_params(config)
+            else:
+                es_params = select_es_params(config)
+
+            # The parametrization scope causes pytest to group the tests by
+            # server up to that scope.
+            metafunc.parametrize(
+                'es_server', es_params, indirect=True,
+                scope=config.getvalue('es_scope'))
+
+
+def get_es_params(config):
+    """
+    Return the parameter sets for parametrizing the `es_server` fixture.
+
+    The parameter sets are created when this function is called for the
+    first time in a pytest session, and are returned from a session-level
+    cache on subsequent calls. Thus, all test functions are parametrized with
+    the same canonical server object for a particular server, and with the
+    same parameter ID. This allows pytest to reuse fixtures with a scope
+    higher than 'module' that depend on the `es_server` fixture across test
+    modules, and avoids creating new objects for each test function.
+
+    Servers that are not reachable in the pre-flight check are marked to be
+    skipped.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      list of ParameterSet: The parameter sets, as created by
+      :func:`pytest.param`.
+    """
+    # pylint: disable=protected-access
+    es_params = getattr(config, '_es_params', None)
+    if es_params is None:
+        es_obj_list = get_es_obj_list(config)
+        unreachable = get_unreachable_servers(config, es_obj_list)
+        es_params = []
+        for es_obj in es_obj_list:
+            marks = ()
+            if es_obj.nickname in unreachable:
+                marks = pytest.mark.skip(
+                    reason="Server {n} is not reachable: {r}".
+                    format(n=es_obj.nickname, r=unreachable[es_obj.nickname]))
+            es_params.append(pytest.param(
+                es_obj, marks=marks, id=fixtureid_es_server(es_obj)))
+        config._es_params = es_params
+        if any(defines_limits(es_obj) for es_obj in es_obj_list):
+            register_server_limits(config)
+    return es_params
+
+
+def register_server_limits(config):
+    """
+    Register the plugin that enforces the limits for the tests against the
+    servers, if it is not yet registered.
+
+    The plugin is registered when the --es-max-concurrency or --es-max-rate
+    option is specified, or when a server defines limits in the server file.
+    Thus, the limits of the servers are validated only in these cases.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+    """
+    if not config.pluginmanager.has_plugin('es_server_limiter'):
+        config.pluginmanager.register(
+            ServerLimitsEnforcer(config), 'es_server_limiter')
+
+
+def get_server_weights(config, es_obj_list):
+    """
+    Return the weights of the servers for selecting the servers with the
+    --es-select option.
+
+    The weights are determined when this function is called for the first
+    time in a pytest session. On pytest-xdist workers, the weights determined
+    on the controller are used, so that all workers select the same servers.
+
+    Servers that are not reachable in the pre-flight check get weight 0,
+    unless no server is reachable. Invalid weights are handled by exiting
+    pytest with a message.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+      es_obj_list (list of :class:`~easy_server.Server`): The servers to test
+        against.
+
+    Returns:
+      dict: The weights of the servers, by server nickname.
+    """
+    # pylint: disable=protected-access
+    weights = getattr(config, '_es_weights', None)
+    if weights is None:
+        workerinput = getattr(config, 'workerinput', None)
+        if workerinput and WORKERINPUT_KEY in workerinput:
+            weights = workerinput[WORKERINPUT_KEY]['weights']
+        else:
+            weights = determine_server_weights(config, es_obj_list)
+        config._es_weights = weights
+    return weights
+
+
+def determine_server_weights(config, es_obj_list):
+    """
+    Determine the weights of the servers, see :func:`get_server_weights`.
+    """
+    es_select = config.getvalue('es_select')
+    unreachable = get_unreachable_servers(config, es_obj_list)
+    weights = OrderedDict()
+    exit_message = None
+    try:
+        for es_obj in es_obj_list:
+            weight = server_weight(es_obj)
+            if es_select == 'load' and es_obj.nickname not in unreachable:
+                load_es_secrets(config, es_obj)
+                weight = load_weight(
+                    weight, config.hook.pytest_es_server_load(server=es_obj))
+            weights[es_obj.nickname] = weight
+    except ValueError as exc:
+        exit_message = str(exc)
+    if exit_message:
+        pytest.exit(exit_message)
+    reachable_weights = OrderedDict(
+        (nickname, 0.0 if nickname in unreachable else weight)
+        for nickname, weight in weights.items())
+    if any(reachable_weights.values()):
+        weights = reachable_weights
+    return weights
+
+
+def select_es_params(config):
+    """
+    Return the parameter set for parametrizing the `es_server` fixture of a
+    test function with one server, selected according to the weights of the
+    servers, for the --es-select option.
+
+    Parameters:
+
+      config (:class:`pytest.Config`): The pytest config object.
+
+    Returns:
+      list of ParameterSet: The parameter set for the selected server, or an
+      empty list if there are no servers to test against.
+    """
+    # pylint: disable=protected-access
+    selection = getattr(config, '_es_selection', None)
+    if selection is None:
+        es_obj_list = get_es_obj_list(config)
+        es_params = OrderedDict(
+            (es_obj.nickname, es_param) for es_obj, es_param
+            in zip(es_obj_list, get_es_params(config)))
+        selector = None
+        if es_obj_list:
+            weights = get_server_weights(config, es_obj_list)
+            exit_message = None
+            try:
+                selector = WeightedSelector(OrderedDict(
+                    (nickname, weights[nickname]) for nickname in es_params))
+            except ValueError as exc:
+                exit_message = str(exc)
+            if exit_message:
+                pytest.exit(exit_message)
+        selection = config._es_selection = (selector, es_params)
+    selector, es_params = selection
+    if selector is None:
+        return []
+    return [es_params[selector.select()]]
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    """
+    pytest-xdist hook function that returns the scheduler for distributing
+    the tests to the workers.
+
+    If the --es-dist-by-server option is specified, a scheduler is returned
+    that runs all tests for a particular server on the same worker. With
+    --es-longest-first, the servers with the longest expected total duration
+    are sent to the workers first. Otherwise,
+    `None` is returned, which causes pytest-xdist to use its own scheduler.
+    """
+    if config.getvalue('es_dist_by_server'):
+        # pylint: disable=import-outside-toplevel
+        from ._xdist_scheduling import ServerScopeScheduling
+        # pylint: disable=protected-access
+        history = config._es_duration_history
+        return ServerScopeScheduling(
+            config, log, expected=history.expected if history else None)
+    return None
+
+
+def item_es_nickname(item):
+    """
+    Return the nickname of the server a test item runs against.
+
+    Parameters:
+
+      item (:class:`pytest.Item`): The test item.
+
+    Returns:
+      :term:`string`: Nickname of the server, or `None` if the test item does
+      not use the `es_server` fixture.
+    """
+    callspec = getattr(item, 'callspec', None)
+    if callspec is None:
+        return None
+    es_obj = callspec.params.get('es_server', None)
+    if es_obj is None:
+        return None
+    return es_obj.nickname
+
+
+def count_server_switches(nicknames):
+    """
+    Return the number of switches between servers in a sequence of server
+    nicknames.
+
+    Parameters:
+
+      nicknames (iterable of :term:`string`): The server nicknames. `None`
+        items (i.e. tests not using the `es_server` fixture) are ignored.
+
+    Returns:
+      int: Number of switches between servers.
+    """
+    switches = 0
+    last = None
+    for nickname in nicknames:
+        if nickname is None:
+            continue
+        if last is not None and nickname != last:
+            switches += 1
+        last = nickname
+    return switches
+
+
+def group_items_by_server(items):
+    """
+    Reorder test items in place such that all items for a particular server
+    are in one contiguous block.
+
+    The order of the servers is the order of their first occurrence. The
+    order of the items for a particular server is preserved (stable sort).
+    Items that do not use the `es_server` fixture keep their positions, and
+    the items using the fixture are rearranged among the remaining positions.
+
+    Parameters:
+
+      items (list of :class:`pytest.Item`): The test items.
+
+    Returns:
+      tuple(int, int): Number of server switches before and after the
+      reordering.
+    """
+    nicknames = [item_es_nickname(item) for item in items]
+    switches_before = count_server_switches(nicknames)
+
+    server_order = {}
+    for nickname in nicknames:
+        if nickname is not None and nickname not in server_order:
+            server_order[nickname] = len(server_order)
+
+    positions = [i for i, nickname in enumerate(nicknames)
+                 if nickname is not None]
+    sorted_positions = sorted(
+        positions, key=lambda i: server_order[nicknames[i]])
+    es_items = [items[i] for i in sorted_positions]
+    for i, item in zip(positions, es_items):
+        items[i] = item
+
+    switches_after = max(len(server_order) - 1, 0)
+    return switches_before, switches_after
+
+
+def sort_items_longest_first(items, expected):
+    """
+    Reorder test items in place such that within each block of consecutive
+    items for the same server and the same parent node (i.e. module or
+    class), the items with the longest expected duration come first.
+
+    Parameters:
+
+      items (list of :class:`pytest.Item`): The test items.
+
+      expected (callable): Function that returns the expected duration of a
+        test in seconds, by test node ID.
+    """
+    start = 0
+    while start < len(items):
+        key = (items[start].parent, item_es_nickname(items[start]))
+        end = start + 1
+        while end < len(items) and \
+                (items[end].parent, item_es_nickname(items[end])) == key:
+            end += 1
+        if key[1] is not None:
+            items[start:end] = sorted(
+                items[start:end], key=lambda item: -expected(item.nodeid))
+        start = end
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_collection_modifyitems(config, items):
+    """
+    Pytest plugin function that is called after collection has been
+    performed.
+
+    If the --es-group-tests option is specified, the test items are reordered
+    such that all tests for a particular server run in one contiguous block.
+
+    If the --es-longest-first option is specified, the test items for each
+    server within a module or class are reordered such that the longest tests
+    run first.
+    """
+    # pylint: disable=protected-access
+    if config.getvalue('es_group_tests'):
+        config._es_group_switches = group_items_by_server(items)
+    history = config._es_duration_history
+    if history:
+        sort_items_longest_first(items, history.expected)
+
+
+def pytest_report_collectionfinish(config):
+    """
+    Pytest plugin function that returns lines to be displayed after
+    collection has finished.
+    """
+    switches = getattr(config, '_es_group_switches', None)
+    if switches is None:
+        return None
+    switches_before, switches_after = switches
+    return "{p}: Grouped tests by server: {a} server switches instead of " \
+        "{b} ({s} saved)".format(p=PLUGIN_NAME, a=switches_after,
+                                 b=switches_before,
+                                 s=switches_before - switches_after)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session):
+    """
+    Pytest plugin function that performs the main test loop.
+
+    If the --es-parallel option is specified, the tests are partitioned by
+    server and the partitions are run in parallel child processes. Otherwise,
+    `None` is returned, which causes pytest to perform its default test loop.
+    """
+    config = session.config
+    es_parallel = config.getvalue('es_parallel')
+    if not es_parallel or es_parallel < 2:
+        return None
+    if session.testsfailed or config.getvalue('collectonly'):
+        # Let the default test loop handle collection errors and --co.
+        return None
+    if getattr(config.option, 'dist', 'no') != 'no' or \
+            hasattr(config, 'workerinput'):
+        # pytest-xdist performs its own test loop.
+        return None
+
+    # pylint: disable=import-outside-toplevel
+    from ._parallel import parallel_supported, partition_items, run_parallel
+    if not parallel_supported():
+        print("\n{p}: Option --es-parallel is not supported on this "
+              "platform; running tests sequentially".format(p=PLUGIN_NAME))
+        return None
+
+    # Load the secrets of the servers before the child processes are forked,
+    # so that the vault file is decrypted (and the vault password retrieved)
+    # once in this process, instead of in every child process.
+    es_objs = OrderedDict()
+    for item in session.items:
+        callspec = getattr(item, 'callspec', None)
+        es_obj = callspec.params.get('es_server', None) if callspec else None
+        if es_obj is not None:
+            es_objs[id(es_obj)] = es_obj
+    for es_obj in es_objs.values():
+        load_es_secrets(config, es_obj)
+
+    partitions = partition_items(session.items, item_es_nickname)
+    # pylint: disable=protected-access
+    history = config._es_duration_history
+    if history:
+        partitions = longest_first(
+            partitions, lambda item: history.expected(item.nodeid))
+    run_parallel(session, partitions, es_parallel,
+                 finish_child=close_es_sessions)
+    if session.shouldfail:
+        raise session.Failed(session.shouldfail)
+    if session.shouldstop:
+        raise session.Interrupted(session.shouldstop)
+    return True
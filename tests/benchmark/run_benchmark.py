@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark for the overhead of the pytest-easy-server plugin at scale.
+
+Generates a synthetic server file and vault file of configurable size, and a
+test module with a configurable number of test functions, and measures:
+
+* the import time of the plugin module (which pytest imports for every pytest
+  run), based on the -X importtime option of Python,
+* the time for loading the server file and listing the servers,
+* the collection time and peak memory of pytest,
+* the per-test overhead of the es_server fixture, compared to a plain
+  parametrized fixture.
+
+Each pytest run is performed in a separate Python process. The per-test
+overhead is determined from the duration of the test loop measured within
+these processes, so that it does not include the startup of the processes
+and the collection. Run with --help for the options.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+import subprocess
+import timeit
+
+import yaml
+import easy_server
+
+# Python code that runs pytest in a child process and writes the run time,
+# the duration of the test loop and the peak memory of the process to a JSON
+# file.
+CHILD_CODE = """
+import sys, json, time, resource, pytest
+timer = getattr(time, 'perf_counter', time.time)
+
+class LoopTimer(object):
+    loop_duration = None
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtestloop(self, session):
+        start = timer()
+        yield
+        self.loop_duration = timer() - start
+
+loop_timer = LoopTimer()
+start = time.time()
+rc = pytest.main(sys.argv[2:], plugins=[loop_timer])
+duration = time.time() - start
+maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    maxrss = maxrss // 1024  # bytes on macOS, KiB on Linux
+with open(sys.argv[1], 'w') as fp:
+    json.dump(dict(rc=int(rc), duration=duration,
+                   loop_duration=loop_timer.loop_duration,
+                   maxrss_kib=maxrss), fp)
+"""
+
+CONFTEST = """
+import pytest
+from pytest_easy_server import es_server  # noqa: F401
+
+NUM_SERVERS = {num_selected}
+
+
+@pytest.fixture(params=range(NUM_SERVERS), scope='module')
+def plain_server(request):
+    return request.param
+"""
+
+ES_TEST_FUNCTION = """
+def test_es_{i}(es_server):
+    pass
+"""
+
+# Python code whose import time is measured; pytest is imported before the
+# measurement because it is imported anyway when the plugin is used.
+IMPORT_CODE = "import pytest; import pytest_easy_server.plugin"
+IMPORT_MODULE = 'pytest_easy_server.plugin'
+
+PLAIN_TEST_FUNCTION = """
+def test_plain_{i}(plain_server):
+    pass
+"""
+
+
+def generate_server_file(directory, num_servers, group_depth, num_selected,
+                         secret_size):
+    """
+    Generate a server file and an (unencrypted) vault file.
+
+    The server file has a chain of nested server groups of the specified
+    depth. The innermost group contains the selected servers, and each
+    enclosing group contains the next inner group. The default group is the
+    outermost group.
+
+    Returns:
+      str: Path name of the server file.
+    """
+    servers = {}
+    secrets = {}
+    for i in range(num_servers):
+        nickname = 'srv{}'.format(i)
+        servers[nickname] = dict(
+            description="Server {}".format(i),
+            contact_name="Contact {}".format(i),
+            access_via="VPN",
+            user_defined=dict(stuff="stuff {}".format(i), index=i),
+        )
+        secrets[nickname] = dict(
+            host="10.0.{}.{}".format(i // 256, i % 256),
+            username="user{}".format(i),
+            password="x" * secret_size,
+        )
+    selected = ['srv{}'.format(i) for i in range(num_selected)]
+    groups = {'group0': dict(description="Group 0", members=selected)}
+    for level in range(1, group_depth):
+        groups['group{}'.format(level)] = dict(
+            description="Group {}".format(level),
+            members=['group{}'.format(level - 1)])
+    server_file = os.path.join(directory, 'es_server.yml')
+    with open(server_file, 'w') as fp:
+        yaml.safe_dump(dict(
+            vault_file='es_vault.yml',
+            servers=servers,
+            server_groups=groups,
+            default='group{}'.format(group_depth - 1),
+        ), fp)
+    with open(os.path.join(directory, 'es_vault.yml'), 'w') as fp:
+        yaml.safe_dump(dict(secrets=secrets), fp)
+    return server_file
+
+
+def generate_tests(directory, num_tests, num_selected):
+    """
+    Generate a conftest.py file, and test modules with test functions using
+    the es_server fixture and a plain parametrized fixture, respectively.
+
+    Returns:
+      tuple(str, str): Path names of the test modules for the es_server
+      fixture and for the plain fixture.
+    """
+    with open(os.path.join(directory, 'conftest.py'), 'w') as fp:
+        fp.write(CONFTEST.format(num_selected=num_selected))
+    es_module = os.path.join(directory, 'test_es.py')
+    with open(es_module, 'w') as fp:
+        for i in range(num_tests):
+            fp.write(ES_TEST_FUNCTION.format(i=i))
+    plain_module = os.path.join(directory, 'test_plain.py')
+    with open(plain_module, 'w') as fp:
+        for i in range(num_tests):
+            fp.write(PLAIN_TEST_FUNCTION.format(i=i))
+    return es_module, plain_module
+
+
+def run_pytest(directory, args):
+    """
+    Run pytest in a child process.
+
+    Returns:
+      dict: Result with items 'rc', 'duration' (seconds), 'loop_duration'
+      (duration of the test loop in seconds) and 'maxrss_kib'.
+    """
+    result_file = os.path.join(directory, 'result.json')
+    cmd = [sys.executable, '-c', CHILD_CODE, result_file, '-q',
+           '-p', 'no:cacheprovider', '--rootdir', directory] + args
+    with open(os.devnull, 'w') as devnull:
+        subprocess.call(cmd, cwd=directory, stdout=devnull)
+    with open(result_file, 'r') as fp:
+        result = json.load(fp)
+    if result['rc'] != 0:
+        raise RuntimeError("pytest failed with rc={rc}: {cmd}".
+                           format(rc=result['rc'], cmd=' '.join(args)))
+    return result
+
+
+def run_import():
+    """
+    Import the plugin module in a child process using the -X importtime
+    option of Python, and return the cumulative import time of the module.
+
+    Returns:
+      dict: Result with item 'duration' (seconds).
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', IMPORT_CODE]
+    proc = subprocess.Popen(cmd, stderr=subprocess.PIPE)
+    _, stderr = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError("Import of the plugin failed: {e}".
+                           format(e=stderr.decode('utf-8')))
+    # Lines have the format:
+    #   import time: self [us] | cumulative | imported package
+    for line in stderr.decode('utf-8').splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == IMPORT_MODULE:
+            return dict(duration=int(parts[1]) / 1e6)
+    raise RuntimeError("Import time of {m} not found in output of: {c}".
+                       format(m=IMPORT_MODULE, c=' '.join(cmd)))
+
+
+def best_of(runs, func):
+    """
+    Call a function multiple times and return the result with the shortest
+    duration.
+    """
+    return fastest([func() for _ in range(runs)])
+
+
+def fastest(results):
+    """
+    Return the result with the shortest duration.
+    """
+    return min(results, key=lambda r: r['duration'])
+
+
+def median(values):
+    """
+    Return the median of a non-empty list of values.
+    """
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def run_benchmark(opts):
+    """
+    Run the benchmark and return the results.
+    """
+    directory = tempfile.mkdtemp(prefix='es_benchmark_')
+    try:
+        server_file = generate_server_file(
+            directory, opts.servers, opts.group_depth, opts.selected,
+            opts.secret_size)
+        es_module, plain_module = generate_tests(
+            directory, opts.tests, opts.selected)
+        es_args = ['--es-file', server_file]
+        results = {}
+
+        results['import_plugin'] = best_of(opts.runs, run_import)
+
+        number = 3
+        results['load_server_file'] = dict(duration=timeit.timeit(
+            lambda: easy_server.ServerFile(
+                server_file, password=None, use_keyring=False,
+                use_prompting=False).list_default_servers(),
+            number=number) / number)
+
+        results['collect_es'] = best_of(opts.runs, lambda: run_pytest(
+            directory, es_args + ['--collect-only', es_module]))
+        results['collect_plain'] = best_of(opts.runs, lambda: run_pytest(
+            directory, es_args + ['--collect-only', plain_module]))
+        # The runs for the es_server fixture and the plain fixture are
+        # interleaved, so that changes in the load of the system affect both.
+        es_runs = []
+        plain_runs = []
+        for _ in range(opts.runs):
+            es_runs.append(run_pytest(directory, es_args + [es_module]))
+            plain_runs.append(run_pytest(directory, es_args + [plain_module]))
+        results['run_es'] = fastest(es_runs)
+        results['run_plain'] = fastest(plain_runs)
+
+        # The difference of the test loop durations does not include the
+        # startup of the processes and the collection. A negative difference
+        # is within the measurement noise and is reported as no overhead.
+        num_items = opts.tests * opts.selected
+        overhead = (median([r['loop_duration'] for r in es_runs]) -
+                    median([r['loop_duration'] for r in plain_runs])) / \
+            num_items
+        results['per_test_overhead'] = dict(duration=max(overhead, 0.0))
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def print_results(opts, results):
+    """
+    Print the results of the benchmark.
+    """
+    print("Servers: {s}, group depth: {g}, selected servers: {n}, test "
+          "functions: {t}, test items: {i}, secret size: {z} B".
+          format(s=opts.servers, g=opts.group_depth, n=opts.selected,
+                 t=opts.tests, i=opts.tests * opts.selected,
+                 z=opts.secret_size))
+    print("{:<20} {:>12} {:>14}".format("Measurement", "Time [s]",
+                                        "Peak mem [MiB]"))
+    for name, result in sorted(results.items()):
+        duration = result['duration']
+        if name == 'per_test_overhead':
+            duration_str = "{:.1f} us".format(duration * 1e6)
+        else:
+            duration_str = "{:.3f}".format(duration)
+        maxrss = result.get('maxrss_kib', None)
+        maxrss_str = "{:.1f}".format(maxrss / 1024.0) if maxrss else ""
+        print("{:<20} {:>12} {:>14}".format(name, duration_str, maxrss_str))
+
+
+def parse_args(argv):
+    """
+    Parse the command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark for the overhead of the pytest-easy-server "
+        "plugin at scale.")
+    parser.add_argument(
+        '--servers', type=int, default=1000,
+        help="Number of servers in the server file. Default: %(default)s")
+    parser.add_argument(
+        '--group-depth', type=int, default=5,
+        help="Nesting depth of the server groups. Default: %(default)s")
+    parser.add_argument(
+        '--selected', type=int, default=10,
+        help="Number of servers in the default group, i.e. the servers to "
+        "test against. Default: %(default)s")
+    parser.add_argument(
+        '--tests', type=int, default=1000,
+        help="Number of test functions. Default: %(default)s")
+    parser.add_argument(
+        '--secret-size', type=int, default=100,
+        help="Size of the password secret of each server in the vault file, "
+        "in bytes. Default: %(default)s")
+    parser.add_argument(
+        '--runs', type=int, default=3,
+        help="Number of runs of each pytest measurement; the fastest run is "
+        "used, and the median run for the per-test overhead. Default: "
+        "%(default)s")
+    parser.add_argument(
+        '--json', metavar='FILE', default=None,
+        help="Write the results to a JSON file.")
+    opts = parser.parse_args(argv)
+    if opts.selected > opts.servers:
+        parser.error("--selected must not be larger than --servers")
+    if opts.group_depth < 1:
+        parser.error("--group-depth must be at least 1")
+    return opts
+
+
+def main(argv=None):
+    """
+    Entry point of the benchmark.
+    """
+    opts = parse_args(argv)
+    results = run_benchmark(opts)
+    print_results(opts, results)
+    if opts.json:
+        with open(opts.json, 'w') as fp:
+            json.dump(dict(options=vars(opts), results=results), fp, indent=2)
+
+
+if __name__ == '__main__':
+    main()
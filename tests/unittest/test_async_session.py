@@ -0,0 +1,91 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _async_session.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import time
+import pytest
+import easy_server
+
+from pytest_easy_server._async_session import AsyncSessionManager
+
+asyncio = pytest.importorskip('asyncio')
+
+OPEN_DELAY = 0.2
+
+
+class FakeHook(object):
+    """Hook relay for testing, with the asyncio session hooks implemented"""
+
+    def __init__(self):
+        self.closed = []
+
+    # pylint: disable=invalid-name
+    @staticmethod
+    def pytest_es_create_async_session(server):
+        """Create asyncio session"""
+        if server.nickname == 'bad':
+            raise ValueError("bad server")
+        return asyncio.sleep(OPEN_DELAY, result='session-' + server.nickname)
+
+    def pytest_es_close_async_session(self, server, session):
+        """Close asyncio session"""
+        assert session == 'session-' + server.nickname
+        self.closed.append(server.nickname)
+        return asyncio.sleep(0)
+
+
+def make_server(nickname):
+    """Return a server for testing"""
+    return easy_server.Server(nickname, dict(description="test server"))
+
+
+def test_manager_concurrent_open():
+    """
+    Test that the sessions with all servers are opened concurrently, and
+    closed at the end.
+    """
+    hook = FakeHook()
+    manager = AsyncSessionManager(hook)
+    servers = [make_server('srv{}'.format(i)) for i in range(5)]
+
+    start = time.time()
+    server_session = manager.get(servers[1], servers)
+    assert time.time() - start < OPEN_DELAY * len(servers) / 2
+    assert server_session.server is servers[1]
+    assert server_session.session == 'session-srv1'
+
+    for server in servers:
+        assert manager.get(server, servers).session == \
+            'session-' + server.nickname
+    assert server_session.run(asyncio.sleep(0, result=42)) == 42
+
+    manager.close_all()
+    assert sorted(hook.closed) == [s.nickname for s in servers]
+
+
+def test_manager_open_error():
+    """
+    Test that an error creating a session is raised for that server only.
+    """
+    hook = FakeHook()
+    manager = AsyncSessionManager(hook)
+    good = make_server('good')
+    servers = [good, make_server('bad')]
+
+    with pytest.raises(ValueError):
+        manager.get(servers[1], servers)
+    assert manager.get(good, servers).session == 'session-good'
+    manager.close_all()
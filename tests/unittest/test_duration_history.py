@@ -0,0 +1,87 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _duration_history.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+
+from pytest_easy_server._duration_history import DurationHistory, \
+    longest_first
+
+
+class FakeCache(object):
+    """pytest cache for testing"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default):
+        """Get a value from the cache"""
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        """Set a value in the cache"""
+        self.data[key] = dict(value)
+
+
+def test_history_update():
+    """
+    Test that DurationHistory stores the durations in the cache and averages
+    them with the durations of previous runs.
+    """
+    cache = FakeCache()
+
+    history = DurationHistory(cache)
+
+    assert len(history) == 0
+    assert history.expected('t1') == 0.0
+
+    history.update(dict(t1=1.0, t2=3.0))
+    history = DurationHistory(cache)
+
+    assert len(history) == 2
+    assert history.expected('t1') == pytest.approx(1.0)
+    assert history.expected('t2') == pytest.approx(3.0)
+    assert history.expected('t3') == pytest.approx(2.0)
+
+    history.update(dict(t1=2.0))
+    history = DurationHistory(cache)
+
+    assert history.expected('t1') == pytest.approx(1.5)
+    assert history.expected('t2') == pytest.approx(3.0)
+
+
+def test_history_no_cache():
+    """
+    Test DurationHistory without a pytest cache.
+    """
+    history = DurationHistory(None)
+
+    history.update(dict(t1=1.0))
+
+    assert history.expected('t1') == pytest.approx(1.0)
+
+
+def test_longest_first():
+    """
+    Test that longest_first() sorts groups by their expected total duration,
+    keeping the order of groups with the same duration.
+    """
+    durations = dict(t1=1.0, t2=3.0, t3=2.0, t4=2.0)
+    groups = [['t1'], ['t1', 't3'], ['t2'], ['t4']]
+
+    result = longest_first(groups, lambda nodeid: durations[nodeid])
+
+    assert result == [['t1', 't3'], ['t2'], ['t4'], ['t1']]
@@ -15,11 +15,46 @@ Test the _easy_server_fixture.py module.
 """
 
 from __future__ import absolute_import, print_function
+import os
+import shutil
 import pytest
 import easy_server
 
 # pylint: disable=unused-import
 from pytest_easy_server import es_server  # noqa: F401
+from pytest_easy_server._easy_server_fixture import es_server_scope, \
+    DYNAMIC_SCOPE_SUPPORTED
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+TEST_DIR = os.path.dirname(__file__)
+
+# conftest.py file for the scope tests, with a fixture of the specified scope
+# that depends on the es_server fixture and records its setups
+SCOPE_CONFTEST = """
+import pytest
+from pytest_easy_server import es_server  # noqa: F401
+
+@pytest.fixture(scope={scope!r})
+def derived(es_server):
+    with open('setups.txt', 'a') as fp:
+        fp.write(es_server.nickname + '\\n')
+    return es_server.nickname
+"""
+
+# Test module for the scope tests, with two test functions using the
+# derived fixture
+SCOPE_TEST_MODULE = """
+def test_one(derived, es_server):
+    assert derived == es_server.nickname
+
+def test_two(derived, es_server):
+    assert derived == es_server.nickname
+"""
 
 
 @pytest.mark.parametrize(
@@ -82,3 +117,65 @@ def test_fixture_sample(es_server, num):
     assert es_server.access_via == exp_servers[nick]['access_via']
     assert es_server.user_defined == exp_servers[nick]['user_defined']
     assert es_server.secrets == exp_servers[nick]['secrets']
+
+
+def test_es_server_scope(pytestconfig):
+    """
+    Test that the dynamic scope of the es_server fixture is the one specified
+    with the --es-scope option.
+    """
+    scope = es_server_scope('es_server', pytestconfig)
+    assert scope == pytestconfig.getvalue('es_scope')
+    assert scope in ('session', 'package', 'module', 'class')
+
+
+@pytest.mark.skipif(not DYNAMIC_SCOPE_SUPPORTED or not PYTESTER_SUPPORTED,
+                    reason="Requires pytest>=6.2")
+@pytest.mark.parametrize(
+    "es_scope, fixture_scope, exp_setups", [
+        (None, 'module',
+         ['myserver1', 'myserver2', 'myserver1', 'myserver2']),
+        (None, 'function',
+         ['myserver1', 'myserver1', 'myserver2', 'myserver2'] * 2),
+        ('session', 'session', ['myserver1', 'myserver2']),
+        ('session', 'module',
+         ['myserver1', 'myserver1', 'myserver2', 'myserver2']),
+    ]
+)
+def test_es_scope_fixture_reuse(pytester, es_scope, fixture_scope,
+                                exp_setups):
+    """
+    Test that the --es-scope option determines how often fixtures that
+    depend on the es_server fixture are set up, across two test modules.
+    """
+    for filename in ('es_server.yml', 'es_vault.yml'):
+        shutil.copy(os.path.join(TEST_DIR, filename), str(pytester.path))
+    pytester.makeconftest(SCOPE_CONFTEST.format(scope=fixture_scope))
+    pytester.makepyfile(test_a=SCOPE_TEST_MODULE, test_b=SCOPE_TEST_MODULE)
+    args = ['-p', 'no:cacheprovider']
+    if es_scope:
+        args.append('--es-scope={s}'.format(s=es_scope))
+
+    result = pytester.runpytest(*args)
+
+    result.assert_outcomes(passed=8)
+    setups = pytester.path.joinpath('setups.txt').read_text().split()
+    assert setups == exp_setups
+
+
+@pytest.mark.skipif(not DYNAMIC_SCOPE_SUPPORTED or not PYTESTER_SUPPORTED,
+                    reason="Requires pytest>=6.2")
+def test_es_scope_mismatch(pytester):
+    """
+    Test that a session-scoped fixture cannot depend on the es_server fixture
+    with its default module scope.
+    """
+    for filename in ('es_server.yml', 'es_vault.yml'):
+        shutil.copy(os.path.join(TEST_DIR, filename), str(pytester.path))
+    pytester.makeconftest(SCOPE_CONFTEST.format(scope='session'))
+    pytester.makepyfile(test_a=SCOPE_TEST_MODULE)
+
+    result = pytester.runpytest('-p', 'no:cacheprovider')
+
+    result.assert_outcomes(errors=4)
+    result.stdout.fnmatch_lines(['*ScopeMismatch*'])
@@ -0,0 +1,135 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _lazy_vault.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import pytest
+import easy_server
+from easy_server._server_file import _load_server_file
+
+from pytest_easy_server._lazy_vault import LazyServerFile, LazySecretsServer
+
+TESTDIR = os.path.dirname(__file__)
+ES_FILE = os.path.join(TESTDIR, 'es_server.yml')
+ES_GROUP = 'mygroup1'
+
+
+def test_lazy_server_file():
+    """
+    Test that LazyServerFile loads the vault file only when the secrets of a
+    server are accessed, and that the servers are the same as with
+    ServerFile.
+    """
+    esf_obj = LazyServerFile(ES_FILE, password=None, use_keyring=False,
+                             use_prompting=False)
+    es_obj_list = esf_obj.list_default_servers()
+
+    assert esf_obj.is_vault_file_encrypted() is False
+    assert not esf_obj.lazy_vault.loaded
+    assert all(isinstance(es_obj, LazySecretsServer)
+               for es_obj in es_obj_list)
+
+    exp_es_obj_list = easy_server.ServerFile(
+        ES_FILE, password=None, use_keyring=False,
+        use_prompting=False).list_default_servers()
+
+    assert [s.nickname for s in es_obj_list] == \
+        [s.nickname for s in exp_es_obj_list]
+    assert [s.user_defined for s in es_obj_list] == \
+        [s.user_defined for s in exp_es_obj_list]
+    assert not esf_obj.lazy_vault.loaded
+
+    assert [s.secrets for s in es_obj_list] == \
+        [s.secrets for s in exp_es_obj_list]
+    assert esf_obj.lazy_vault.loaded
+
+
+def test_server_file_internals():
+    """
+    Test that the internals of easy_server.ServerFile that LazyServerFile
+    depends on are as expected: LazyServerFile does not call the __init__()
+    method of ServerFile, but loads the server file with the private
+    _load_server_file() function and sets the private attributes of
+    ServerFile itself.
+
+    If this test fails with a new version of easy-server, LazyServerFile
+    needs to be adjusted before the upper bound of the easy-server version
+    in requirements.txt can be raised.
+    """
+    data = _load_server_file(
+        ES_FILE, user_defined_schema=None, group_user_defined_schema=None)
+    assert set(data.keys()) >= \
+        {'vault_file', 'servers', 'server_groups', 'default'}
+
+    esf_obj = easy_server.ServerFile(
+        ES_FILE, password=None, use_keyring=False, use_prompting=False)
+    lazy_esf_obj = LazyServerFile(
+        ES_FILE, password=None, use_keyring=False, use_prompting=False)
+
+    assert sorted(vars(lazy_esf_obj).keys()) == sorted(vars(esf_obj).keys())
+    for name in ('filepath', 'vault_file', 'user_defined_schema',
+                 'group_user_defined_schema', 'vault_server_schema'):
+        assert getattr(lazy_esf_obj, name) == getattr(esf_obj, name)
+    assert lazy_esf_obj.is_vault_file_encrypted() == \
+        esf_obj.is_vault_file_encrypted()
+    for method, args in (('list_default_servers', ()),
+                         ('list_all_servers', ()),
+                         ('list_servers', (ES_GROUP,))):
+        exp_es_obj_list = getattr(esf_obj, method)(*args)
+        es_obj_list = getattr(lazy_esf_obj, method)(*args)
+        assert [s.secrets for s in es_obj_list] == \
+            [s.secrets for s in exp_es_obj_list]
+        assert [repr(s) for s in es_obj_list] == \
+            [repr(s) for s in exp_es_obj_list]
+
+
+def test_lazy_server_file_vault_error(tmpdir):
+    """
+    Test that an error with the vault file is raised only when the secrets of
+    a server are accessed.
+    """
+    es_file = str(tmpdir.join('es_server.yml'))
+    with open(es_file, 'w') as fp:
+        fp.write("vault_file: missing_vault.yml\n"
+                 "servers:\n"
+                 "  srv1:\n"
+                 "    description: server 1\n")
+
+    esf_obj = LazyServerFile(es_file, password=None, use_keyring=False,
+                             use_prompting=False)
+    es_obj = esf_obj.get_server('srv1')
+
+    assert es_obj.nickname == 'srv1'
+    with pytest.raises(easy_server.VaultFileOpenError):
+        _ = es_obj.secrets
+
+
+def test_lazy_server_file_no_vault(tmpdir):
+    """
+    Test LazyServerFile with a server file that does not specify a vault file.
+    """
+    es_file = str(tmpdir.join('es_server.yml'))
+    with open(es_file, 'w') as fp:
+        fp.write("servers:\n"
+                 "  srv1:\n"
+                 "    description: server 1\n")
+
+    esf_obj = LazyServerFile(es_file)
+    es_obj = esf_obj.get_server('srv1')
+
+    assert esf_obj.lazy_vault is None
+    assert esf_obj.is_vault_file_encrypted() is None
+    assert es_obj.secrets is None
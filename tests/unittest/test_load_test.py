@@ -0,0 +1,234 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _load_test.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import json
+import time
+import random
+import shutil
+import threading
+import pytest
+
+from pytest_easy_server._load_test import run_load, summarize_run, \
+    LoadStats, SKETCH_ACCURACY
+from pytest_easy_server._profiler import percentile
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+TEST_DIR = os.path.dirname(__file__)
+
+# Conftest file for test_load_property(), that records the user properties
+# of the load-test runs in the pytest process
+LOAD_CONFTEST = """
+import json
+
+def pytest_runtest_logreport(report):
+    if report.when != 'call':
+        return
+    for name, value in report.user_properties:
+        if name == 'es_load':
+            with open('load.json', 'a') as fp:
+                fp.write(json.dumps(value) + '\\n')
+"""
+
+LOAD_TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_one(es_server):
+    pass
+"""
+
+
+def test_run_load_iterations():
+    """
+    Test that run_load() calls the test function the specified number of
+    times from the specified number of concurrent threads, and counts
+    failures as errors.
+    """
+    lock = threading.Lock()
+    state = dict(calls=0, current=0, max=0)
+
+    def func(value):
+        with lock:
+            state['calls'] += 1
+            state['current'] += 1
+            state['max'] = max(state['max'], state['current'])
+            calls = state['calls']
+        time.sleep(0.01)
+        with lock:
+            state['current'] -= 1
+        assert value == 42
+        if calls % 5 == 0:
+            pytest.fail("failed")
+
+    latencies, errors = run_load(func, dict(value=42), 20, None, 3)
+
+    assert state['calls'] == 20
+    assert state['max'] == 3
+    assert len(latencies) == 20
+    assert len(errors) == 4
+    assert all(latency >= 0.01 for latency in latencies)
+
+
+def test_run_load_duration():
+    """
+    Test that run_load() calls the test function repeatedly for the
+    specified duration.
+    """
+    start = time.time()
+    latencies, errors = run_load(
+        lambda: time.sleep(0.01), {}, 1, 0.1, 2)
+
+    assert time.time() - start >= 0.1
+    assert len(latencies) > 2
+    assert errors == []
+
+
+def test_run_load_skip():
+    """
+    Test that run_load() stops and raises the exception if the test function
+    is skipped.
+    """
+    calls = []
+
+    def func():
+        calls.append(1)
+        pytest.skip("skipped")
+
+    with pytest.raises(pytest.skip.Exception):
+        run_load(func, {}, 10, None, 1)
+    assert len(calls) == 1
+
+
+def test_summarize_run():
+    """
+    Test that summarize_run() aggregates the latencies of a load-test run.
+    """
+    summary = summarize_run([0.004, 0.0005, 0.1, 0.003], 1, 0.5)
+
+    assert summary['iterations'] == 4
+    assert summary['errors'] == 1
+    assert summary['duration'] == 0.5
+    assert summary['min'] == 0.0005
+    assert summary['max'] == 0.1
+    assert summary['p50'] == 0.003
+    assert summary['p95'] == 0.1
+    assert summary['histogram'][:7] == [1, 0, 2, 0, 0, 0, 1]
+    assert sum(count for _, count in summary['sketch']) == 4
+
+    empty = summarize_run([], 0, 0.0)
+    assert empty['iterations'] == 0
+    assert empty['sketch'] == []
+
+
+def test_load_stats_single_run():
+    """
+    Test that the percentiles of LoadStats are exact for a server with a
+    single load-test run.
+    """
+    stats = LoadStats()
+    stats.add('srv1', summarize_run([0.0011, 0.0012, 0.0013], 0, 0.1))
+    stats.add('srv1', summarize_run([], 0, 0.1))
+
+    result = stats.as_dict()['srv1']
+
+    assert result['p50'] == 0.0012
+    assert result['p95'] == 0.0013
+
+
+def test_load_stats_merged_percentiles():
+    """
+    Test that the percentiles of LoadStats across multiple load-test runs are
+    within the relative accuracy of the exact percentiles.
+    """
+    rand = random.Random(42)
+    runs = [[rand.lognormvariate(-5, 1) for _ in range(200)]
+            for _ in range(5)]
+    stats = LoadStats()
+    for latencies in runs:
+        stats.add('srv1', summarize_run(latencies, 0, 1.0))
+
+    result = stats.as_dict()['srv1']
+
+    latencies = sorted(sum(runs, []))
+    assert result['iterations'] == 1000
+    assert result['max'] == latencies[-1]
+    for pct in (50, 95):
+        exact = percentile(latencies, pct)
+        assert result['p{}'.format(pct)] == \
+            pytest.approx(exact, rel=SKETCH_ACCURACY)
+
+
+def test_load_stats():
+    """
+    Test the statistics and the display of LoadStats.
+    """
+    stats = LoadStats()
+    stats.add('srv1', summarize_run([0.0005, 0.003, 0.004, 0.1], 1, 0.5))
+    stats.add('srv1', summarize_run([0.002], 0, 0.5))
+    stats.add('srv2', summarize_run([], 0, 0.0))
+
+    result = stats.as_dict()
+
+    assert list(result.keys()) == ['srv1', 'srv2']
+    srv1 = result['srv1']
+    assert srv1['iterations'] == 5
+    assert srv1['errors'] == 1
+    assert srv1['error_rate'] == pytest.approx(0.2)
+    assert srv1['throughput'] == pytest.approx(5.0)
+    assert srv1['p50'] == pytest.approx(0.003, rel=SKETCH_ACCURACY)
+    assert srv1['max'] == 0.1
+    # Buckets: <=1ms, <=2ms, <=5ms, ..., <=100ms, ...
+    assert srv1['histogram'][:7] == [1, 1, 2, 0, 0, 0, 1]
+    assert result['srv2']['iterations'] == 0
+
+    table = stats.format_table()
+    assert table[2].split()[0:4] == ['srv1', '5', '20.0', '5.0']
+    histograms = stats.format_histograms()
+    assert histograms[0] == "Latencies for server srv1:"
+    assert histograms[1].split() == \
+        ['<=', '1', 'ms', '1', '####################']
+    assert len(histograms) == 8
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+def test_load_property(pytester):
+    """
+    Test that the results of a load-test run are passed to the pytest
+    process in aggregated form, independent of the number of iterations.
+    """
+    for filename in ('es_server.yml', 'es_vault.yml'):
+        shutil.copy(os.path.join(TEST_DIR, filename), str(pytester.path))
+    pytester.makeconftest(LOAD_CONFTEST)
+    pytester.makepyfile(test_a=LOAD_TEST_MODULE)
+
+    result = pytester.runpytest(
+        '-p', 'no:cacheprovider', '--es-load', '--es-load-iterations=500')
+
+    result.assert_outcomes(passed=2)
+    result.stdout.fnmatch_lines(['*load test*', 'myserver1*500*'])
+    with open(str(pytester.path.joinpath('load.json'))) as fp:
+        values = [json.loads(line) for line in fp]
+    assert [v['nickname'] for v in values] == ['myserver1', 'myserver2']
+    for value in values:
+        assert value['iterations'] == 500
+        assert 'latencies' not in value
+        assert len(value['sketch']) < 500
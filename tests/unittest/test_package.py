@@ -15,6 +15,13 @@ Test import and versioning of the package.
 """
 
 from __future__ import absolute_import, print_function
+import sys
+import json
+import subprocess
+
+# Packages that are imported only when servers are used
+DEFERRED_MODULES = ('yaml', 'easy_server', 'easy_vault', 'jsonschema',
+                    'keyring', 'cryptography')
 
 
 def test_import():
@@ -33,3 +40,17 @@ def test_versioning():
     # pylint: disable=import-outside-toplevel
     import pytest_easy_server  # noqa: F401
     assert pytest_easy_server.__version__
+
+
+def test_plugin_import_deferred():
+    """
+    Test that importing the plugin module does not import the packages that
+    are needed only when servers are used, since pytest imports the plugin
+    module for every pytest run.
+    """
+    code = (
+        "import sys, json, pytest_easy_server.plugin; "
+        "print(json.dumps(sorted(m for m in {m!r} if m in sys.modules)))".
+        format(m=DEFERRED_MODULES))
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert json.loads(output.decode('utf-8')) == []
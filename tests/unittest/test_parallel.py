@@ -0,0 +1,244 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _parallel.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+import easy_vault
+
+from pytest_easy_server._parallel import parallel_supported, partition_items
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+SERVER_FILE = """
+vault_file: es_vault.yml
+servers:
+  srv1:
+    description: server 1
+  srv2:
+    description: server 2
+server_groups:
+  all:
+    description: all servers
+    members: [srv1, srv2]
+default: all
+"""
+
+VAULT_FILE = """
+secrets:
+  srv1:
+    host: 10.1.1.1
+  srv2:
+    host: 10.1.1.2
+"""
+
+# Conftest file for the tests with --es-parallel. It records the process IDs
+# of the pytest process and of the processes that run the tests, and replaces
+# the keyring service with a fake that records the password lookups.
+PARALLEL_CONFTEST = """
+import os
+import easy_vault
+
+HERE = os.path.dirname(__file__)
+
+
+def record(filename, line):
+    with open(os.path.join(HERE, filename), 'a') as fp:
+        fp.write(line + '\\n')
+
+
+def pytest_configure(config):
+    with open(os.path.join(HERE, 'parent.txt'), 'w') as fp:
+        fp.write(str(os.getpid()))
+
+
+class FakeKeyring(object):
+
+    def get_password(self, filepath):
+        record('lookups.txt', filepath)
+        return 'mypw'
+
+    def set_password(self, filepath, password):
+        pass
+
+
+easy_vault.Keyring = FakeKeyring
+"""
+
+PARALLEL_TEST_MODULE = """
+import os
+from conftest import record
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_pass(es_server):
+    record('pids.txt', '{}:{}'.format(es_server.nickname, os.getpid()))
+
+def test_fail(es_server):
+    assert 0, "failed for {}".format(es_server.nickname)
+
+def test_plain():
+    record('pids.txt', 'none:{}'.format(os.getpid()))
+
+def test_plain2():
+    pass
+"""
+
+CRASH_TEST_MODULE = """
+import os
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_crash(es_server):
+    if es_server.nickname == 'srv1':
+        os._exit(3)
+
+def test_after(es_server):
+    pass
+"""
+
+SECRETS_TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_secrets(es_server):
+    assert es_server.secrets['host'].startswith('10.1.1.')
+"""
+
+
+def make_parallel_files(pytester, test_module=PARALLEL_TEST_MODULE):
+    """
+    Create the server file, vault file, conftest file and test module for
+    the tests with --es-parallel.
+    """
+    pytester.makefile('.yml', es_server=SERVER_FILE, es_vault=VAULT_FILE)
+    pytester.makeconftest(PARALLEL_CONFTEST)
+    pytester.makepyfile(test_a=test_module)
+
+
+@pytest.mark.parametrize(
+    "item_specs, exp_partitions",
+    [
+        (
+            [],
+            [],
+        ),
+        (
+            [('t1', 'srv1'), ('t2', 'srv2'), ('u1', None), ('t3', 'srv1')],
+            [['t1', 't3'], ['t2'], ['u1']],
+        ),
+        (
+            [('u1', None), ('t1', 'srv2'), ('u2', None), ('t2', 'srv2')],
+            [['u1', 'u2'], ['t1', 't2']],
+        ),
+    ]
+)
+def test_partition_items(item_specs, exp_partitions):
+    """
+    Test partition_items().
+    """
+    nicknames = dict(item_specs)
+    items = [name for name, _ in item_specs]
+    partitions = partition_items(items, nicknames.get)
+    assert partitions == exp_partitions
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED or not parallel_supported(),
+                    reason="Requires pytest>=6.2 and os.fork()")
+def test_run_parallel_relay(pytester):
+    """
+    Test that the tests of each server run in a child process of their own,
+    and that their results are reported by the pytest process.
+    """
+    make_parallel_files(pytester)
+
+    result = pytester.runpytest_subprocess(
+        '-p', 'no:cacheprovider', '--es-parallel=3', '-v', timeout=60)
+
+    result.assert_outcomes(passed=4, failed=2)
+    result.stdout.fnmatch_lines([
+        '*test_fail[[]es_server=srv1[]] FAILED*',
+        '*AssertionError: failed for srv1',
+    ])
+    lines = pytester.path.joinpath('pids.txt').read_text().split()
+    pids_by_server = {}
+    for line in lines:
+        nickname, pid = line.split(':')
+        pids_by_server.setdefault(nickname, set()).add(pid)
+    assert sorted(pids_by_server) == ['none', 'srv1', 'srv2']
+    assert all(len(p) == 1 for p in pids_by_server.values())
+    all_pids = set.union(*pids_by_server.values())
+    assert len(all_pids) == 3
+    assert pytester.path.joinpath('parent.txt').read_text() not in all_pids
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED or not parallel_supported(),
+                    reason="Requires pytest>=6.2 and os.fork()")
+def test_run_parallel_crash(pytester):
+    """
+    Test that the tests of a child process that terminates unexpectedly are
+    reported as failed, without affecting the other child processes.
+    """
+    make_parallel_files(pytester, test_module=CRASH_TEST_MODULE)
+
+    result = pytester.runpytest_subprocess(
+        '-p', 'no:cacheprovider', '--es-parallel=2', timeout=60)
+
+    result.assert_outcomes(passed=2, failed=2)
+    result.stdout.fnmatch_lines([
+        '*Child process for parallel execution terminated unexpectedly '
+        'with exit code 3*',
+    ])
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED or not parallel_supported(),
+                    reason="Requires pytest>=6.2 and os.fork()")
+@pytest.mark.parametrize("num", [2, 3])
+def test_run_parallel_exitfirst(pytester, num):
+    """
+    Test that -x stops the test run, also when there are more partitions
+    than child processes.
+    """
+    make_parallel_files(pytester)
+
+    result = pytester.runpytest_subprocess(
+        '-p', 'no:cacheprovider', '--es-parallel={n}'.format(n=num), '-x',
+        timeout=60)
+
+    assert result.ret == 1
+    outcomes = result.parseoutcomes()
+    assert outcomes['failed'] == 1
+    result.stdout.fnmatch_lines(['*stopping after 1 failures*'])
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED or not parallel_supported(),
+                    reason="Requires pytest>=6.2 and os.fork()")
+def test_run_parallel_secrets(pytester, monkeypatch):
+    """
+    Test that the vault password is retrieved once in the pytest process,
+    instead of in every child process.
+    """
+    monkeypatch.delenv('ES_VAULT_PASSWORD', raising=False)
+    make_parallel_files(pytester, test_module=SECRETS_TEST_MODULE)
+    vault_file = str(pytester.path.joinpath('es_vault.yml'))
+    easy_vault.EasyVault(vault_file, 'mypw').encrypt()
+
+    result = pytester.runpytest_subprocess(
+        '-p', 'no:cacheprovider', '--es-parallel=2', timeout=60)
+
+    result.assert_outcomes(passed=2)
+    lookups = pytester.path.joinpath('lookups.txt').read_text().splitlines()
+    assert lookups == [vault_file]
@@ -0,0 +1,232 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _password_broker.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import getpass
+import threading
+import pytest
+import easy_vault
+
+from pytest_easy_server._password_broker import PasswordBroker
+from pytest_easy_server._lazy_vault import LazyServerFile
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+# Conftest file for test_password_xdist_single_lookup(), that replaces the
+# keyring service with a fake that records the password lookups of all
+# pytest processes in a file
+XDIST_KEYRING_CONFTEST = """
+import os
+import easy_vault
+
+LOOKUPS_FILE = os.path.join(os.path.dirname(__file__), 'lookups.txt')
+
+
+class FakeKeyring(object):
+
+    def get_password(self, filepath):
+        with open(LOOKUPS_FILE, 'a') as fp:
+            fp.write(filepath + '\\n')
+        return 'mypw'
+
+    def set_password(self, filepath, password):
+        pass
+
+
+easy_vault.Keyring = FakeKeyring
+"""
+
+XDIST_TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_one(es_server):
+    assert es_server.secrets['host'].startswith('10.1.1.')
+"""
+
+
+class FakeKeyring(object):
+    """
+    Fake for easy_vault.Keyring that records the calls.
+    """
+    passwords = {}
+    calls = []
+
+    def get_password(self, filepath):
+        # pylint: disable=missing-function-docstring
+        FakeKeyring.calls.append(('get', filepath))
+        return FakeKeyring.passwords.get(filepath, None)
+
+    def set_password(self, filepath, password):
+        # pylint: disable=missing-function-docstring
+        FakeKeyring.calls.append(('set', filepath))
+        FakeKeyring.passwords[filepath] = password
+
+
+@pytest.fixture
+def fake_keyring(monkeypatch):
+    """
+    Fixture that replaces the keyring service with a fake.
+    """
+    FakeKeyring.passwords = {}
+    FakeKeyring.calls = []
+    monkeypatch.setattr(easy_vault, 'Keyring', FakeKeyring)
+    return FakeKeyring
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """
+    Fixture that replaces password prompting and returns the list of prompts.
+    """
+    prompt_list = []
+
+    def fake_getpass(prompt):
+        prompt_list.append(prompt)
+        return 'prompted'
+
+    monkeypatch.setattr(getpass, 'getpass', fake_getpass)
+    return prompt_list
+
+
+def test_password_broker_keyring(fake_keyring, prompts):
+    # pylint: disable=redefined-outer-name
+    """
+    Test that concurrent requests for a password access the keyring service
+    only once.
+    """
+    filepath = os.path.abspath('vault.yml')
+    fake_keyring.passwords[filepath] = 'mypw'
+    broker = PasswordBroker()
+    results = []
+
+    def get():
+        results.append(broker.get_password('vault.yml'))
+
+    threads = [threading.Thread(target=get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    broker.confirm_password('vault.yml')
+
+    assert results == ['mypw'] * 10
+    assert fake_keyring.calls == [('get', filepath)]
+    assert prompts == []
+    assert broker.passwords() == {filepath: 'mypw'}
+
+
+def test_password_broker_prompt(fake_keyring, prompts):
+    # pylint: disable=redefined-outer-name
+    """
+    Test that the password is prompted for only once, and is stored in the
+    keyring service once it is confirmed.
+    """
+    filepath = os.path.abspath('vault.yml')
+    broker = PasswordBroker()
+
+    assert broker.get_password(filepath) == 'prompted'
+    assert broker.get_password(filepath) == 'prompted'
+    assert len(prompts) == 1
+
+    broker.confirm_password(filepath)
+    broker.confirm_password(filepath)
+    assert fake_keyring.calls == [('get', filepath), ('set', filepath)]
+    assert fake_keyring.passwords == {filepath: 'prompted'}
+
+
+def test_password_broker_passwords(fake_keyring, prompts):
+    # pylint: disable=redefined-outer-name
+    """
+    Test that known passwords are used without accessing the keyring service
+    or prompting.
+    """
+    filepath = os.path.abspath('vault.yml')
+    broker = PasswordBroker(passwords={filepath: 'known'})
+
+    assert broker.get_password(filepath) == 'known'
+    assert fake_keyring.calls == []
+    assert prompts == []
+
+
+def test_password_broker_lazy_server_file(tmpdir, fake_keyring, prompts):
+    # pylint: disable=redefined-outer-name
+    """
+    Test that multiple server files with the same encrypted vault file get
+    the password from the broker once.
+    """
+    es_file = str(tmpdir.join('es_server.yml'))
+    vault_file = str(tmpdir.join('es_vault.yml'))
+    with open(es_file, 'w') as fp:
+        fp.write("vault_file: es_vault.yml\n"
+                 "servers:\n"
+                 "  srv1:\n"
+                 "    description: server 1\n")
+    with open(vault_file, 'w') as fp:
+        fp.write("secrets:\n"
+                 "  srv1:\n"
+                 "    host: 10.1.1.1\n")
+    easy_vault.EasyVault(vault_file, 'mypw').encrypt()
+    fake_keyring.passwords[vault_file] = 'mypw'
+    broker = PasswordBroker()
+
+    for _ in range(3):
+        esf_obj = LazyServerFile(es_file, password_broker=broker)
+        assert esf_obj.get_server('srv1').secrets == {'host': '10.1.1.1'}
+
+    assert fake_keyring.calls == [('get', vault_file)]
+    assert prompts == []
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+def test_password_xdist_single_lookup(pytester, monkeypatch):
+    """
+    Test that a pytest-xdist run retrieves the vault password from the
+    keyring service only once, on the controller.
+    """
+    pytest.importorskip('xdist')
+    monkeypatch.delenv('ES_VAULT_PASSWORD', raising=False)
+    pytester.makefile('.yml', es_server="vault_file: es_vault.yml\n"
+                      "servers:\n"
+                      "  srv1:\n"
+                      "    description: server 1\n"
+                      "  srv2:\n"
+                      "    description: server 2\n"
+                      "server_groups:\n"
+                      "  all:\n"
+                      "    description: all servers\n"
+                      "    members: [srv1, srv2]\n"
+                      "default: all\n")
+    vault_file = str(pytester.path.joinpath('es_vault.yml'))
+    with open(vault_file, 'w') as fp:
+        fp.write("secrets:\n"
+                 "  srv1:\n"
+                 "    host: 10.1.1.1\n"
+                 "  srv2:\n"
+                 "    host: 10.1.1.2\n")
+    easy_vault.EasyVault(vault_file, 'mypw').encrypt()
+    pytester.makeconftest(XDIST_KEYRING_CONFTEST)
+    pytester.makepyfile(test_a=XDIST_TEST_MODULE, test_b=XDIST_TEST_MODULE)
+
+    result = pytester.runpytest_subprocess('-n', '2', '-p', 'no:cacheprovider')
+
+    result.assert_outcomes(passed=4)
+    lookups = pytester.path.joinpath('lookups.txt').read_text().splitlines()
+    assert lookups == [vault_file]
@@ -0,0 +1,427 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the plugin.py module.
+
+The tests in this module use the pytest config of the running pytest session,
+so they expect the same pytest options as the other unit tests (see the
+Makefile).
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import argparse
+import pytest
+import easy_server
+import easy_vault
+
+from pytest_easy_server import plugin
+from pytest_easy_server._profiler import PhaseProfiler
+
+
+def test_get_es_obj_list_cached(pytestconfig):
+    """
+    Test that get_es_obj_list() returns the same list object on repeated
+    calls within a pytest session.
+    """
+    es_obj_list1 = plugin.get_es_obj_list(pytestconfig)
+    es_obj_list2 = plugin.get_es_obj_list(pytestconfig)
+    assert es_obj_list2 is es_obj_list1
+    nicks = [es_obj.nickname for es_obj in es_obj_list1]
+    assert nicks == ['myserver1', 'myserver2']
+
+
+def test_es_obj_list_json_roundtrip(pytestconfig):
+    """
+    Test that serializing and deserializing the servers for passing them to
+    pytest-xdist workers preserves the servers including their secrets.
+    """
+    es_obj_list = plugin.get_es_obj_list(pytestconfig)
+    json_str = plugin.es_obj_list_to_json(es_obj_list)
+    es_obj_list2 = plugin.es_obj_list_from_json(json_str)
+    assert [repr(s) for s in es_obj_list2] == [repr(s) for s in es_obj_list]
+    assert [s.secrets for s in es_obj_list2] == \
+        [s.secrets for s in es_obj_list]
+
+
+def test_es_obj_list_from_workerinput(pytestconfig):
+    """
+    Test that a pytest-xdist worker got the servers from the controller.
+    """
+    if not hasattr(pytestconfig, 'workerinput'):
+        pytest.skip("Not running as a pytest-xdist worker")
+    key = plugin.es_obj_list_key(pytestconfig)
+    es_obj_list = plugin.es_obj_list_from_workerinput(pytestconfig, key)
+    nicks = [es_obj.nickname for es_obj in es_obj_list]
+    assert nicks == ['myserver1', 'myserver2']
+
+
+class FakeConfig(object):
+    # pylint: disable=too-few-public-methods
+    """Pytest config with options for testing"""
+
+    def __init__(self, **options):
+        self.options = dict(
+            es_file='es_server.yml', es_nickname=None, es_schema_file=None,
+            es_encrypted=False, es_preflight=False, es_select='all',
+            es_shard=None, es_cache_dir=None, verbose=0)
+        self.options.update(options)
+        self._es_obj_lists = {}
+
+    def getvalue(self, name):
+        """Return the value of an option"""
+        return self.options[name]
+
+
+class FakeNode(object):
+    # pylint: disable=too-few-public-methods
+    """pytest-xdist worker node for testing"""
+
+    def __init__(self, config):
+        self.config = config
+        self.workerinput = {}
+
+
+class FakeLazyServer(easy_server.Server):
+    # pylint: disable=too-few-public-methods
+    """Server whose secrets have not been loaded yet"""
+
+    secrets_loaded = False
+
+    @property
+    def secrets(self):
+        raise AssertionError("Secrets of {n} accessed".format(n=self.nickname))
+
+
+class FakeKeyring(object):
+    """
+    Fake for easy_vault.Keyring that records the password lookups.
+    """
+    passwords = {}
+    calls = []
+
+    def get_password(self, filepath):
+        # pylint: disable=missing-function-docstring
+        FakeKeyring.calls.append(filepath)
+        return FakeKeyring.passwords.get(filepath, None)
+
+
+def test_configure_node_no_server_file(tmpdir):
+    """
+    Test that the pytest-xdist controller passes nothing to the workers if
+    the server file does not exist.
+    """
+    node = FakeNode(FakeConfig(es_file=str(tmpdir.join('es_server.yml'))))
+
+    plugin.pytest_configure_node(node)
+
+    assert node.workerinput == {}
+
+
+def test_configure_node_lazy(tmpdir, monkeypatch):
+    """
+    Test that the pytest-xdist controller passes the servers without their
+    secrets and the vault password to the workers, without decrypting the
+    vault file, and that the workers then do not access the keyring service.
+    """
+    es_file = str(tmpdir.join('es_server.yml'))
+    vault_file = str(tmpdir.join('es_vault.yml'))
+    with open(es_file, 'w') as fp:
+        fp.write("vault_file: es_vault.yml\n"
+                 "servers:\n"
+                 "  srv1:\n"
+                 "    description: server 1\n"
+                 "default: srv1\n")
+    with open(vault_file, 'w') as fp:
+        fp.write("secrets:\n"
+                 "  srv1:\n"
+                 "    host: 10.1.1.1\n")
+    easy_vault.EasyVault(vault_file, 'mypw').encrypt()
+    monkeypatch.delenv(plugin.VAULT_PASSWORD_VAR, raising=False)
+    monkeypatch.setattr(easy_vault, 'Keyring', FakeKeyring)
+    monkeypatch.setattr(FakeKeyring, 'passwords', {vault_file: 'mypw'})
+    monkeypatch.setattr(FakeKeyring, 'calls', [])
+    config = FakeConfig(es_file=es_file)
+    node = FakeNode(config)
+
+    plugin.pytest_configure_node(node)
+
+    es_input = node.workerinput[plugin.WORKERINPUT_KEY]
+    assert es_input['vault']['file'] == vault_file
+    assert es_input['passwords'] == {vault_file: 'mypw'}
+    assert FakeKeyring.calls == [vault_file]
+    # pylint: disable=protected-access
+    key = plugin.es_obj_list_key(config)
+    assert not config._es_obj_lists[key][0].secrets_loaded
+
+    worker_config = FakeConfig(es_file=es_file)
+    # pylint: disable=attribute-defined-outside-init
+    worker_config.workerinput = node.workerinput
+    es_obj_list = plugin.es_obj_list_from_workerinput(worker_config, key)
+
+    assert [(s.nickname, s.secrets) for s in es_obj_list] == \
+        [('srv1', {'host': '10.1.1.1'})]
+    assert FakeKeyring.calls == [vault_file]
+
+
+@pytest.mark.parametrize(
+    "server_class, exp_servers", [
+        (easy_server.Server, True),
+        (FakeLazyServer, False),
+    ]
+)
+def test_configure_node_resolved(server_class, exp_servers):
+    """
+    Test that the pytest-xdist controller passes already resolved servers to
+    the workers only if their secrets have been loaded.
+    """
+    config = FakeConfig(es_file=os.path.abspath(__file__))
+    key = plugin.es_obj_list_key(config)
+    es_obj = server_class('srv1', dict(description='Server 1'), dict(a=1))
+    # pylint: disable=protected-access
+    config._es_obj_lists[key] = [es_obj]
+    node = FakeNode(config)
+
+    plugin.pytest_configure_node(node)
+
+    es_input = node.workerinput[plugin.WORKERINPUT_KEY]
+    assert es_input['key'] == list(key)
+    if exp_servers:
+        es_obj_list = plugin.es_obj_list_from_json(es_input['servers'])
+        assert [(s.nickname, s.secrets) for s in es_obj_list] == \
+            [('srv1', dict(a=1))]
+    else:
+        assert es_input['servers'] is None
+
+
+def test_testnodedown_profile():
+    """
+    Test that the profiling results of pytest-xdist workers are merged into
+    the profiling results of the controller.
+    """
+    config = FakeConfig()
+    # pylint: disable=protected-access,attribute-defined-outside-init
+    config._es_profiler = PhaseProfiler()
+    config._es_profiler.record('load_server_file', 0.1)
+    worker_profiler = PhaseProfiler()
+    worker_profiler.record('load_secrets', 0.2)
+    node = FakeNode(config)
+    node.workeroutput = {
+        plugin.WORKEROUTPUT_PROFILE_KEY: dict(worker_profiler.as_dict())}
+
+    plugin.pytest_testnodedown(node, None)
+
+    phases = config._es_profiler.as_dict()
+    assert list(phases.keys()) == ['load_server_file', 'load_secrets']
+    assert phases['load_secrets']['count'] == 1
+
+
+class FakeCallSpec(object):
+    # pylint: disable=too-few-public-methods
+    """Call spec of a fake test item"""
+
+    def __init__(self, params):
+        self.params = params
+
+
+class FakeItem(object):
+    # pylint: disable=too-few-public-methods
+    """Fake test item, optionally using the es_server fixture"""
+
+    def __init__(self, name, nickname=None, parent='mod'):
+        self.name = name
+        self.nodeid = name
+        self.parent = parent
+        if nickname is not None:
+            es_obj = easy_server.Server(nickname, dict(description="test"))
+            self.callspec = FakeCallSpec(dict(es_server=es_obj))
+
+
+@pytest.mark.parametrize(
+    "item_specs, exp_names, exp_switches",
+    [
+        (
+            [],
+            [],
+            (0, 0),
+        ),
+        (
+            [('t1', 'srv1'), ('t2', 'srv2'), ('t3', 'srv1'), ('t4', 'srv2')],
+            ['t1', 't3', 't2', 't4'],
+            (3, 1),
+        ),
+        (
+            [('t1', 'srv2'), ('t2', 'srv1'), ('u1', None), ('t3', 'srv2'),
+             ('t4', 'srv1'), ('u2', None)],
+            ['t1', 't3', 'u1', 't2', 't4', 'u2'],
+            (3, 1),
+        ),
+        (
+            [('u1', None), ('t1', 'srv1'), ('t2', 'srv1')],
+            ['u1', 't1', 't2'],
+            (0, 0),
+        ),
+    ]
+)
+def test_group_items_by_server(item_specs, exp_names, exp_switches):
+    """
+    Test group_items_by_server().
+    """
+    items = [FakeItem(name, nickname) for name, nickname in item_specs]
+    switches = plugin.group_items_by_server(items)
+    assert [item.name for item in items] == exp_names
+    assert switches == exp_switches
+
+
+@pytest.mark.parametrize(
+    "nodeid, exp_nickname",
+    [
+        ("test_a.py::test_foo", None),
+        ("test_a.py::test_foo[1]", None),
+        ("test_a.py::test_foo[es_server=srv_1]", "srv_1"),
+        ("test_a.py::TestA::test_foo[es_server=srv1-2]", "srv1"),
+        ("test_a.py::test_foo[x-es_server=srv1]", "srv1"),
+        ("test_a.py::test_foo[my_es_server=srv1]", None),
+    ]
+)
+def test_nodeid_es_nickname(nodeid, exp_nickname):
+    """
+    Test nodeid_es_nickname().
+    """
+    assert plugin.nodeid_es_nickname(nodeid) == exp_nickname
+
+
+@pytest.mark.parametrize(
+    "item_specs, exp_names",
+    [
+        (
+            [('t1', 'a'), ('t2', 'a'), ('t3', 'a')],
+            ['t2', 't3', 't1'],
+        ),
+        (
+            [('t1', 'a'), ('t2', 'a'), ('t3', 'b'), ('t4', 'b')],
+            ['t2', 't1', 't3', 't4'],
+        ),
+        (
+            [('t1', None), ('t2', None), ('t3', 'a')],
+            ['t1', 't2', 't3'],
+        ),
+        (
+            [('t1', 'a', 'mod1'), ('t2', 'a', 'mod2'), ('t3', 'a', 'mod2')],
+            ['t1', 't2', 't3'],
+        ),
+    ]
+)
+def test_sort_items_longest_first(item_specs, exp_names):
+    """
+    Test sort_items_longest_first().
+    """
+    durations = dict(t1=1.0, t2=3.0, t3=2.0, t4=0.5)
+    items = [FakeItem(*spec) for spec in item_specs]
+
+    plugin.sort_items_longest_first(items, lambda nodeid: durations[nodeid])
+
+    assert [item.name for item in items] == exp_names
+
+
+@pytest.mark.parametrize(
+    "value, exp_result",
+    [
+        ("1/1", (1, 1)),
+        ("2/3", (2, 3)),
+        ("3/3", (3, 3)),
+        ("0/3", None),
+        ("4/3", None),
+        ("1/0", None),
+        ("1", None),
+        ("a/b", None),
+        ("1/2/3", None),
+    ]
+)
+def test_shard_spec(value, exp_result):
+    """
+    Test shard_spec().
+    """
+    if exp_result is None:
+        with pytest.raises(argparse.ArgumentTypeError):
+            plugin.shard_spec(value)
+    else:
+        assert plugin.shard_spec(value) == exp_result
+
+
+def test_server_shard():
+    """
+    Test that server_shard() is stable and partitions the servers into the
+    shards.
+    """
+    nicknames = ['myserver1', 'myserver2', 'srv1', 'srv2', 'srv3']
+
+    # The shards must not change across Python versions and releases of the
+    # plugin, so that CI jobs using different versions agree on them.
+    assert [plugin.server_shard(n, 3) for n in nicknames] == [3, 2, 2, 3, 1]
+    assert [plugin.server_shard(n, 1) for n in nicknames] == [1] * 5
+
+    nicknames = ['srv{}'.format(i) for i in range(100)]
+    shards = [plugin.server_shard(n, 4) for n in nicknames]
+    assert set(shards) == {1, 2, 3, 4}
+
+
+def test_get_es_params(pytestconfig):
+    """
+    Test that get_es_params() returns the same parameter sets with the same
+    canonical server objects on repeated calls within a pytest session.
+    """
+    es_params1 = plugin.get_es_params(pytestconfig)
+    es_params2 = plugin.get_es_params(pytestconfig)
+    assert es_params2 is es_params1
+
+    ids = [p.id for p in es_params1]
+    assert ids == ['es_server=myserver1', 'es_server=myserver2']
+
+    es_obj_list = plugin.get_es_obj_list(pytestconfig)
+    for es_param, es_obj in zip(es_params1, es_obj_list):
+        assert es_param.values[0] is es_obj
+
+
+class FakeReport(object):
+    # pylint: disable=too-few-public-methods
+    """Test report for testing"""
+
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+
+
+def test_format_selection_table():
+    """
+    Test that format_selection_table() counts each test once, including
+    servers that have not been selected.
+    """
+    stats = {
+        'passed': [FakeReport('t.py::test_a[es_server=srv1]'),
+                   FakeReport('t.py::test_b[es_server=srv1]'),
+                   FakeReport('t.py::test_c[es_server=srv2]'),
+                   FakeReport('t.py::test_plain')],
+        'failed': [FakeReport('t.py::test_d[es_server=srv1]'),
+                   FakeReport('t.py::test_d[es_server=srv1]')],
+    }
+    weights = dict(srv1=3.0, srv2=1.0, srv3=0.0)
+
+    lines = plugin.format_selection_table(weights, stats)
+
+    assert [line.split() for line in lines[2:]] == [
+        ['srv1', '3.00', '75.0', '3', '75.0'],
+        ['srv2', '1.00', '25.0', '1', '25.0'],
+        ['srv3', '0.00', '0.0', '0', '0.0'],
+    ]
+    assert plugin.format_selection_table(None, stats) == []
+    assert plugin.format_selection_table(weights, {}) == []
@@ -0,0 +1,121 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _preflight.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import time
+import socket
+import pytest
+import easy_server
+
+from pytest_easy_server._preflight import server_address, probe_servers
+from pytest_easy_server.plugin import pytest_es_probe_server
+
+
+def make_server(nickname, user_defined=None, secrets=None):
+    """Return a server with the specified properties"""
+    server_dict = dict(description="desc")
+    if user_defined is not None:
+        server_dict['user_defined'] = user_defined
+    return easy_server.Server(nickname, server_dict, secrets)
+
+
+TESTCASES_SERVER_ADDRESS = [
+    # Testcases for test_server_address()
+    # Each list item is a tuple of: (user_defined, secrets, exp_address)
+    (None, None, None),
+    (dict(stuff='x'), None, None),
+    (dict(host='h1', port=22), None, ('h1', 22)),
+    (dict(host='h1', port='22'), None, ('h1', 22)),
+    (dict(host='h1:443'), None, ('h1', 443)),
+    (dict(host='h1'), None, None),
+    (None, dict(host='h2', port=80), ('h2', 80)),
+    (dict(host='h1', port=22), dict(host='h2', port=80), ('h1', 22)),
+    (dict(host='h1', port='abc'), None, None),
+]
+
+
+@pytest.mark.parametrize(
+    "user_defined, secrets, exp_address", TESTCASES_SERVER_ADDRESS)
+def test_server_address(user_defined, secrets, exp_address):
+    """
+    Test function for server_address().
+    """
+    server = make_server('srv', user_defined, secrets)
+
+    address = server_address(server)
+
+    assert address == exp_address
+
+
+def test_probe_servers_tcp():
+    """
+    Test function for probe_servers() with the default TCP probe, against a
+    listening and a closed port.
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    open_port = listener.getsockname()[1]
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1', 0))
+    closed_port = closed.getsockname()[1]
+    try:
+        servers = [
+            make_server('up', dict(host='127.0.0.1', port=open_port)),
+            make_server('down', dict(host='127.0.0.1', port=closed_port)),
+            make_server('noaddr'),
+        ]
+
+        unreachable = probe_servers(servers, pytest_es_probe_server, 5)
+    finally:
+        listener.close()
+        closed.close()
+
+    assert sorted(unreachable.keys()) == ['down']
+
+
+def test_probe_servers_concurrent():
+    """
+    Test function for probe_servers() with a probe function, verifying that
+    the servers are probed concurrently and that hanging probes time out.
+    """
+
+    def probe(server, timeout):
+        """Probe function for testing"""
+        if server.nickname == 'hang':
+            time.sleep(timeout * 5)
+        else:
+            time.sleep(timeout / 2)
+        if server.nickname == 'false':
+            return False
+        if server.nickname == 'error':
+            raise ValueError("bad server")
+        return None
+
+    nicknames = ['ok{}'.format(i) for i in range(10)] + \
+        ['hang', 'false', 'error']
+    servers = [make_server(n) for n in nicknames]
+
+    start = time.time()
+    unreachable = probe_servers(servers, probe, 0.2)
+    duration = time.time() - start
+
+    assert duration < 1.0
+    assert unreachable == {
+        'hang': "probe timed out",
+        'false': "probe failed",
+        'error': "ValueError: bad server",
+    }
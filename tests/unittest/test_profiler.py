@@ -0,0 +1,144 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _profiler.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+
+from pytest_easy_server._profiler import PhaseProfiler, profile_phase, \
+    ServerDurationStats, percentile
+
+
+def test_profiler_record():
+    """
+    Test that PhaseProfiler records the count and durations of the phases,
+    in the order the phases were first run.
+    """
+    profiler = PhaseProfiler()
+    profiler.record('b', 0.2)
+    profiler.record('a', 0.1)
+    profiler.record('b', 0.4)
+
+    stats = profiler.as_dict()
+
+    assert list(stats.keys()) == ['b', 'a']
+    assert stats['b']['count'] == 2
+    assert stats['b']['total'] == pytest.approx(0.6)
+    assert stats['b']['min'] == pytest.approx(0.2)
+    assert stats['b']['max'] == pytest.approx(0.4)
+    assert stats['a']['count'] == 1
+
+    lines = profiler.format_table()
+
+    assert len(lines) == 4
+    assert lines[0].split() == \
+        ['Phase', 'Count', 'Total', '[ms]', 'Avg', '[ms]', 'Max', '[ms]']
+    assert lines[2].split() == ['b', '2', '600.000', '300.000', '400.000']
+
+
+def test_profiler_merge():
+    """
+    Test that PhaseProfiler merges the statistics of another profiler.
+    """
+    profiler = PhaseProfiler()
+    profiler.record('a', 0.1)
+    other = PhaseProfiler()
+    other.record('b', 0.3)
+    other.record('a', 0.2)
+    other.record('a', 0.05)
+
+    profiler.merge(other.as_dict())
+    stats = profiler.as_dict()
+
+    assert list(stats.keys()) == ['a', 'b']
+    assert stats['a']['count'] == 3
+    assert stats['a']['total'] == pytest.approx(0.35)
+    assert stats['a']['min'] == pytest.approx(0.05)
+    assert stats['a']['max'] == pytest.approx(0.2)
+    assert stats['b'] == other.as_dict()['b']
+
+
+def test_profile_phase():
+    """
+    Test that profile_phase() records a phase also when the 'with' block
+    raises an exception, and does nothing when profiling is disabled.
+    """
+    profiler = PhaseProfiler()
+
+    with profile_phase(profiler, 'ok'):
+        pass
+    with pytest.raises(ValueError):
+        with profile_phase(profiler, 'error'):
+            raise ValueError("error")
+    with profile_phase(None, 'disabled'):
+        pass
+
+    stats = profiler.as_dict()
+
+    assert list(stats.keys()) == ['ok', 'error']
+    assert stats['ok']['count'] == 1
+    assert stats['ok']['total'] >= 0
+
+
+@pytest.mark.parametrize(
+    "values, percent, exp_value",
+    [
+        ([1.0], 50, 1.0),
+        ([1.0], 95, 1.0),
+        ([1.0, 2.0], 50, 1.0),
+        ([1.0, 2.0], 95, 2.0),
+        ([1.0, 2.0, 3.0, 4.0], 50, 2.0),
+        ([float(v) for v in range(1, 101)], 95, 95.0),
+        ([float(v) for v in range(1, 101)], 0, 1.0),
+        ([float(v) for v in range(1, 101)], 100, 100.0),
+    ]
+)
+def test_percentile(values, percent, exp_value):
+    """
+    Test function for percentile().
+    """
+    assert percentile(values, percent) == exp_value
+
+
+def test_server_duration_stats():
+    """
+    Test that ServerDurationStats aggregates the durations of the test phases
+    by test and by server.
+    """
+    stats = ServerDurationStats()
+    for nodeid, duration in (('t1', 1.0), ('t2', 3.0), ('t3', 2.0)):
+        stats.add('srv1', nodeid, 'setup', 0.5)
+        stats.add('srv1', nodeid, 'call', duration)
+        stats.add('srv1', nodeid, 'teardown', 0.5)
+    stats.add('srv2', 't1', 'call', 10.0)
+
+    result = stats.as_dict()
+
+    assert list(result.keys()) == ['srv1', 'srv2']
+    assert result['srv1']['count'] == 3
+    assert result['srv1']['total'] == pytest.approx(9.0)
+    assert result['srv1']['p50'] == pytest.approx(3.0)
+    assert result['srv1']['p95'] == pytest.approx(4.0)
+    assert result['srv1']['max'] == pytest.approx(4.0)
+    assert result['srv1']['phases'] == \
+        dict(setup=pytest.approx(1.5), call=pytest.approx(6.0),
+             teardown=pytest.approx(1.5))
+    assert result['srv2']['count'] == 1
+
+    lines = stats.format_table()
+
+    assert len(lines) == 4
+    assert lines[2].split() == \
+        ['srv1', '3', '9.000', '3.000', '4.000', '4.000']
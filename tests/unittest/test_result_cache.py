@@ -0,0 +1,208 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _result_cache.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import json
+import pytest
+
+from pytest_easy_server._result_cache import ResultCache, result_key, \
+    file_hash
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+SERVER_FILE = """
+vault_file: es_vault.yml
+servers:
+  srv1:
+    description: server 1
+  srv2:
+    description: server 2
+server_groups:
+  all:
+    description: all servers
+    members: [srv1, srv2]
+default: all
+"""
+
+VAULT_FILE = """
+secrets:
+  srv1:
+    host: 10.1.1.1
+  srv2:
+    host: 10.1.1.2
+"""
+
+TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+
+def {name}(es_server):
+    assert es_server.secrets['host']
+"""
+
+
+class FakeCache(object):
+    """pytest cache for testing"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default):
+        """Get a value from the cache"""
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        """Set a value in the cache"""
+        self.data[key] = dict(value)
+
+
+def test_result_cache_update():
+    """
+    Test that ResultCache stores the outcomes in the cache and reuses only
+    passed outcomes with an unchanged result key.
+    """
+    cache = FakeCache()
+
+    results = ResultCache(cache)
+
+    assert len(results) == 0
+    assert not results.passed('t1', 'k1')
+
+    results.update(dict(t1=('k1', 'passed'), t2=('k2', 'failed')))
+    results = ResultCache(cache)
+
+    assert len(results) == 2
+    assert results.passed('t1', 'k1')
+    assert not results.passed('t1', 'k1-changed')
+    assert not results.passed('t2', 'k2')
+
+    results.update(dict(t1=('k1', 'failed')))
+    results = ResultCache(cache)
+
+    assert not results.passed('t1', 'k1')
+
+
+def test_result_cache_no_cache():
+    """
+    Test ResultCache without a pytest cache.
+    """
+    results = ResultCache(None)
+    results.update(dict(t1=('k1', 'passed')))
+
+    assert results.passed('t1', 'k1')
+
+
+def test_result_cache_prune(tmpdir):
+    """
+    Test that ResultCache removes the outcomes of tests that no longer exist,
+    and keeps the outcomes of existing test files that were not collected.
+    """
+    tmpdir.join('test_a.py').write('')
+    tmpdir.join('test_b.py').write('')
+    cache = FakeCache()
+    results = ResultCache(cache)
+    results.update({
+        'test_a.py::test_1[srv1]': ('k1', 'passed'),
+        'test_a.py::test_1[srv2]': ('k2', 'passed'),
+        'test_b.py::test_1[srv1]': ('k3', 'passed'),
+        'test_c.py::test_1[srv1]': ('k4', 'passed'),
+    })
+
+    results = ResultCache(cache)
+    results.update({}, collected={'test_a.py::test_1[srv1]'},
+                   rootdir=str(tmpdir))
+    results = ResultCache(cache)
+
+    assert len(results) == 2
+    assert results.passed('test_a.py::test_1[srv1]', 'k1')
+    assert results.passed('test_b.py::test_1[srv1]', 'k3')
+
+
+def test_result_key():
+    """
+    Test that the result key changes when any of its parts changes.
+    """
+    args = ('srv1', dict(description='server 1'), 'fw1', 'hash1')
+    key = result_key(*args)
+
+    assert result_key(*args) == key
+    for i, changed in enumerate(('srv2', dict(description='server 2'),
+                                 'fw2', 'hash2')):
+        changed_args = list(args)
+        changed_args[i] = changed
+        assert result_key(*changed_args) != key
+
+
+def test_file_hash(tmpdir):
+    """
+    Test file_hash().
+    """
+    filepath = tmpdir.join('test_x.py')
+    filepath.write('a')
+    hash1 = file_hash(str(filepath))
+    filepath.write('b')
+
+    assert file_hash(str(filepath)) != hash1
+    assert file_hash(str(tmpdir.join('missing.py'))) is None
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+@pytest.mark.parametrize(
+    "xdist_args",
+    [
+        [],
+        ['-n', '2'],
+    ]
+)
+def test_reuse_results_cache(pytester, xdist_args):
+    """
+    Test that --es-reuse-results stores no information about the secrets in
+    the pytest cache, and removes the results of tests that no longer exist,
+    also with pytest-xdist.
+    """
+    pytester.makefile('.yml', es_server=SERVER_FILE, es_vault=VAULT_FILE)
+    pytester.makepyfile(
+        test_a=TEST_MODULE.format(name='test_1') +
+        TEST_MODULE.format(name='test_2').split('\n', 3)[3],
+        test_b=TEST_MODULE.format(name='test_1'),
+        test_c=TEST_MODULE.format(name='test_1'))
+    results_file = pytester.path.joinpath(
+        '.pytest_cache', 'v', 'pytest_easy_server', 'results')
+
+    result = pytester.runpytest_subprocess(
+        '--es-reuse-results', *xdist_args)
+
+    result.assert_outcomes(passed=8)
+    assert '10.1.1.' not in results_file.read_text()
+
+    # Rename a test, remove a test file, and run only one test file
+    pytester.makepyfile(
+        test_a=TEST_MODULE.format(name='test_1') +
+        TEST_MODULE.format(name='test_3').split('\n', 3)[3])
+    pytester.path.joinpath('test_b.py').unlink()
+
+    result = pytester.runpytest_subprocess(
+        '--es-reuse-results', 'test_a.py', *xdist_args)
+
+    result.assert_outcomes(passed=4)
+    nodeids = json.loads(results_file.read_text())
+    assert sorted(set(n.split('[')[0] for n in nodeids)) == [
+        'test_a.py::test_1', 'test_a.py::test_3', 'test_c.py::test_1']
+    assert len(nodeids) == 6
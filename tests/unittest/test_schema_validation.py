@@ -0,0 +1,125 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _schema_validation.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import pytest
+import yaml
+import easy_server
+
+from pytest_easy_server._schema_validation import compiled_validator
+from pytest_easy_server._lazy_vault import LazyServerFile
+
+USER_DEFINED_SCHEMA = {
+    'type': 'object',
+    'additionalProperties': False,
+    'properties': {
+        'stuff': {'type': 'string'},
+        'sub': {'type': 'object', 'properties': {'x': {'type': 'integer'}}},
+    },
+}
+
+VAULT_SERVER_SCHEMA = {
+    'type': 'object',
+    'required': ['host'],
+    'properties': {'host': {'type': 'string'}},
+}
+
+
+def test_compiled_validator():
+    """
+    Test that the validator is created once per schema and is reused.
+    """
+    validator = compiled_validator(USER_DEFINED_SCHEMA)
+    assert compiled_validator(dict(USER_DEFINED_SCHEMA)) is validator
+    assert compiled_validator(VAULT_SERVER_SCHEMA) is not validator
+    assert validator.is_valid({'stuff': 'a'})
+    assert not validator.is_valid({'stuff': 42})
+
+
+TESTCASES_VALIDATION = [
+    # Testcases for test_validation().
+    # Each item is a tuple with: desc, user_defined_schema,
+    # vault_server_schema, servers, secrets.
+    ("valid items",
+     USER_DEFINED_SCHEMA, VAULT_SERVER_SCHEMA,
+     {'srv1': {'stuff': 'a'}}, {'srv1': {'host': 'h1'}}),
+    ("invalid user-defined item at top-level",
+     USER_DEFINED_SCHEMA, None,
+     {'srv1': {'stuff': 'a'}, 'srv2': {'foo': 'b'}}, {}),
+    ("invalid user-defined item in nested element",
+     USER_DEFINED_SCHEMA, None,
+     {'srv1': {'sub': {'x': 'no int'}}}, {}),
+    ("missing user-defined item",
+     USER_DEFINED_SCHEMA, None,
+     {'srv1': None}, {}),
+    ("invalid user-defined schema",
+     {'type': 'foo'}, None,
+     {'srv1': {'stuff': 'a'}}, {}),
+    ("invalid vault server item",
+     None, VAULT_SERVER_SCHEMA,
+     {'srv1': {}}, {'srv1': {'hostname': 'h1'}}),
+    ("invalid vault server schema",
+     None, {'type': 'foo'},
+     {'srv1': {}}, {'srv1': {'host': 'h1'}}),
+]
+
+
+@pytest.mark.parametrize(
+    "desc, user_defined_schema, vault_server_schema, servers, secrets",
+    TESTCASES_VALIDATION)
+def test_validation(tmpdir, desc, user_defined_schema, vault_server_schema,
+                    servers, secrets):
+    # pylint: disable=unused-argument
+    """
+    Test that the validation with compiled validators has the same result as
+    the validation by easy-server.
+    """
+    server_items = {}
+    for nickname, user_defined in servers.items():
+        server_items[nickname] = dict(description="Server " + nickname)
+        if user_defined is not None:
+            server_items[nickname]['user_defined'] = user_defined
+    es_file = tmpdir.join('es_server.yml')
+    es_file.write(yaml.safe_dump(dict(
+        vault_file='es_vault.yml', servers=server_items)))
+    tmpdir.join('es_vault.yml').write(yaml.safe_dump(dict(secrets=secrets)))
+    kwargs = dict(password=None, use_keyring=False, use_prompting=False,
+                  user_defined_schema=user_defined_schema,
+                  vault_server_schema=vault_server_schema)
+
+    try:
+        exp_esf_obj = easy_server.ServerFile(str(es_file), **kwargs)
+    except (easy_server.ServerFileException,
+            easy_server.VaultFileException) as exc:
+        exp_exc = exc
+    else:
+        exp_exc = None
+    try:
+        esf_obj = LazyServerFile(str(es_file), **kwargs)
+        esf_obj.lazy_vault.load()
+    except (easy_server.ServerFileException,
+            easy_server.VaultFileException) as exc:
+        act_exc = exc
+    else:
+        act_exc = None
+
+    if exp_exc is None:
+        assert act_exc is None
+        assert [esf_obj.get_server(n).secrets for n in servers] == \
+            [exp_esf_obj.get_server(n).secrets for n in servers]
+    else:
+        assert type(act_exc) is type(exp_exc)  # noqa: E721
+        assert str(act_exc) == str(exp_exc)
@@ -0,0 +1,169 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _server_cache.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import shutil
+import datetime
+import pytest
+
+from pytest_easy_server import plugin
+from pytest_easy_server._server_cache import ServerListCache, \
+    file_fingerprint
+
+TEST_DIR = os.path.dirname(__file__)
+
+TEST_SERVERS = [
+    dict(nickname='srv1', server_dict=dict(description="server 1")),
+]
+
+
+def test_cache_roundtrip(tmpdir):
+    """
+    Test that a stored cache entry is returned while its files are unchanged,
+    and is invalidated when one of its files changes.
+    """
+    data_file = str(tmpdir.join('es_server.yml'))
+    with open(data_file, 'w') as fp:
+        fp.write("servers: {}\n")
+    cache = ServerListCache(str(tmpdir.join('cache')))
+    key = (data_file, None, None)
+
+    assert cache.get(key) is None
+
+    cache.set(key, [data_file], None, None, TEST_SERVERS)
+    entry = cache.get(key)
+    assert entry['servers'] == TEST_SERVERS
+    assert cache.get((data_file, 'other', None)) is None
+
+    # Same size, different content and modification time
+    with open(data_file, 'w') as fp:
+        fp.write("servers: []\n")
+    os.utime(data_file, (0, 0))
+    assert cache.get(key) is None
+
+
+def test_cache_unchanged_content(tmpdir):
+    """
+    Test that a cache entry remains valid when only the modification time of
+    one of its files changes.
+    """
+    data_file = str(tmpdir.join('es_server.yml'))
+    with open(data_file, 'w') as fp:
+        fp.write("servers: {}\n")
+    cache = ServerListCache(str(tmpdir.join('cache')))
+    key = (data_file, None, None)
+    cache.set(key, [data_file], None, None, TEST_SERVERS)
+
+    os.utime(data_file, (0, 0))
+    assert file_fingerprint(data_file)['mtime'] == 0
+    assert cache.get(key)['servers'] == TEST_SERVERS
+
+
+def test_cache_not_serializable(tmpdir):
+    """
+    Test that servers that cannot be serialized to JSON are not cached, and
+    that no temporary file is left in the cache directory.
+    """
+    data_file = str(tmpdir.join('es_server.yml'))
+    with open(data_file, 'w') as fp:
+        fp.write("servers: {}\n")
+    cache_dir = tmpdir.join('cache')
+    cache = ServerListCache(str(cache_dir))
+    key = (data_file, None, None)
+    servers = [dict(nickname='srv1', server_dict=dict(
+        description="server 1",
+        user_defined=dict(since=datetime.date(2021, 1, 1))))]
+
+    cache.set(key, [data_file], None, None, servers)
+
+    assert cache.get(key) is None
+    assert not cache_dir.exists() or cache_dir.listdir() == []
+
+
+def test_load_es_obj_list_cache_dir_date(pytestconfig, monkeypatch, tmpdir):
+    """
+    Test that loading a server file with a date in the user-defined
+    properties of a server succeeds with a cache directory.
+    """
+    es_file = str(tmpdir.join('es_server.yml'))
+    with open(es_file, 'w') as fp:
+        fp.write("servers:\n"
+                 "  srv1:\n"
+                 "    description: server 1\n"
+                 "    user_defined:\n"
+                 "      since: 2021-01-01\n"
+                 "default: srv1\n")
+    cache_dir = tmpdir.join('cache')
+    monkeypatch.setattr(pytestconfig.option, 'es_cache_dir', str(cache_dir))
+
+    es_obj_list = plugin.load_es_obj_list(
+        pytestconfig, es_file, None, None, False)
+
+    assert es_obj_list[0].user_defined == \
+        dict(since=datetime.date(2021, 1, 1))
+    assert not cache_dir.exists() or cache_dir.listdir() == []
+
+
+def test_load_es_obj_list_cache_dir(pytestconfig, monkeypatch, tmpdir):
+    """
+    Test that loading the servers with a cache directory returns the same
+    servers from the cache as from the server file, including the secrets.
+    """
+    monkeypatch.setattr(pytestconfig.option, 'es_cache_dir', str(tmpdir))
+    key = plugin.es_obj_list_key(pytestconfig)
+
+    es_obj_list1 = plugin.load_es_obj_list(pytestconfig, *key)
+    assert len(tmpdir.listdir()) == 1
+    es_obj_list2 = plugin.load_es_obj_list(pytestconfig, *key)
+
+    assert [repr(s) for s in es_obj_list2] == [repr(s) for s in es_obj_list1]
+    assert [s.secrets for s in es_obj_list2] == \
+        [s.secrets for s in es_obj_list1]
+    with open(tmpdir.listdir()[0].strpath) as fp:
+        assert 'mypass1' not in fp.read()
+
+
+def test_load_es_obj_list_cache_dir_vault_schema(pytestconfig, monkeypatch,
+                                                 tmpdir):
+    """
+    Test that the vault file is validated against the schema when the secrets
+    are loaded for servers from the cache, if the vault file was not loaded
+    when the cache entry was stored.
+    """
+    for filename in ('es_server.yml', 'es_schema.yml'):
+        shutil.copy(os.path.join(TEST_DIR, filename), str(tmpdir))
+    # The 'host' property is required by the vault server schema
+    tmpdir.join('es_vault.yml').write(
+        "secrets:\n"
+        "  myserver1:\n"
+        "    hostx: 10.11.12.13\n"
+        "  myserver2:\n"
+        "    host: 9.10.11.12\n")
+    monkeypatch.setattr(pytestconfig.option, 'es_cache_dir',
+                        str(tmpdir.join('cache')))
+    es_file = str(tmpdir.join('es_server.yml'))
+    es_schema_file = str(tmpdir.join('es_schema.yml'))
+
+    # The vault file is not loaded when the cache entry is stored.
+    plugin.load_es_obj_list(pytestconfig, es_file, None, es_schema_file, False)
+    assert len(tmpdir.join('cache').listdir()) == 1
+
+    es_obj_list = plugin.load_es_obj_list(
+        pytestconfig, es_file, None, es_schema_file, False)
+    with pytest.raises(pytest.exit.Exception) as exc_info:
+        plugin.load_es_secrets(pytestconfig, es_obj_list[0])
+    assert "hostx" in str(exc_info.value)
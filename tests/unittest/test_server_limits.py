@@ -0,0 +1,260 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _server_limits.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import os
+import time
+import getpass
+import tempfile
+import threading
+import pytest
+import easy_server
+
+from pytest_easy_server._server_limits import server_limits, \
+    defines_limits, server_lock_key, default_lock_dir, ServerLimiter
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+# Server file with invalid limits for a server, for test_limits_validation()
+INVALID_LIMITS_SERVER_FILE = """
+servers:
+  srv1:
+    description: "server 1"
+    user_defined:
+      max_concurrency: "one"
+default: srv1
+"""
+
+# Server file with limits for a server whose vault file is invalid, for
+# test_lock_key_vault_error()
+INVALID_VAULT_SERVER_FILE = """
+vault_file: es_vault.yml
+servers:
+  srv1:
+    description: "server 1"
+    user_defined:
+      max_concurrency: 1
+default: srv1
+"""
+
+INVALID_LIMITS_TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_one(es_server):
+    pass
+"""
+
+TESTCASES_SERVER_LIMITS = [
+    # Testcases for test_server_limits().
+    # Each item is a tuple with: desc, user_defined, default_max_concurrency,
+    # default_max_rate, exp_limits (or None for ValueError).
+    ("no limits", None, 0, 0, (0, 0.0)),
+    ("limits from defaults", {}, 2, 1.5, (2, 1.5)),
+    ("limits from server", dict(max_concurrency=1, max_rate=3), 2, 1.5,
+     (1, 3.0)),
+    ("null limits from server", dict(max_concurrency=None, max_rate=None),
+     2, 1.5, (2, 1.5)),
+    ("invalid max_concurrency", dict(max_concurrency='1'), 0, 0, None),
+    ("negative max_concurrency", dict(max_concurrency=-1), 0, 0, None),
+    ("invalid max_rate", dict(max_rate=True), 0, 0, None),
+]
+
+
+@pytest.mark.parametrize(
+    "desc, user_defined, default_max_concurrency, default_max_rate, "
+    "exp_limits",
+    TESTCASES_SERVER_LIMITS)
+def test_server_limits(desc, user_defined, default_max_concurrency,
+                       default_max_rate, exp_limits):
+    # pylint: disable=unused-argument
+    """
+    Test server_limits().
+    """
+    server = easy_server.Server(
+        'srv1', dict(description="server 1", user_defined=user_defined))
+    if exp_limits is None:
+        with pytest.raises(ValueError):
+            server_limits(server, default_max_concurrency, default_max_rate)
+    else:
+        assert server_limits(
+            server, default_max_concurrency, default_max_rate) == exp_limits
+
+
+@pytest.mark.parametrize(
+    "user_defined, exp_result", [
+        (None, False),
+        (dict(stuff=1), False),
+        (dict(max_concurrency=None, max_rate=None), False),
+        (dict(max_concurrency=0), True),
+        (dict(max_rate=0.5), True),
+        (dict(max_concurrency='invalid'), True),
+    ]
+)
+def test_defines_limits(user_defined, exp_result):
+    """
+    Test defines_limits().
+    """
+    server = easy_server.Server(
+        'srv1', dict(description="server 1", user_defined=user_defined))
+    assert defines_limits(server) is exp_result
+
+
+def test_server_lock_key():
+    """
+    Test that server_lock_key() identifies a server by its nickname and its
+    host, independent of the server file.
+    """
+    srv1 = easy_server.Server(
+        'srv1', dict(description="server 1", user_defined=dict(host='h1')))
+    srv1_copy = easy_server.Server(
+        'srv1', dict(description="copy", user_defined=dict(host='h1')))
+    srv1_secrets = easy_server.Server(
+        'srv1', dict(description="server 1"), secrets_dict=dict(host='h1'))
+    srv1_other_host = easy_server.Server(
+        'srv1', dict(description="server 1", user_defined=dict(host='h2')))
+    srv2 = easy_server.Server(
+        'srv2', dict(description="server 2", user_defined=dict(host='h1')))
+    srv1_no_host = easy_server.Server('srv1', dict(description="server 1"))
+
+    key = server_lock_key(srv1, '/a/es_server.yml')
+    assert key.startswith('srv1-')
+    assert server_lock_key(srv1_copy, '/b/es_server.yml') == key
+    assert server_lock_key(srv1_secrets, '/b/es_server.yml') == key
+    assert server_lock_key(srv1_other_host, '/a/es_server.yml') != key
+    assert server_lock_key(srv2, '/a/es_server.yml') != key
+    assert server_lock_key(srv1_no_host, '/a/es_server.yml') != \
+        server_lock_key(srv1_no_host, '/b/es_server.yml')
+
+
+def test_default_lock_dir(monkeypatch):
+    """
+    Test that the default lock directory is specific to the current user.
+    """
+    monkeypatch.setattr(getpass, 'getuser', lambda: 'user1')
+    lock_dir1 = default_lock_dir()
+    monkeypatch.setattr(getpass, 'getuser', lambda: 'user/2')
+    lock_dir2 = default_lock_dir()
+
+    assert os.path.basename(lock_dir1) == 'pytest-easy-server-locks-user1'
+    assert os.path.basename(lock_dir2) == 'pytest-easy-server-locks-user_2'
+    assert os.path.dirname(lock_dir1) == tempfile.gettempdir()
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+def test_lock_key_vault_error(pytester):
+    """
+    Test that an error loading the vault file for determining the lock key
+    of a server causes pytest to exit with a message instead of a traceback.
+    """
+    pytester.makefile('.yml', es_server=INVALID_VAULT_SERVER_FILE,
+                      es_vault="secrets: [invalid\n")
+    pytester.makepyfile(test_a=INVALID_LIMITS_TEST_MODULE)
+
+    result = pytester.runpytest('-p', 'no:cacheprovider')
+
+    assert result.ret != 0
+    result.stdout.fnmatch_lines(['*Exit: Invalid YAML syntax in vault file*'])
+    result.stdout.no_fnmatch_line('*Traceback*')
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+@pytest.mark.parametrize(
+    "args", [
+        [],
+        ['--es-max-concurrency=1'],
+        ['--es-max-rate=10'],
+    ]
+)
+def test_limits_validation(pytester, args):
+    """
+    Test that invalid limits of a server cause pytest to exit when the
+    server defines limits, with or without the options.
+    """
+    pytester.makefile('.yml', es_server=INVALID_LIMITS_SERVER_FILE)
+    pytester.makepyfile(test_a=INVALID_LIMITS_TEST_MODULE)
+
+    result = pytester.runpytest('-p', 'no:cacheprovider', *args)
+
+    assert result.ret != 0
+    result.stdout.fnmatch_lines(['*max_concurrency*srv1*'])
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+def test_limits_not_requested(pytester):
+    """
+    Test that the limits are not enforced when no server defines limits and
+    the options are not specified.
+    """
+    pytester.makefile('.yml', es_server=INVALID_LIMITS_SERVER_FILE.replace(
+        'max_concurrency: "one"', 'max_concurrency: null'))
+    pytester.makepyfile(test_a="""
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_one(request, es_server):
+    assert not request.config.pluginmanager.has_plugin('es_server_limiter')
+""")
+
+    result = pytester.runpytest('-p', 'no:cacheprovider')
+
+    result.assert_outcomes(passed=1)
+
+
+def test_limiter_concurrency(tmpdir):
+    """
+    Test that ServerLimiter limits the number of concurrent holders of the
+    concurrency slots of a server.
+    """
+    limiter = ServerLimiter(str(tmpdir.join('locks')))
+    lock = threading.Lock()
+    state = dict(current=0, max=0)
+
+    def run():
+        token = limiter.acquire('srv1', 2, 0)
+        with lock:
+            state['current'] += 1
+            state['max'] = max(state['max'], state['current'])
+        time.sleep(0.1)
+        with lock:
+            state['current'] -= 1
+        limiter.release(token)
+
+    threads = [threading.Thread(target=run) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert state['max'] == 2
+
+
+def test_limiter_rate(tmpdir):
+    """
+    Test that ServerLimiter limits the rate of the test starts of a server.
+    """
+    limiter = ServerLimiter(str(tmpdir.join('locks')))
+    starts = []
+    for _ in range(4):
+        assert limiter.acquire('srv1', 0, 20) is None
+        starts.append(time.time())
+
+    # The start times are reserved in advance, so a late wake-up shortens
+    # the next gap. Only the total span is guaranteed, with a tolerance for
+    # the resolution of the timer.
+    assert starts[-1] - starts[0] >= 3 * 0.05 - 0.01
@@ -0,0 +1,84 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _server_selection.py module.
+"""
+
+from __future__ import absolute_import, print_function
+from collections import OrderedDict
+import pytest
+import easy_server
+
+from pytest_easy_server._server_selection import server_weight, \
+    load_weight, WeightedSelector
+
+TESTCASES_SERVER_WEIGHT = [
+    # Testcases for test_server_weight().
+    # Each item is a tuple with: desc, user_defined, exp_weight (or None for
+    # ValueError).
+    ("no user-defined properties", None, 1.0),
+    ("default weight", dict(stuff='a'), 1.0),
+    ("integer weight", dict(weight=3), 3.0),
+    ("zero weight", dict(weight=0), 0.0),
+    ("negative weight", dict(weight=-1), None),
+    ("string weight", dict(weight='1'), None),
+]
+
+
+@pytest.mark.parametrize(
+    "desc, user_defined, exp_weight",
+    TESTCASES_SERVER_WEIGHT)
+def test_server_weight(desc, user_defined, exp_weight):
+    # pylint: disable=unused-argument
+    """
+    Test server_weight().
+    """
+    server = easy_server.Server(
+        'srv1', dict(description="server 1", user_defined=user_defined))
+    if exp_weight is None:
+        with pytest.raises(ValueError):
+            server_weight(server)
+    else:
+        assert server_weight(server) == exp_weight
+
+
+def test_load_weight():
+    """
+    Test load_weight().
+    """
+    assert load_weight(2.0, None) == 2.0
+    assert load_weight(2.0, 0.25) == pytest.approx(1.5)
+    assert load_weight(2.0, 1.5) == 0.0
+    assert load_weight(2.0, -1) == 2.0
+
+
+def test_weighted_selector():
+    """
+    Test that WeightedSelector selects the servers in proportion to their
+    weights, smoothly and deterministically.
+    """
+    weights = OrderedDict([('srv1', 3), ('srv2', 1), ('srv3', 0)])
+    selector = WeightedSelector(weights)
+    selected = [selector.select() for _ in range(8)]
+
+    assert selected == ['srv1', 'srv1', 'srv2', 'srv1'] * 2
+    selector = WeightedSelector(weights)
+    assert [selector.select() for _ in range(8)] == selected
+
+
+def test_weighted_selector_no_weights():
+    """
+    Test that WeightedSelector requires a server with a weight greater than 0.
+    """
+    with pytest.raises(ValueError):
+        WeightedSelector(OrderedDict([('srv1', 0)]))
@@ -0,0 +1,248 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _session_pool.py module.
+"""
+
+from __future__ import absolute_import, print_function
+import threading
+import pytest
+import easy_server
+
+from pytest_easy_server._session_pool import SessionPool
+from pytest_easy_server._es_session_fixture import check_pool_size
+
+
+class FakeSession(object):
+    """Session for testing"""
+
+    def __init__(self, nickname):
+        self.nickname = nickname
+        self.usable = True
+        self.closed = False
+
+
+class FakeHook(object):
+    """Hook relay for testing, with the session hooks implemented"""
+
+    def __init__(self):
+        self.created = []
+
+    # pylint: disable=invalid-name
+    def pytest_es_create_session(self, server):
+        """Create session"""
+        session = FakeSession(server.nickname)
+        self.created.append(session)
+        return session
+
+    @staticmethod
+    def pytest_es_check_session(server, session):
+        """Check session"""
+        assert session.nickname == server.nickname
+        return session.usable
+
+    @staticmethod
+    def pytest_es_close_session(server, session):
+        """Close session"""
+        assert session.nickname == server.nickname
+        session.closed = True
+        return True
+
+
+def make_server(nickname):
+    """Return a server for testing"""
+    return easy_server.Server(nickname, dict(description="test server"))
+
+
+def test_pool_reuse():
+    """
+    Test that sessions are reused per server, and closed at the end.
+    """
+    hook = FakeHook()
+    pool = SessionPool(hook)
+    srv1 = make_server('srv1')
+    srv2 = make_server('srv2')
+
+    s1 = pool.checkout(srv1)
+    pool.checkin(srv1, s1)
+    s2 = pool.checkout(srv2)
+    pool.checkin(srv2, s2)
+    assert pool.checkout(srv1) is s1
+    pool.checkin(srv1, s1)
+    assert len(hook.created) == 2
+    assert pool.live_count('srv1') == 1
+
+    pool.close_all()
+    assert s1.closed and s2.closed
+    assert pool.live_count('srv1') == 0
+
+
+def test_pool_health_check():
+    """
+    Test that unusable sessions are closed and replaced on checkout.
+    """
+    hook = FakeHook()
+    pool = SessionPool(hook)
+    srv1 = make_server('srv1')
+
+    s1 = pool.checkout(srv1)
+    pool.checkin(srv1, s1)
+    s1.usable = False
+    s2 = pool.checkout(srv1)
+    assert s2 is not s1
+    assert s1.closed
+    assert pool.live_count('srv1') == 1
+
+
+def test_pool_bounded():
+    """
+    Test that the number of live sessions per server is bounded, and that
+    checkout waits for a session to be returned.
+    """
+    hook = FakeHook()
+    pool = SessionPool(hook, max_size=2)
+    srv1 = make_server('srv1')
+
+    s1 = pool.checkout(srv1)
+    s2 = pool.checkout(srv1)
+    assert s1 is not s2
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(
+        pool.checkout(srv1)))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+
+    pool.checkin(srv1, s2)
+    thread.join(5)
+    assert result == [s2]
+    assert len(hook.created) == 2
+
+
+def test_checkout_many():
+    """
+    Test that checkout_many() checks out sessions with all servers, in the
+    order of the servers.
+    """
+    hook = FakeHook()
+    pool = SessionPool(hook, max_size=1)
+    servers = [make_server(n) for n in ('srv1', 'srv2', 'srv3')]
+
+    sessions = pool.checkout_many(servers)
+
+    assert [s.nickname for s in sessions] == ['srv1', 'srv2', 'srv3']
+    for server, session in zip(servers, sessions):
+        pool.checkin(server, session)
+    assert pool.checkout_many(servers) == sessions
+
+
+class FailingHook(FakeHook):
+    """Hook relay for testing, failing to create sessions for 'bad' servers"""
+
+    # pylint: disable=invalid-name
+    def pytest_es_create_session(self, server):
+        """Create session"""
+        if server.nickname == 'bad':
+            raise ValueError("cannot connect")
+        return super(FailingHook, self).pytest_es_create_session(server)
+
+
+def test_checkout_many_error():
+    """
+    Test that checkout_many() returns the sessions that were checked out to
+    the pool and raises the exception, if a session cannot be created.
+    """
+    hook = FailingHook()
+    pool = SessionPool(hook, max_size=1)
+    servers = [make_server(n) for n in ('srv1', 'bad', 'srv2')]
+
+    with pytest.raises(ValueError):
+        pool.checkout_many(servers)
+
+    assert pool.live_count('bad') == 0
+    s1 = pool.checkout(servers[0])
+    assert s1 is hook.created[[s.nickname for s in hook.created].index(
+        'srv1')]
+
+
+class CheckFailingHook(FakeHook):
+    """Hook relay for testing, failing to check sessions that are not usable"""
+
+    @staticmethod
+    def pytest_es_check_session(server, session):
+        """Check session"""
+        if not session.usable:
+            raise ValueError("cannot check")
+        return True
+
+
+def test_checkout_check_error():
+    """
+    Test that checkout() closes the session and raises the exception, if the
+    check of an idle session fails, and that the pool can create a new
+    session for the server afterwards.
+    """
+    hook = CheckFailingHook()
+    pool = SessionPool(hook, max_size=1)
+    srv1 = make_server('srv1')
+    s1 = pool.checkout(srv1)
+    pool.checkin(srv1, s1)
+    s1.usable = False
+
+    with pytest.raises(ValueError):
+        pool.checkout(srv1)
+
+    assert s1.closed
+    assert pool.live_count('srv1') == 0
+    s2 = pool.checkout(srv1)
+    assert s2 is not s1
+
+
+class FakeNode(object):
+    # pylint: disable=too-few-public-methods
+    """Test node for testing"""
+
+    nodeid = 'test_a.py::test_a'
+
+
+class FakeRequest(object):
+    # pylint: disable=too-few-public-methods
+    """Fixture request for testing"""
+
+    def __init__(self, fixturenames):
+        self.fixturenames = fixturenames
+        self.node = FakeNode()
+
+
+@pytest.mark.parametrize(
+    "fixturenames, max_size, exp_fail", [
+        (['es_server', 'es_session'], 1, False),
+        (['es_servers', 'es_sessions'], 1, False),
+        (['es_server', 'es_session', 'es_servers', 'es_sessions'], 1, True),
+        (['es_server', 'es_session', 'es_servers', 'es_sessions'], 2, False),
+    ]
+)
+def test_check_pool_size(fixturenames, max_size, exp_fail):
+    """
+    Test that a test using both the es_session and es_sessions fixtures fails
+    instead of waiting forever, if the pool size is 1.
+    """
+    pool = SessionPool(FakeHook(), max_size=max_size)
+    request = FakeRequest(fixturenames)
+    if exp_fail:
+        with pytest.raises(pytest.fail.Exception) as exc_info:
+            check_pool_size(request, pool)
+        assert "--es-session-pool-size=2" in str(exc_info.value)
+    else:
+        check_pool_size(request, pool)
@@ -0,0 +1,177 @@
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the _xdist_scheduling.py module.
+"""
+
+from __future__ import absolute_import, print_function
+from collections import OrderedDict
+import pytest
+
+xdist = pytest.importorskip('xdist')
+
+# pylint: disable=wrong-import-position
+from pytest_easy_server._xdist_scheduling import \
+    es_server_scope, xdist_unsupported_reason, \
+    ServerScopeScheduling  # noqa: E402
+
+pytest_plugins = ['pytester']  # pylint: disable=invalid-name
+
+# Indicates whether the pytester fixture is supported (pytest>=6.2)
+PYTESTER_SUPPORTED = tuple(
+    int(v) for v in pytest.__version__.split('.')[0:2]) >= (6, 2)
+
+SERVER_FILE = """
+servers:
+  srv1:
+    description: server 1
+  srv2:
+    description: server 2
+  srv3:
+    description: server 3
+server_groups:
+  all:
+    description: all servers
+    members: [srv1, srv2, srv3]
+default: all
+"""
+
+# Conftest file for test_dist_by_server(), that records the worker that ran
+# each test
+WORKER_CONFTEST = """
+import os
+
+def pytest_runtest_setup(item):
+    callspec = getattr(item, 'callspec', None)
+    es_obj = callspec.params.get('es_server') if callspec else None
+    nickname = es_obj.nickname if es_obj else 'none'
+    worker = os.environ.get('PYTEST_XDIST_WORKER', 'master')
+    with open(os.path.join(os.path.dirname(__file__), 'workers.txt'),
+              'a') as fp:
+        fp.write('{}:{}\\n'.format(nickname, worker))
+"""
+
+WORKER_TEST_MODULE = """
+from pytest_easy_server import es_server  # noqa: F401
+
+def test_one(es_server):
+    pass
+
+def test_two(es_server):
+    pass
+
+def test_plain():
+    pass
+"""
+
+
+class FakeXdistConfig(object):
+    # pylint: disable=too-few-public-methods
+    """Pytest config for creating a pytest-xdist scheduler"""
+
+    def __init__(self):
+        self.option = FakeXdistOption()
+
+    def getvalue(self, name):
+        """Return the value of an option"""
+        return getattr(self.option, name)
+
+
+class FakeXdistOption(object):
+    # pylint: disable=too-few-public-methods
+    """Pytest options for creating a pytest-xdist scheduler"""
+    numprocesses = 2
+    tx = ['2*popen']
+    dist = 'loadscope'
+    maxschedchunk = None
+
+
+@pytest.mark.parametrize(
+    "nodeid, exp_scope",
+    [
+        ("test_a.py::test_foo", None),
+        ("test_a.py::test_foo[1]", None),
+        ("test_a.py::test_foo[es_server=srv_1]", "es_server=srv_1"),
+        ("test_a.py::TestA::test_foo[es_server=srv1-2]", "es_server=srv1"),
+        ("test_a.py::test_foo[x-es_server=srv1]", "es_server=srv1"),
+        ("test_a.py::test_foo[x-es_server=srv1-3]", "es_server=srv1"),
+        ("test_a.py::test_foo[my_es_server=srv1]", None),
+    ]
+)
+def test_es_server_scope(nodeid, exp_scope):
+    """
+    Test es_server_scope().
+    """
+    assert es_server_scope(nodeid) == exp_scope
+
+
+@pytest.mark.parametrize(
+    "version, exp_supported", [
+        ('1.18.2', False),
+        ('1.19.0', True),
+        ('3.8.0', True),
+        ('4.0.0', False),
+        ('unknown', False),
+    ]
+)
+def test_xdist_unsupported_reason(monkeypatch, version, exp_supported):
+    """
+    Test that xdist_unsupported_reason() rejects unsupported pytest-xdist
+    versions.
+    """
+    monkeypatch.setattr(xdist, '__version__', version)
+    reason = xdist_unsupported_reason()
+    if exp_supported:
+        assert reason is None
+    else:
+        assert version in reason
+
+
+def test_xdist_internals():
+    """
+    Test that the installed pytest-xdist version has the internals of
+    LoadScopeScheduling that ServerScopeScheduling depends on.
+    """
+    assert xdist_unsupported_reason() is None
+    scheduler = ServerScopeScheduling(FakeXdistConfig())
+    assert isinstance(scheduler.workqueue, OrderedDict)
+
+
+@pytest.mark.skipif(not PYTESTER_SUPPORTED, reason="Requires pytest>=6.2")
+@pytest.mark.parametrize("longest_first", [False, True])
+def test_dist_by_server(pytester, longest_first):
+    """
+    Test that --es-dist-by-server runs all tests for a particular server on
+    the same worker, across test modules.
+    """
+    pytester.makefile('.yml', es_server=SERVER_FILE)
+    pytester.makeconftest(WORKER_CONFTEST)
+    pytester.makepyfile(test_a=WORKER_TEST_MODULE, test_b=WORKER_TEST_MODULE)
+    args = ['-n', '2', '--es-dist-by-server']
+    if longest_first:
+        # A first run records the test durations for --es-longest-first.
+        result = pytester.runpytest_subprocess(*args)
+        result.assert_outcomes(passed=14)
+        pytester.path.joinpath('workers.txt').unlink()
+        args.append('--es-longest-first')
+
+    result = pytester.runpytest_subprocess(*args)
+
+    result.assert_outcomes(passed=14)
+    workers = {}
+    for line in pytester.path.joinpath('workers.txt').read_text().split():
+        nickname, worker = line.split(':')
+        workers.setdefault(nickname, set()).add(worker)
+    assert sorted(workers) == ['none', 'srv1', 'srv2', 'srv3']
+    for nickname in ('srv1', 'srv2', 'srv3'):
+        assert len(workers[nickname]) == 1